@@ -1,16 +1,20 @@
+import os
 from pipeline import AssistantPipeline
 
 def main():
     print("\n=== Railway Assistant CLI ===")
 
-    assistant = AssistantPipeline(debug=True)
+    assistant = AssistantPipeline(debug=True, play_audio=True)
 
     test=''
     audio = input("\nEnter path to audio file (or type text): ")
     if(audio=='hin' or audio=='mal'):
         print('\n using test audio...')
         audio=f"C:\\Coding Projects\\hear2help WiP\\audio\\{audio}.mp3"
-    reply = assistant.run(audio)
+    if os.path.exists(audio):
+        reply = assistant.run(audio)
+    else:
+        reply = assistant.run_text(audio, speak=True)
 
     print("\n====== FINAL OUTPUT ======")
     print(reply)
@@ -0,0 +1 @@
+"""Benchmark corpus, stub models and the latency/throughput runner (python -m bench.run)."""
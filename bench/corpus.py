@@ -0,0 +1,159 @@
+"""
+Fixed benchmark corpus: spoken clips and typed queries in en/hi/ml.
+
+Every entry carries its transcript and the English meaning, so stub
+models can answer without running anything and real runs can be checked
+for drift. Clip audio lives in bench/corpus/<id>.wav:
+
+- synthetic clips are rendered from the transcript by Parler-TTS with
+  `python -m bench.corpus build` (needs the TTS model once, offline after)
+- recorded clips are real kiosk recordings dropped in by hand
+
+Clips whose WAV is missing fall back to seeded noise of a speech-like
+length, so stub runs (and CI) never need the files.
+"""
+
+import argparse
+import hashlib
+import os
+
+import numpy as np
+
+from core.audio_io import SAMPLE_RATE, load_audio, wav_bytes, decode_audio_bytes
+
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "corpus")
+
+# (id, lang, transcript, english)
+QUERIES = [
+    ("en_next_ernakulam", "en", "When is the next train to Ernakulam?",
+     "When is the next train to Ernakulam?"),
+    ("en_between_kottayam", "en", "Trains from Thrippunithura to Kottayam",
+     "Trains from Thrippunithura to Kottayam"),
+    ("en_route_16328", "en", "What is the route of train 16328?",
+     "What is the route of train 16328?"),
+    ("en_fare_aluva", "en", "How much is the ticket to Aluva?",
+     "How much is the ticket to Aluva?"),
+    ("en_status_56006", "en", "Is train 56006 running late?",
+     "Is train 56006 running late?"),
+    ("en_pnr", "en", "Check my PNR status please",
+     "Check my PNR status please"),
+    ("hi_next_ernakulam", "hi", "एर्नाकुलम के लिए अगली ट्रेन कब है?",
+     "When is the next train to Ernakulam?"),
+    ("hi_fare_kottayam", "hi", "कोट्टायम का टिकट कितने का है?",
+     "How much is the ticket to Kottayam?"),
+    ("hi_route_16328", "hi", "ट्रेन 16328 का रूट बताइए",
+     "Tell me the route of train 16328"),
+    ("ml_next_ernakulam", "ml", "എറണാകുളത്തേക്കുള്ള അടുത്ത ട്രെയിൻ എപ്പോഴാണ്?",
+     "When is the next train to Ernakulam?"),
+    ("ml_fare_kottayam", "ml", "കോട്ടയത്തേക്കുള്ള ടിക്കറ്റ് നിരക്ക് എത്രയാണ്?",
+     "What is the ticket fare to Kottayam?"),
+    ("ml_route_16328", "ml", "ട്രെയിൻ 16328 ന്റെ റൂട്ട് എന്താണ്?",
+     "What is the route of train 16328?"),
+]
+
+# Real recordings: (id, lang, transcript, english); WAVs are not shipped
+RECORDED = [
+    ("rec_hi_next", "hi", "अगली ट्रेन कब है", "When is the next train"),
+    ("rec_ml_next", "ml", "അടുത്ത ട്രെയിൻ എപ്പോഴാണ്", "When is the next train"),
+]
+
+
+def _entry(row, kind):
+    clip_id, lang, transcript, english = row
+    return {
+        "id": clip_id,
+        "kind": kind,
+        "lang": lang,
+        "transcript": transcript,
+        "english": english,
+        "path": os.path.join(CORPUS_DIR, f"{clip_id}.wav"),
+    }
+
+
+def entries():
+    return [_entry(r, "synthetic") for r in QUERIES] + [_entry(r, "recorded") for r in RECORDED]
+
+
+def text_queries():
+    """(lang, text, english) for the typed-query set."""
+    return [(lang, transcript, english) for _, lang, transcript, english in QUERIES]
+
+
+def _placeholder(entry):
+    """Seeded noise bursts padded with silence, ~0.4 s per word."""
+    seed = int(hashlib.sha1(entry["id"].encode("utf-8")).hexdigest()[:8], 16)
+    rng = np.random.default_rng(seed)
+    words = max(1, len(entry["transcript"].split()))
+    speech = (0.05 * rng.standard_normal(int(0.4 * words * SAMPLE_RATE))).astype(np.float32)
+    pad = np.zeros(SAMPLE_RATE // 2, dtype=np.float32)
+    return np.concatenate([pad, speech, pad])
+
+
+def load_clips(include_placeholders=True):
+    """
+    Entries with the "wav" bytes uploaded to /listen, the 16 kHz "samples"
+    the server decodes from them, and whether they are "placeholder"s.
+    """
+    clips = []
+    for entry in entries():
+        if os.path.exists(entry["path"]):
+            samples, placeholder = load_audio(entry["path"]), False
+        elif include_placeholders:
+            samples, placeholder = _placeholder(entry), True
+        else:
+            continue
+
+        # One 16-bit WAV round trip, so run() and /listen see identical samples
+        data = wav_bytes(samples, SAMPLE_RATE)
+        clips.append({
+            **entry,
+            "wav": data,
+            "samples": decode_audio_bytes(data),
+            "placeholder": placeholder,
+        })
+    return clips
+
+
+def samples_key(samples):
+    """Content key of decoded samples (see load_clips)."""
+    return hashlib.sha1(np.asarray(samples, dtype=np.float32).tobytes()).hexdigest()
+
+
+def build(force=False):
+    """Render every synthetic clip with Parler-TTS, resampled to 16 kHz."""
+    import soundfile as sf
+    import julius
+    import torch
+    from core.output import OutputUnit
+
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    output = OutputUnit(play_audio=False)
+    sr = output.model.config.sampling_rate
+
+    for entry in entries():
+        if entry["kind"] != "synthetic" or (os.path.exists(entry["path"]) and not force):
+            continue
+        audio = output._synthesize(entry["transcript"], entry["lang"])
+        audio = julius.resample_frac(torch.from_numpy(audio), sr, SAMPLE_RATE).numpy()
+        sf.write(entry["path"], audio, SAMPLE_RATE, subtype="PCM_16")
+        print(f"[CORPUS] {entry['id']} → {entry['path']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark corpus tools")
+    parser.add_argument("command", choices=["build", "list"])
+    parser.add_argument("--force", action="store_true", help="re-render existing clips")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build(force=args.force)
+        return
+
+    for entry in entries():
+        state = "ok" if os.path.exists(entry["path"]) else "missing"
+        print(f"{entry['id']:24} {entry['kind']:9} {entry['lang']}  {state:7}  {entry['transcript']}")
+
+
+if __name__ == "__main__":
+    main()
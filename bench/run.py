@@ -0,0 +1,422 @@
+"""
+End-to-end latency and throughput benchmark.
+
+    python -m bench.run --stub                          # CI: no models, no network
+    python -m bench.run --targets pipeline text         # real models, in-process
+    python -m bench.run --targets listen --url http://localhost:8000
+    python -m bench.run --stub --out new.json --baseline old.json
+    python -m bench.run --targets stream --clients 1 4
+
+Targets:
+  pipeline  AssistantPipeline.run on every corpus clip
+  text      AssistantPipeline.run_text on the typed set
+  listen    POST /listen; without --url a local uvicorn server is started
+            (with H2H_STUB_MODELS=1 under --stub) and its peak RSS reported
+  stream    /listen/stream, clips sent as 100 ms PCM frames at --stream-speed
+            × real time followed by silence; reports end of speech → answer
+            text and → first audio (needs the websockets package)
+
+For each target and client count the report holds throughput, end-to-end
+p50/p95/p99 and per-stage p50/p95/p99 from the pipeline's own timings,
+as JSON. --baseline prints per-stage deltas against an earlier report.
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bench import corpus
+from core.audio_io import SAMPLE_RATE
+from core.memory import process_memory
+
+
+STAGES = [
+    "vad", "denoise", "lid", "asr", "translate", "intent", "entities",
+    "answer_cache", "service", "format", "translate_back", "tts",
+]
+
+
+# --------------------------------------------------
+# Statistics
+# --------------------------------------------------
+
+def _percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    rank = max(1, int(round(q / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(values):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return {
+        "n": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": round(_percentile(ordered, 50), 3),
+        "p95": round(_percentile(ordered, 95), 3),
+        "p99": round(_percentile(ordered, 99), 3),
+    }
+
+
+def _collect(samples):
+    """samples: [(total_ms, {stage: ms}, extra)] → latency + stage summaries."""
+    stages = {}
+    for _, timings, _ in samples:
+        for stage, ms in (timings or {}).items():
+            stages.setdefault(stage, []).append(ms)
+
+    ordered = [s for s in STAGES if s in stages] + sorted(set(stages) - set(STAGES))
+    report = {
+        "latency_ms": summarize([total for total, _, _ in samples]),
+        "stages_ms": {stage: summarize(stages[stage]) for stage in ordered},
+    }
+
+    extras = {}
+    for _, _, extra in samples:
+        for key, value in (extra or {}).items():
+            extras.setdefault(key, []).append(value)
+    for key, values in extras.items():
+        report[key] = summarize(values)
+    return report
+
+
+def _load_level(fn, items, clients, requests):
+    """Run fn over items round-robin from `clients` threads."""
+    work = [items[i % len(items)] for i in range(requests)]
+    samples = []
+    errors = {}
+    lock = threading.Lock()
+
+    def one(item):
+        start = time.perf_counter()
+        try:
+            timings, extra = fn(item)
+        except Exception as e:
+            # e.g. 503 from /listen admission control at 16 clients
+            with lock:
+                key = f"{type(e).__name__}: {e}"
+                errors[key] = errors.get(key, 0) + 1
+            return
+        total = (time.perf_counter() - start) * 1000
+        with lock:
+            samples.append((total, timings, extra))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(one, work))
+    wall = time.perf_counter() - start
+
+    report = _collect(samples)
+    report = {
+        "clients": clients,
+        "requests": requests,
+        "throughput_rps": round(len(samples) / wall, 2) if wall else None,
+        "errors": errors,
+        **report,
+    }
+    return report
+
+
+def run_levels(name, fn, items, levels, rounds):
+    print(f"[BENCH] {name}: warmup")
+    for item in items:
+        fn(item)
+
+    results = []
+    for clients in levels:
+        requests = max(len(items) * rounds, clients * 2)
+        print(f"[BENCH] {name}: {clients} clients × {requests} requests")
+        results.append(_load_level(fn, items, clients, requests))
+    return results
+
+
+# --------------------------------------------------
+# In-process targets
+# --------------------------------------------------
+
+def make_pipeline(stub):
+    if stub:
+        from bench.stubs import StubPipeline
+        return StubPipeline(debug=False, play_audio=False)
+    from pipeline import AssistantPipeline
+    return AssistantPipeline(debug=False, play_audio=False)
+
+
+def pipeline_target(assistant, with_tts):
+    def fn(clip):
+        result = assistant.run(clip["samples"])
+        return result["timings"], None
+    return fn
+
+
+def text_target(assistant, with_tts):
+    def fn(query):
+        lang, text, _ = query
+        result = assistant.run_text(text, lang=lang, speak=with_tts)
+        return result["timings"], None
+    return fn
+
+
+# --------------------------------------------------
+# /listen over HTTP
+# --------------------------------------------------
+
+def _multipart(field, filename, data, content_type):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode("utf-8") + data + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def listen_target(url):
+    def fn(clip):
+        body, content_type = _multipart("audio", f"{clip['id']}.wav", clip["wav"], "audio/wav")
+        req = urllib.request.Request(
+            f"{url}/listen", data=body, method="POST", headers={"Content-Type": content_type}
+        )
+        start = time.perf_counter()
+        first_audio = None
+        timings = None
+        with urllib.request.urlopen(req, timeout=600) as resp:
+            for line in resp:
+                if not line.strip():
+                    continue
+                msg = json.loads(line)
+                if msg["type"] == "audio" and first_audio is None:
+                    first_audio = (time.perf_counter() - start) * 1000
+                elif msg["type"] == "result":
+                    timings = msg["data"].get("timings")
+                elif msg["type"] == "error":
+                    raise RuntimeError(msg.get("text"))
+        extra = {"first_audio_ms": first_audio} if first_audio is not None else None
+        return timings, extra
+    return fn
+
+
+def stream_target(url, speed=1.0, frame_ms=100, tail_seconds=2.0):
+    from websockets.sync.client import connect
+
+    ws_url = "ws" + url[len("http"):] + "/listen/stream"
+    frame = SAMPLE_RATE * frame_ms // 1000
+
+    def fn(clip):
+        speech = (np.clip(clip["samples"], -1, 1) * 32767).astype("<i2")
+        pcm = np.concatenate([speech, np.zeros(int(tail_seconds * SAMPLE_RATE), dtype="<i2")])
+        sent = {}
+        endpoint = threading.Event()
+
+        with connect(ws_url, max_size=None) as ws:
+            msg = json.loads(ws.recv())
+            if msg["type"] != "listening":
+                raise RuntimeError(msg.get("text"))
+
+            def send():
+                start = time.perf_counter()
+                try:
+                    for i in range(0, len(pcm), frame):
+                        if endpoint.is_set():
+                            return
+                        ws.send(pcm[i:i + frame].tobytes())
+                        if i + frame >= len(speech) and "speech_end" not in sent:
+                            sent["speech_end"] = time.perf_counter()
+                        # Pace like a microphone would
+                        delay = start + (i + frame) / SAMPLE_RATE / speed - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+                    ws.send(json.dumps({"type": "stop"}))
+                except Exception:
+                    pass  # the server closed the stream
+
+            sender = threading.Thread(target=send, daemon=True)
+            sender.start()
+
+            marks, timings = {}, None
+            for raw in ws:
+                msg = json.loads(raw)
+                now = time.perf_counter()
+                if msg["type"] == "endpoint":
+                    endpoint.set()
+                elif msg["type"] in ("answer", "audio") and msg["type"] not in marks:
+                    marks[msg["type"]] = now
+                elif msg["type"] == "result":
+                    timings = msg["data"].get("timings")
+                elif msg["type"] == "error":
+                    raise RuntimeError(msg.get("text"))
+            endpoint.set()
+            sender.join()
+
+        extra = {}
+        if "speech_end" in sent:
+            if "answer" in marks:
+                extra["end_of_speech_to_answer_ms"] = (marks["answer"] - sent["speech_end"]) * 1000
+            if "audio" in marks:
+                extra["end_of_speech_to_first_audio_ms"] = (marks["audio"] - sent["speech_end"]) * 1000
+        return timings, extra
+    return fn
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(stub, timeout=900):
+    port = _free_port()
+    env = dict(os.environ)
+    if stub:
+        env["H2H_STUB_MODELS"] = "1"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"{url}/readyz", timeout=2) as resp:
+                if resp.status == 200:
+                    return proc, url
+        except OSError:
+            pass
+        time.sleep(0.5)
+
+    proc.terminate()
+    raise RuntimeError("server did not become ready")
+
+
+# --------------------------------------------------
+# Report
+# --------------------------------------------------
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def print_baseline(report, baseline):
+    print(f"\n[BENCH] vs baseline {baseline['meta'].get('commit')} (p50 / p95 ms, lowest client count)")
+    for target, levels in report["targets"].items():
+        old_levels = baseline.get("targets", {}).get(target)
+        if not old_levels or not levels:
+            continue
+        new, old = levels[0], old_levels[0]
+        rows = [("end_to_end", new["latency_ms"], old["latency_ms"])]
+        rows += [
+            (stage, stats, old["stages_ms"].get(stage))
+            for stage, stats in new["stages_ms"].items()
+        ]
+        print(f"  {target}:")
+        for stage, cur, prev in rows:
+            if not cur or not prev:
+                continue
+            ratio = f"×{cur['p50'] / prev['p50']:.2f}" if prev["p50"] else "-"
+            print(f"    {stage:15} {prev['p50']:9.2f} → {cur['p50']:9.2f}   "
+                  f"{prev['p95']:9.2f} → {cur['p95']:9.2f}   {ratio}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hear2Help latency / throughput benchmark")
+    parser.add_argument("--stub", action="store_true", help="stub models (no model files, no torch)")
+    parser.add_argument("--targets", nargs="+", default=["pipeline", "text", "listen"],
+                        choices=["pipeline", "text", "listen", "stream"])
+    parser.add_argument("--clients", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--rounds", type=int, default=2, help="passes over the corpus per client level")
+    parser.add_argument("--url", default=None, help="benchmark an already running server")
+    parser.add_argument("--stream-speed", type=float, default=1.0,
+                        help="stream target: audio sent at this multiple of real time")
+    parser.add_argument("--no-tts", action="store_true", help="skip TTS on the text target")
+    parser.add_argument("--real-clips-only", action="store_true",
+                        help="skip clips whose WAV is missing instead of using placeholders")
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="earlier report to compare against")
+    args = parser.parse_args()
+
+    clips = corpus.load_clips(include_placeholders=not args.real_clips_only)
+    queries = corpus.text_queries()
+    if not clips and {"pipeline", "listen", "stream"} & set(args.targets):
+        parser.error("no clips available (run python -m bench.corpus build)")
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "stub": args.stub,
+            "tier": os.environ.get("H2H_INFERENCE_TIER", "fp32"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "clips": len(clips),
+            "placeholder_clips": sum(c["placeholder"] for c in clips),
+            "text_queries": len(queries),
+        },
+        "targets": {},
+    }
+
+    in_process = {"pipeline", "text"} & set(args.targets)
+    if in_process:
+        assistant = make_pipeline(args.stub)
+        if "pipeline" in args.targets:
+            report["targets"]["pipeline"] = run_levels(
+                "pipeline", pipeline_target(assistant, True), clips, args.clients, args.rounds
+            )
+        if "text" in args.targets:
+            report["targets"]["text"] = run_levels(
+                "text", text_target(assistant, not args.no_tts), queries, args.clients, args.rounds
+            )
+        report["peak_rss_mb"] = process_memory().get("peak_rss_mb")
+
+    if {"listen", "stream"} & set(args.targets):
+        proc, url = (None, args.url) if args.url else start_server(args.stub)
+        try:
+            if "listen" in args.targets:
+                report["targets"]["listen"] = run_levels(
+                    "listen", listen_target(url), clips, args.clients, args.rounds
+                )
+            if "stream" in args.targets:
+                report["targets"]["stream"] = run_levels(
+                    "stream", stream_target(url, args.stream_speed), clips, args.clients, args.rounds
+                )
+            if proc is not None:
+                report["server_peak_rss_mb"] = process_memory(proc.pid).get("peak_rss_mb")
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait()
+
+    payload = json.dumps(report, indent=2)
+    print(payload)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(payload)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            print_baseline(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Stub models for benchmarking non-model overhead.
+
+StubPipeline is an AssistantPipeline whose speech, intent-embedding and
+TTS components answer from the benchmark corpus instantly instead of
+running Whisper, IndicConformer, IndicTrans2, MiniLM or Parler-TTS.
+Everything else is the real code: decoding, the gazetteer, routing,
+TrainService, the formatter, translation memory, logging, the scheduler
+and NDJSON streaming. No model files or torch are needed.
+
+Start the server with stubs by setting H2H_STUB_MODELS=1.
+"""
+
+import hashlib
+import re
+import tempfile
+
+import numpy as np
+
+from bench import corpus
+from core.audio_io import AudioBuffer
+from core.translation_memory import TranslationMemory
+from core.vad import trim_silence
+from pipeline import AssistantPipeline
+
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class HashingEncoder:
+    """Bag of hashed words and character trigrams; stands in for MiniLM."""
+
+    name = "stub-hashing-encoder"
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def _embed(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for word in _WORD_RE.findall(text.lower()):
+            grams = [word] + [word[i:i + 3] for i in range(max(1, len(word) - 2))]
+            for gram in grams:
+                digest = hashlib.md5(gram.encode("utf-8")).digest()
+                vec[int.from_bytes(digest[:4], "little") % self.dim] += 1.0
+        return vec
+
+    def encode(self, texts, normalize_embeddings=False, **kwargs):
+        single = isinstance(texts, str)
+        matrix = np.stack([self._embed(t) for t in ([texts] if single else texts)])
+        if normalize_embeddings:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.maximum(norms, 1e-9)
+        return matrix[0] if single else matrix
+
+
+class _StubDenoiser:
+    enabled = False
+    mode = "stub"
+
+
+class StubSpeechUnit:
+    """Looks clips up in the corpus by content; unknown audio is English."""
+
+    whisper_backend = "stub"
+
+    def __init__(self):
+        self.denoiser = _StubDenoiser()
+        self._clips = {}
+        for c in corpus.load_clips():
+            # run() hands the speech stages VAD-trimmed audio
+            self._clips[corpus.samples_key(c["samples"])] = c
+            self._clips[corpus.samples_key(trim_silence(c["samples"])[0].samples)] = c
+        self._english = {c["transcript"]: c["english"] for c in corpus.entries()}
+        self._langs = {c["transcript"]: c["lang"] for c in corpus.entries()}
+
+    def _clip(self, audio):
+        return self._clips.get(corpus.samples_key(AudioBuffer.from_source(audio).samples))
+
+    def preprocess_audio(self, audio_path):
+        return AudioBuffer.from_source(audio_path)
+
+    def detect_language(self, audio_path):
+        clip = self._clip(audio_path)
+        return clip["lang"] if clip else "en"
+
+    def speech_to_text(self, audio_path, lang):
+        clip = self._clip(audio_path)
+        return clip["transcript"] if clip else "When is the next train?"
+
+    def partial_transcribe(self, audio_path, lang):
+        clip = self._clip(audio_path)
+        return clip["transcript"] if clip else ""
+
+    def speculative_transcribe(self, audio_path, **kwargs):
+        lang = self.detect_language(audio_path)
+        return lang, self.speech_to_text(audio_path, lang), {}
+
+    def translate_to_english(self, text, lang=None):
+        return self._english.get(text, text)
+
+    def guess_language(self, text):
+        return self._langs.get(text, "en")
+
+    def asr_metrics(self):
+        return {}
+
+
+class StubOutputUnit:
+    """Identity translation through a throwaway TranslationMemory; silent audio."""
+
+    SAMPLE_RATE = 16000
+
+    def __init__(self):
+        self._cache_dir = tempfile.mkdtemp(prefix="h2h-stub-tm-")
+        self.translation_memory = TranslationMemory(lambda text, src, tgt: text, cache_dir=self._cache_dir)
+        self.cache = None
+        self.ready = True
+
+    def translate_back(self, text, lang, template=None):
+        if not text or lang in (None, "en", "english"):
+            return text
+        if template is not None:
+            translated = self.translation_memory.render(template[0], template[1], lang)
+            if translated is not None:
+                return translated
+        return text
+
+    def cached_audio(self, text, lang):
+        return None
+
+    def speak(self, text, lang, on_chunk=None):
+        if not text:
+            return None
+        # ~60 ms of silence per character keeps WAV encoding realistic
+        audio = np.zeros(min(len(text) * 960, 15 * self.SAMPLE_RATE), dtype=np.float32)
+        if on_chunk is not None:
+            on_chunk({"index": 0, "text": text, "audio": audio, "sample_rate": self.SAMPLE_RATE})
+        return None
+
+
+class StubPipeline(AssistantPipeline):
+    def _register_components(self):
+        from core.nlp import NLPDecisionUnit
+
+        def noop():
+            return True
+
+        (self.loader
+            .add("output", StubOutputUnit)
+            .add("nlp", lambda: NLPDecisionUnit(model=HashingEncoder()))
+            .add("speech", StubSpeechUnit)
+            .add("translation", noop)
+            .add("whisper", noop)
+            .add("indic", noop)
+            .add("demucs", noop)
+            .add("tts", noop))
+
+    def _guess_language(self, text):
+        return self.speech.guess_language(text)
+
+    def _translate_to_english(self, texts, lang):
+        return [self.speech.translate_to_english(t, lang) for t in texts]
@@ -0,0 +1,151 @@
+"""
+Compare a quantized inference tier against the float32 baseline.
+
+Runs language ID, ASR and intent classification for a fixed set of clips
+(and a built-in set of text queries) under fp32 and the chosen tier, then
+prints per-stage latency and output agreement as JSON:
+
+    python compare_tiers.py --clips data/eval_clips --tier int8
+    python compare_tiers.py --clips data/eval_clips --tier onnx --tts
+
+Clips are run without denoising so both tiers see identical audio, and
+without ASR micro-batching (the shared batcher is bound to one tier).
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+
+os.environ["H2H_ASR_BATCHING"] = "0"
+
+from rapidfuzz import fuzz
+
+from core.audio_io import AudioBuffer
+from core.inference_tier import TIERS
+
+
+TEXT_QUERIES = [
+    "When is the next train to Ernakulam?",
+    "Trains from Thrippunithura to Kottayam",
+    "What is the route of train 16301?",
+    "Is the Venad Express running late?",
+    "Check my PNR status",
+    "How much is the ticket to Aluva?",
+    "next train to Alleppey please",
+    "show me trains between Ernakulam and Thrissur",
+]
+
+TTS_TEXTS = [
+    "The next train to Ernakulam leaves at 10:15.",
+    "Ticket to Aluva costs 20 rupees.",
+]
+
+
+def _summary(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 1),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+def _timed(timings, stage, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    timings.setdefault(stage, []).append(time.perf_counter() - start)
+    return result
+
+
+def run_tier(tier, clips, with_tts=False):
+    from core.speech import SpeechUnit
+    from core.nlp import NLPDecisionUnit
+    # The baseline is always openai-whisper in float32
+    backend = "openai" if tier == "fp32" else "faster-whisper"
+    speech = SpeechUnit(tier=tier, whisper_backend=backend, denoise=False)
+    nlp = NLPDecisionUnit(tier=tier)
+
+    timings = {}
+    outputs = {"clips": {}, "texts": {}}
+
+    for path in clips:
+        audio = AudioBuffer.from_source(path)
+        lang = _timed(timings, "lid", speech.detect_language, audio)
+        text = _timed(timings, "asr", speech.speech_to_text, audio, lang)
+        intent = _timed(timings, "intent", nlp.extract_intent, text)
+        outputs["clips"][os.path.basename(path)] = {"lang": lang, "text": text, "intent": intent}
+
+    for query in TEXT_QUERIES:
+        outputs["texts"][query] = _timed(timings, "intent", nlp.extract_intent, query)
+
+    if with_tts:
+        from core.output import OutputUnit
+        output = OutputUnit(play_audio=False, tier=tier)
+        for text in TTS_TEXTS:
+            _timed(timings, "tts", output._synthesize, text, "en")
+
+    return {stage: _summary(samples) for stage, samples in timings.items()}, outputs
+
+
+def agreement(baseline, candidate):
+    clips = baseline["clips"].keys() & candidate["clips"].keys()
+    texts = baseline["texts"].keys() & candidate["texts"].keys()
+
+    lid = [baseline["clips"][c]["lang"] == candidate["clips"][c]["lang"] for c in clips]
+    similarity = [
+        fuzz.ratio(baseline["clips"][c]["text"], candidate["clips"][c]["text"]) for c in clips
+    ]
+    intents = [baseline["clips"][c]["intent"] == candidate["clips"][c]["intent"] for c in clips]
+    intents += [baseline["texts"][t] == candidate["texts"][t] for t in texts]
+
+    def ratio(values):
+        return round(sum(values) / len(values), 3) if values else None
+
+    return {
+        "lid_agreement": ratio(lid),
+        "transcript_similarity": round(statistics.fmean(similarity) / 100, 3) if similarity else None,
+        "intent_agreement": ratio(intents),
+        "clips": len(clips),
+        "texts": len(texts),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and agreement of an inference tier vs fp32")
+    parser.add_argument("--clips", default="data/eval_clips", help="directory of test clips")
+    parser.add_argument("--tier", choices=[t for t in TIERS if t != "fp32"], default="int8")
+    parser.add_argument("--tts", action="store_true", help="also time Parler-TTS synthesis")
+    parser.add_argument("--out", default=None, help="write the JSON report here as well")
+    args = parser.parse_args()
+
+    clips = sorted(
+        p for p in glob.glob(os.path.join(args.clips, "*"))
+        if p.lower().endswith((".wav", ".webm", ".mp3", ".ogg", ".flac", ".m4a"))
+    )
+    print(f"[COMPARE] {len(clips)} clips, {len(TEXT_QUERIES)} text queries")
+
+    base_latency, base_outputs = run_tier("fp32", clips, args.tts)
+    tier_latency, tier_outputs = run_tier(args.tier, clips, args.tts)
+
+    report = {
+        "tier": args.tier,
+        "latency": {"fp32": base_latency, args.tier: tier_latency},
+        "agreement": agreement(base_outputs, tier_outputs),
+        "outputs": {"fp32": base_outputs, args.tier: tier_outputs},
+    }
+
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    print(payload)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from core.metrics import REGISTRY
+from core.config import ANSWER_CACHE_SIZE, ANSWER_CACHE_MAX_SECONDS
+
+
+LOOKUPS = REGISTRY.counter(
+    "h2h_answer_cache_lookups_total", "Answer cache lookups", labels=("action", "outcome")
+)
+
+
+class AnswerCache:
+    """
+    Final answers (translated text + TTS path) keyed by the routed
+    request and the answer language, so "next train to Ernakulam" asked
+    in any wording or language after route_intent skips the service,
+    formatter, translation and TTS.
+
+    Each entry expires at `valid_until(request, now)` (the next departure
+    boundary for timetable answers) or after `max_seconds`, whichever is
+    first. Least recently used entries go beyond `max_entries`.
+    """
+
+    def __init__(self, valid_until, max_entries=ANSWER_CACHE_SIZE, max_seconds=ANSWER_CACHE_MAX_SECONDS):
+        self.valid_until = valid_until
+        self.max_entries = max_entries
+        self.max_seconds = max_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {}
+
+        REGISTRY.gauge(
+            "h2h_answer_cache_hit_ratio", "Answer cache hits / lookups per action", labels=("action",),
+            fn=self.hit_ratios,
+        )
+        REGISTRY.gauge("h2h_answer_cache_entries", "Answers currently cached", fn=lambda: len(self._entries))
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(request, lang):
+        return json.dumps([request, lang], sort_keys=True, ensure_ascii=False, default=str)
+
+    def _count(self, action, outcome):
+        LOOKUPS.inc(action=action, outcome=outcome)
+        with self._lock:
+            counts = self._counts.setdefault(action, {"hit": 0, "miss": 0})
+            counts[outcome] += 1
+
+    def get(self, request, lang, now=None):
+        """The cached {"text", "audio", "expires"} or None."""
+        if not self.enabled:
+            return None
+        action = str(request.get("action"))
+        now = now or datetime.now()
+        key = self.key(request, lang)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires"] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        self._count(action, "hit" if entry is not None else "miss")
+        if entry is None:
+            return None
+        # A TTS file may have been swept since it was cached
+        if entry["audio"] and not os.path.exists(entry["audio"]):
+            entry["audio"] = None
+        return entry
+
+    def put(self, request, lang, text, audio=None, now=None):
+        if not self.enabled:
+            return
+        now = now or datetime.now()
+        expires = now + timedelta(seconds=self.max_seconds)
+        boundary = self.valid_until(request, now)
+        if boundary is not None:
+            expires = min(expires, boundary)
+        if expires <= now:
+            return
+
+        key = self.key(request, lang)
+        with self._lock:
+            self._entries[key] = {"text": text, "audio": audio, "expires": expires}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def hit_ratios(self):
+        with self._lock:
+            return {
+                (action,): c["hit"] / (c["hit"] + c["miss"])
+                for action, c in self._counts.items() if c["hit"] + c["miss"]
+            }
+
+    def stats(self):
+        with self._lock:
+            counts = {action: dict(c) for action, c in self._counts.items()}
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "actions": {
+                action: {**c, "hit_ratio": round(c["hit"] / (c["hit"] + c["miss"]), 3)}
+                for action, c in counts.items() if c["hit"] + c["miss"]
+            },
+        }
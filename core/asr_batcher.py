@@ -0,0 +1,204 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+import torch
+from core import tracing
+
+
+def _run(part, outputs, **inputs):
+    """Call a TorchScript module or an ONNX Runtime session with named inputs."""
+    if hasattr(part, "run"):
+        return part.run(outputs, {k: v.cpu().numpy() for k, v in inputs.items()})
+    return part(**inputs)
+
+
+class _Request:
+    def __init__(self, samples, lang, bucket):
+        self.samples = samples
+        self.lang = lang
+        self.bucket = bucket
+        self.enqueued = time.perf_counter()
+        self.batch_size = 1
+        self.future = Future()
+
+
+class BatchingASRExecutor:
+    """
+    Collects concurrent IndicConformer requests for up to `window_ms`,
+    groups them by (language, length bucket), zero-pads each group into one
+    tensor and runs a single CTC forward per group. Every stage gets the
+    true length of each item and each item's logits are cut to its own
+    frame count before decoding, so padding never reaches the transcript.
+    Callers block on transcribe() and get only their own transcript back.
+    """
+
+    def __init__(self, load_model, device, window_ms=30, max_batch=8,
+                 bucket_seconds=2.0, sample_rate=16000):
+        self._load_model = load_model
+        self.device = device
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.bucket_samples = max(1, int(bucket_seconds * sample_rate))
+
+        # None until the first batch is checked against unbatched decoding
+        self._verified = None
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "max_batch_size": 0,
+            "total_wait_s": 0.0,
+            "max_wait_s": 0.0,
+            "batch_fallbacks": 0,
+        }
+
+        self._thread = threading.Thread(target=self._loop, name="asr-batcher", daemon=True)
+        self._thread.start()
+
+    # ---------------------------------------
+    # Public API
+    # ---------------------------------------
+    def transcribe(self, samples, lang):
+        bucket = len(samples) // self.bucket_samples
+        req = _Request(np.asarray(samples, dtype=np.float32), lang, bucket)
+        self._queue.put(req)
+        text = req.future.result()
+        tracing.count(batch_size=req.batch_size)
+        return text
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats["batches"] or 1
+        requests = stats["requests"] or 1
+        stats["avg_batch_size"] = stats["requests"] / batches
+        stats["avg_wait_ms"] = stats["total_wait_s"] / requests * 1000
+        stats["max_wait_ms"] = stats.pop("max_wait_s") * 1000
+        stats.pop("total_wait_s")
+        return stats
+
+    # ---------------------------------------
+    # Dispatcher
+    # ---------------------------------------
+    def _loop(self):
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.perf_counter() + self.window
+
+            while len(pending) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            groups = {}
+            for req in pending:
+                groups.setdefault((req.lang, req.bucket), []).append(req)
+
+            for (lang, _), reqs in groups.items():
+                self._run_group(lang, reqs)
+
+    def _run_group(self, lang, reqs):
+        started = time.perf_counter()
+        waits = [started - r.enqueued for r in reqs]
+
+        try:
+            texts = self._forward(lang, [r.samples for r in reqs])
+        except Exception as e:
+            for r in reqs:
+                r.future.set_exception(e)
+            return
+
+        with self._lock:
+            self._stats["requests"] += len(reqs)
+            self._stats["batches"] += 1
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(reqs))
+            self._stats["total_wait_s"] += sum(waits)
+            self._stats["max_wait_s"] = max(self._stats["max_wait_s"], max(waits))
+
+        for r, text in zip(reqs, texts):
+            r.batch_size = len(reqs)
+            r.future.set_result(text)
+
+    def _forward(self, lang, batch):
+        model = self._load_model()
+
+        if len(batch) == 1 or not self._batchable(model):
+            return [self._single(model, s, lang) for s in batch]
+
+        max_len = max(len(s) for s in batch)
+        padded = np.zeros((len(batch), max_len), dtype=np.float32)
+        for i, s in enumerate(batch):
+            padded[i, :len(s)] = s
+        lengths = torch.tensor([len(s) for s in batch])
+
+        try:
+            with torch.inference_mode():
+                texts = self._batched_ctc(model, torch.from_numpy(padded), lengths, lang)
+            if not self._verified:
+                self._verify(model, batch, lang, texts)
+            if self._verified:
+                return texts
+        except Exception as e:
+            print(f"[ASR BATCH] Batched forward failed ({e}), running per utterance")
+
+        # Model build without batch support: still serve every caller
+        with self._lock:
+            self._stats["batch_fallbacks"] += 1
+        return [self._single(model, s, lang) for s in batch]
+
+    def _batchable(self, model):
+        """
+        Padding is only safe when every stage is told each item's length;
+        the model's own forward() assumes a single unpadded utterance.
+        """
+        if self._verified is False:
+            return False
+        parts = getattr(model, "models", None) or {}
+        return all(k in parts for k in ("preprocessor", "encoder", "ctc_decoder")) \
+            and hasattr(model, "language_masks") and hasattr(model, "vocab")
+
+    def _batched_ctc(self, model, padded, lengths, lang):
+        """Greedy CTC per item, each cut to its own frame count."""
+        parts = model.models
+        features, feature_lengths = parts["preprocessor"](
+            input_signal=padded.to(self.device), length=lengths.to(self.device)
+        )
+        encoded, encoded_lengths = _run(
+            parts["encoder"], ["outputs", "encoded_lengths"],
+            audio_signal=features, length=feature_lengths,
+        )
+        logprobs = _run(parts["ctc_decoder"], ["logprobs"], encoder_output=encoded)[0]
+        logprobs = torch.as_tensor(logprobs)[:, :, model.language_masks[lang]]
+
+        blank = model.config.BLANK_ID
+        vocab = model.vocab[lang]
+        texts = []
+        for i, n in enumerate(torch.as_tensor(encoded_lengths).tolist()):
+            ids = torch.unique_consecutive(logprobs[i, :int(n)].argmax(dim=-1))
+            texts.append("".join(vocab[x] for x in ids.tolist() if x != blank).replace("▁", " ").strip())
+        return texts
+
+    def _verify(self, model, batch, lang, texts):
+        """
+        The first batch is decoded once more per utterance; batching stays
+        on only if every transcript matches the batch-size-1 output.
+        """
+        single = [self._single(model, s, lang) for s in batch]
+        self._verified = single == texts
+        if not self._verified:
+            print(f"[ASR BATCH] Batched transcripts differ from per-utterance ones "
+                  f"({texts} vs {single}); batching disabled")
+
+    def _single(self, model, samples, lang):
+        wav_tensor = torch.from_numpy(samples).unsqueeze(0).to(self.device)
+        with torch.inference_mode():
+            result = model(wav_tensor, lang, "ctc")
+        return result[0].strip() if isinstance(result, list) else str(result).strip()
@@ -0,0 +1,105 @@
+import io
+import numpy as np
+import av
+import soundfile as sf
+
+
+# Every model in the pipeline expects 16 kHz mono
+SAMPLE_RATE = 16000
+
+
+def decode_audio_bytes(data: bytes, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode an in-memory WebM/Ogg/Opus (or any container PyAV can read)
+    to mono float32 at `sr`, without ffmpeg subprocesses or temp files.
+    """
+    chunks = []
+    with av.open(io.BytesIO(data)) as container:
+        stream = next(s for s in container.streams if s.type == "audio")
+        resampler = av.AudioResampler(format="flt", layout="mono", rate=sr)
+
+        for frame in container.decode(stream):
+            # Browser recordings often carry broken timestamps
+            frame.pts = None
+            for out in resampler.resample(frame):
+                chunks.append(out.to_ndarray().reshape(-1))
+
+        for out in resampler.resample(None):
+            chunks.append(out.to_ndarray().reshape(-1))
+
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(chunks).astype(np.float32, copy=False)
+
+
+def wav_bytes(samples, sr: int) -> bytes:
+    """Encode float samples as an in-memory 16-bit PCM WAV."""
+    buf = io.BytesIO()
+    sf.write(buf, np.asarray(samples, dtype=np.float32), sr, format="WAV", subtype="PCM_16")
+    return buf.getvalue()
+
+
+def load_audio(source, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Accept a file path, an AudioBuffer or a decoded 16 kHz mono array."""
+    if isinstance(source, AudioBuffer):
+        return source.samples
+
+    if isinstance(source, np.ndarray):
+        return np.asarray(source, dtype=np.float32).reshape(-1)
+
+    with open(source, "rb") as f:
+        return decode_audio_bytes(f.read(), sr)
+
+
+# --------------------------------------------------
+# Decode-once audio shared by every speech stage
+# --------------------------------------------------
+
+class AudioBuffer:
+    """
+    One request's audio, decoded once. Derived representations (Whisper
+    log-mel, duration, energy stats) are computed lazily and cached, so
+    every stage that receives the same buffer reuses them.
+    """
+
+    def __init__(self, samples, sample_rate: int = SAMPLE_RATE, source=None):
+        self.samples = np.ascontiguousarray(samples, dtype=np.float32).reshape(-1)
+        self.sample_rate = sample_rate
+        self.source = source
+        self._mels = {}
+        self._stats = None
+
+    @classmethod
+    def from_source(cls, source):
+        """Wrap a path, a NumPy array or an existing AudioBuffer."""
+        if isinstance(source, AudioBuffer):
+            return source
+        if isinstance(source, np.ndarray):
+            return cls(source)
+        return cls(load_audio(source), source=source)
+
+    def with_samples(self, samples):
+        """New buffer for a transformed signal (e.g. denoised vocals)."""
+        return AudioBuffer(samples, self.sample_rate, source=self.source)
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / float(self.sample_rate)
+
+    def stats(self) -> dict:
+        if self._stats is None:
+            if len(self.samples):
+                rms = float(np.sqrt(np.mean(np.square(self.samples))))
+                peak = float(np.max(np.abs(self.samples)))
+            else:
+                rms = peak = 0.0
+            self._stats = {"duration": self.duration, "rms": rms, "peak": peak}
+        return self._stats
+
+    def log_mel(self, n_mels: int = 80):
+        """Whisper's 30 s padded/trimmed log-mel spectrogram (torch tensor)."""
+        if n_mels not in self._mels:
+            import whisper
+            audio = whisper.pad_or_trim(self.samples)
+            self._mels[n_mels] = whisper.log_mel_spectrogram(audio, n_mels)
+        return self._mels[n_mels]
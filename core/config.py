@@ -0,0 +1,256 @@
+import os
+
+
+def _env_flag(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _retention(name, max_age_hours, max_mb, max_files):
+    """H2H_<NAME>_MAX_AGE_HOURS / _MAX_MB / _MAX_FILES; 0 means unlimited."""
+    return {
+        "max_age_hours": float(os.environ.get(f"H2H_{name}_MAX_AGE_HOURS", max_age_hours)),
+        "max_mb": float(os.environ.get(f"H2H_{name}_MAX_MB", max_mb)),
+        "max_files": int(os.environ.get(f"H2H_{name}_MAX_FILES", max_files)),
+    }
+
+
+# --------------------------------------------------
+# Audio ingest
+# --------------------------------------------------
+
+# Keep a copy of every uploaded recording under data/recordings
+SAVE_RECORDINGS = _env_flag("H2H_SAVE_RECORDINGS", False)
+# Share of uploads kept when saving recordings (QA sampling)
+RECORDING_SAMPLE_PERCENT = float(os.environ.get("H2H_RECORDING_SAMPLE_PERCENT", "100"))
+
+
+# --------------------------------------------------
+# Voice activity detection (before denoise and ASR)
+# --------------------------------------------------
+
+# Trim leading/trailing silence and answer silent recordings without models
+VAD_ENABLED = _env_flag("H2H_VAD_ENABLED", True)
+VAD_FRAME_MS = int(os.environ.get("H2H_VAD_FRAME_MS", "30"))
+# Frames quieter than this (dBFS) are never speech
+VAD_MIN_DB = float(os.environ.get("H2H_VAD_MIN_DB", "-50"))
+# Speech must be this much louder than the recording's noise floor
+VAD_MARGIN_DB = float(os.environ.get("H2H_VAD_MARGIN_DB", "12"))
+# Less voiced audio than this is treated as no speech at all
+VAD_MIN_SPEECH_MS = int(os.environ.get("H2H_VAD_MIN_SPEECH_MS", "250"))
+# Context kept around the speech region
+VAD_PAD_MS = int(os.environ.get("H2H_VAD_PAD_MS", "200"))
+
+
+# --------------------------------------------------
+# Streaming recognition (/listen/stream)
+# --------------------------------------------------
+
+# Trailing silence that ends an utterance
+STREAM_ENDPOINT_MS = int(os.environ.get("H2H_STREAM_ENDPOINT_MS", "700"))
+# New audio between partial transcripts while the user is speaking
+STREAM_PARTIAL_MS = int(os.environ.get("H2H_STREAM_PARTIAL_MS", "600"))
+# Speech needed before Whisper language ID runs on the stream
+STREAM_LID_SECONDS = float(os.environ.get("H2H_STREAM_LID_SECONDS", "1.5"))
+# Utterances are cut here, and streams without speech are ended here
+STREAM_MAX_SECONDS = float(os.environ.get("H2H_STREAM_MAX_SECONDS", "15"))
+STREAM_NO_SPEECH_SECONDS = float(os.environ.get("H2H_STREAM_NO_SPEECH_SECONDS", "6"))
+# A client that sends nothing for this long is treated as having stopped
+STREAM_IDLE_SECONDS = float(os.environ.get("H2H_STREAM_IDLE_SECONDS", "5"))
+# Threads decoding partial transcripts (shared by all streams)
+STREAM_ASR_WORKERS = int(os.environ.get("H2H_STREAM_ASR_WORKERS", "2"))
+# Run Demucs on the finished utterance (costs the partial-transcript reuse)
+STREAM_DENOISE = _env_flag("H2H_STREAM_DENOISE", False)
+
+
+# --------------------------------------------------
+# Denoising (Demucs)
+# --------------------------------------------------
+
+# "inprocess" keeps the model resident; "subprocess" shells out per request
+DENOISE_MODE = os.environ.get("H2H_DENOISE_MODE", "inprocess")
+DENOISE_MODEL = os.environ.get("H2H_DENOISE_MODEL", "mdx_extra_q")
+# Parallel chunk workers for overlap-add inference (0 = run chunks serially)
+DENOISE_THREADS = int(os.environ.get("H2H_DENOISE_THREADS", "0"))
+DENOISE_OVERLAP = float(os.environ.get("H2H_DENOISE_OVERLAP", "0.25"))
+
+
+# --------------------------------------------------
+# Request scheduling (/listen, /listen/stream, /query)
+# --------------------------------------------------
+
+# Pipelines allowed to run at once (they share the same models and cores)
+LISTEN_WORKERS = int(os.environ.get("H2H_LISTEN_WORKERS", "1"))
+# Requests allowed to wait for a worker before we answer 503
+LISTEN_QUEUE_SIZE = int(os.environ.get("H2H_LISTEN_QUEUE_SIZE", "8"))
+
+
+# --------------------------------------------------
+# ASR micro-batching (IndicConformer)
+# --------------------------------------------------
+
+# Only worth it when several pipelines can run at once
+ASR_BATCHING = _env_flag("H2H_ASR_BATCHING", LISTEN_WORKERS > 1)
+ASR_BATCH_WINDOW_MS = float(os.environ.get("H2H_ASR_BATCH_WINDOW_MS", "30"))
+ASR_MAX_BATCH = int(os.environ.get("H2H_ASR_MAX_BATCH", "8"))
+# Utterances are grouped into length buckets of this many seconds
+ASR_BUCKET_SECONDS = float(os.environ.get("H2H_ASR_BUCKET_SECONDS", "2.0"))
+
+
+# --------------------------------------------------
+# Text-to-speech output
+# --------------------------------------------------
+
+# Stream sentence-level audio chunks to /listen clients as they are ready
+TTS_STREAMING = _env_flag("H2H_TTS_STREAMING", True)
+# Longest text piece synthesized in one go when streaming
+TTS_CHUNK_CHARS = int(os.environ.get("H2H_TTS_CHUNK_CHARS", "120"))
+# Play answers on the server's speakers (CLI kiosks); off for the web server
+TTS_SERVER_PLAYBACK = _env_flag("H2H_TTS_SERVER_PLAYBACK", False)
+
+# Content-addressed cache of synthesized answers (0 disables it)
+TTS_CACHE_MAX_MB = float(os.environ.get("H2H_TTS_CACHE_MAX_MB", "512"))
+
+
+# --------------------------------------------------
+# Translation
+# --------------------------------------------------
+
+# "indictrans2" (offline, default) or "google" (deep_translator, network)
+TRANSLATION_BACKEND = os.environ.get("H2H_TRANSLATION_BACKEND", "indictrans2")
+# Retry through Google when the offline engine fails
+TRANSLATION_GOOGLE_FALLBACK = _env_flag("H2H_TRANSLATION_GOOGLE_FALLBACK", True)
+# Converted CTranslate2 int8 models (python -m core.translate convert)
+TRANSLATION_CT2_DIR = os.environ.get("H2H_TRANSLATION_CT2_DIR", "data/models/ct2")
+TRANSLATION_THREADS = int(os.environ.get("H2H_TRANSLATION_THREADS", "4"))
+TRANSLATION_MAX_BATCH = int(os.environ.get("H2H_TRANSLATION_MAX_BATCH", "16"))
+# Translated sentences kept in memory (0 disables)
+TRANSLATION_CACHE_SIZE = int(os.environ.get("H2H_TRANSLATION_CACHE_SIZE", "4096"))
+
+
+# --------------------------------------------------
+# Speculative language ID + ASR
+# --------------------------------------------------
+
+# Decode candidate languages while Whisper language ID is still running
+SPECULATIVE_ASR = _env_flag("H2H_SPECULATIVE_ASR", False)
+# Languages decoded before LID finishes (the deployment's most likely ones)
+SPECULATIVE_LANGS = [
+    l.strip() for l in os.environ.get("H2H_SPECULATIVE_LANGS", "ml").split(",") if l.strip()
+]
+# Whisper candidates (after mapping to supported languages) decoded after LID
+SPECULATIVE_TOP_K = int(os.environ.get("H2H_SPECULATIVE_TOP_K", "2"))
+# Start the Whisper fallback transcription right after LID instead of waiting.
+# Off by default: a losing Whisper decode cannot be stopped once running and
+# holds the Whisper lock (and so other requests' LID) until it finishes
+SPECULATIVE_RACE_WHISPER = _env_flag("H2H_SPECULATIVE_RACE_WHISPER", False)
+
+
+# --------------------------------------------------
+# Inference tier (CPU-only deployments)
+# --------------------------------------------------
+
+# "fp32" (PyTorch eager), "int8" (dynamic quantization) or "onnx"
+INFERENCE_TIER = os.environ.get("H2H_INFERENCE_TIER", "fp32")
+# "openai" or "faster-whisper"; quantized tiers default to faster-whisper
+WHISPER_BACKEND = os.environ.get(
+    "H2H_WHISPER_BACKEND", "openai" if INFERENCE_TIER == "fp32" else "faster-whisper"
+)
+# Exported/converted models (python -m core.inference_tier export)
+MODELS_DIR = os.environ.get("H2H_MODELS_DIR", "data/models")
+
+
+# --------------------------------------------------
+# Startup
+# --------------------------------------------------
+
+# Threads loading models concurrently at boot
+LOADER_WORKERS = int(os.environ.get("H2H_LOADER_WORKERS", "4"))
+# Serve bench.stubs models instead of the real ones (benchmarks / CI)
+STUB_MODELS = _env_flag("H2H_STUB_MODELS", False)
+
+
+# --------------------------------------------------
+# Metrics (/metrics)
+# --------------------------------------------------
+
+# Under serve.py, how often each worker publishes its metrics for the others
+# to merge into /metrics (counts from the last interval may lag a scrape)
+METRICS_SYNC_SECONDS = float(os.environ.get("H2H_METRICS_SYNC_SECONDS", "1.0"))
+
+
+# --------------------------------------------------
+# Text queries (/query, /query/batch)
+# --------------------------------------------------
+
+# Classified utterances kept in memory (0 disables)
+INTENT_CACHE_SIZE = int(os.environ.get("H2H_INTENT_CACHE_SIZE", "4096"))
+# Extracted entities kept per English utterance (0 disables)
+ENTITY_CACHE_SIZE = int(os.environ.get("H2H_ENTITY_CACHE_SIZE", "4096"))
+# Largest /query/batch request accepted
+QUERY_BATCH_MAX = int(os.environ.get("H2H_QUERY_BATCH_MAX", "64"))
+
+
+# --------------------------------------------------
+# Answer cache (after route_intent)
+# --------------------------------------------------
+
+# Final answers kept per (request, language) (0 disables)
+ANSWER_CACHE_SIZE = int(os.environ.get("H2H_ANSWER_CACHE_SIZE", "2048"))
+# Longest an answer is reused; timetable answers also expire at the next departure
+ANSWER_CACHE_MAX_SECONDS = float(os.environ.get("H2H_ANSWER_CACHE_MAX_SECONDS", "3600"))
+
+# Render next-departure answers ahead of time while the server is idle
+PRERENDER_ENABLED = _env_flag("H2H_PRERENDER_ENABLED", True)
+PRERENDER_LANGS = [
+    l.strip() for l in os.environ.get("H2H_PRERENDER_LANGS", "en,hi,ml").split(",") if l.strip()
+]
+# Also render TTS audio (off: text and translations only)
+PRERENDER_TTS = _env_flag("H2H_PRERENDER_TTS", True)
+# Destinations per window, nearest departures first (0 = every reachable one)
+PRERENDER_MAX_DESTINATIONS = int(os.environ.get("H2H_PRERENDER_MAX_DESTINATIONS", "0"))
+# torch intra-op threads while pre-rendering (restored between jobs)
+PRERENDER_TORCH_THREADS = int(os.environ.get("H2H_PRERENDER_TORCH_THREADS", "1"))
+
+
+# --------------------------------------------------
+# Query log (data/logs)
+# --------------------------------------------------
+
+# Write log entries from a background thread (off: write inline, as before)
+LOG_ASYNC = _env_flag("H2H_LOG_ASYNC", True)
+# Entries waiting to be written; beyond this new entries are dropped
+LOG_BUFFER_SIZE = int(os.environ.get("H2H_LOG_BUFFER_SIZE", "10000"))
+# Flush at least this often, or as soon as this many entries are waiting
+LOG_FLUSH_SECONDS = float(os.environ.get("H2H_LOG_FLUSH_SECONDS", "1.0"))
+LOG_FLUSH_ENTRIES = int(os.environ.get("H2H_LOG_FLUSH_ENTRIES", "256"))
+# Rotate queries.log at this size (0 disables) and gzip rotated files
+LOG_ROTATE_MB = float(os.environ.get("H2H_LOG_ROTATE_MB", "64"))
+LOG_COMPRESS = _env_flag("H2H_LOG_COMPRESS", True)
+# Also write one row per query, with per-stage timing columns, to SQLite
+LOG_SQLITE = _env_flag("H2H_LOG_SQLITE", False)
+LOG_SQLITE_PATH = os.environ.get("H2H_LOG_SQLITE_PATH", "data/logs/queries.sqlite3")
+
+
+# --------------------------------------------------
+# Storage lifecycle (core.storage)
+# --------------------------------------------------
+
+# Seconds between retention sweeps (0 disables the background sweeper)
+STORAGE_SWEEP_SECONDS = float(os.environ.get("H2H_STORAGE_SWEEP_SECONDS", "300"))
+# Files younger than this are never deleted for size or count
+STORAGE_GRACE_SECONDS = float(os.environ.get("H2H_STORAGE_GRACE_SECONDS", "60"))
+# Keep ephemeral artifacts (denoised audio, TTS output) in RAM-backed tmpfs.
+# Those paths are outside the /static mount, so use with TTS streaming.
+STORAGE_TMPFS = _env_flag("H2H_STORAGE_TMPFS", False)
+STORAGE_TMPFS_DIR = os.environ.get("H2H_STORAGE_TMPFS_DIR", "/dev/shm/hear2help")
+
+RETENTION = {
+    "recordings": _retention("RECORDINGS", 72, 2048, 5000),
+    "denoised": _retention("DENOISED", 1, 256, 200),
+    "tts": _retention("TTS", 24, 512, 2000),
+    # Rotated query logs only; the live log and SQLite store are kept
+    "logs": _retention("LOGS", 24 * 30, 1024, 0),
+}
@@ -1,22 +1,124 @@
 import os
+import shutil
 import uuid
 import subprocess
 import sys
+import numpy as np
+import soundfile as sf
+import torch
+from core.audio_io import SAMPLE_RATE, AudioBuffer, load_audio
+from core.storage import DIRS
+from core.config import DENOISE_MODE, DENOISE_MODEL, DENOISE_THREADS, DENOISE_OVERLAP
+
+
+# -----------------------------
+# Singleton Model Holder
+# -----------------------------
+_DEMUCS_MODEL = None
 
 
 class DenoiseUnit:
-    def __init__(self, enabled=True, output_dir="data/denoised"):
+    def __init__(self, enabled=True, output_dir=DIRS["denoised"],
+                 mode=DENOISE_MODE, threads=DENOISE_THREADS, overlap=DENOISE_OVERLAP):
     
         self.enabled = enabled
         self.output_dir = output_dir
+        self.mode = mode
+        self.threads = threads
+        self.overlap = overlap
+        self.model_name = DENOISE_MODEL   # keep this in ONE place
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         os.makedirs(self.output_dir, exist_ok=True)
 
-    def denoise(self, audio_path: str) -> str:
+    # -----------------------------
+    # MODEL LOADER (Lazy Singleton)
+    # -----------------------------
+    def _load_model(self):
+        global _DEMUCS_MODEL
+        if _DEMUCS_MODEL is None:
+            from demucs.pretrained import get_model
+            print(f"[LOAD] Demucs {self.model_name} (in-process)...")
+            model = get_model(self.model_name)
+            model.to(self.device)
+            model.eval()
+            _DEMUCS_MODEL = model
+        return _DEMUCS_MODEL
+
+    def denoise(self, audio_path):
+        """
+        In-process mode accepts a path, a 16 kHz mono array or an
+        AudioBuffer and returns the separated vocals in memory (an array for
+        array input, otherwise an AudioBuffer). Subprocess mode, also used
+        as a fallback, returns a path for path input.
+        """
         if not self.enabled:
             return audio_path
 
+        if self.mode == "inprocess":
+            try:
+                return self._denoise_inprocess(audio_path)
+            except Exception as e:
+                print(f"[DENOISE ERROR] In-process Demucs failed ({e}), using subprocess")
+
+        return self._denoise_subprocess(audio_path)
+
+    # -----------------------------
+    # IN-PROCESS (resident model)
+    # -----------------------------
+    def _denoise_inprocess(self, audio_path):
+        import julius
+        from demucs.apply import apply_model
+
+        audio = AudioBuffer.from_source(audio_path)
+        if not len(audio.samples):
+            return audio_path
+
+        model = self._load_model()
+
+        # 16 kHz mono → model rate, duplicated across the model's channels
+        wav = torch.from_numpy(audio.samples)
+        wav = julius.resample_frac(wav, audio.sample_rate, model.samplerate)
+        wav = wav.unsqueeze(0).expand(model.audio_channels, -1)
+
+        # Same normalization as the demucs CLI
+        mean, std = wav.mean(), wav.std() + 1e-8
+        wav = (wav - mean) / std
+
+        with torch.inference_mode():
+            sources = apply_model(
+                model,
+                wav[None],
+                device=self.device,
+                shifts=0,
+                split=True,               # chunked overlap-add inference
+                overlap=self.overlap,
+                num_workers=self.threads,
+                progress=False,
+            )[0]
+
+        vocals = sources[model.sources.index("vocals")] * std + mean
+        vocals = julius.resample_frac(vocals.mean(0).cpu(), model.samplerate, audio.sample_rate)
+        samples = vocals.numpy().astype(np.float32)
+
+        print(f"[DENOISE] Audio enhanced in-process ({audio.duration:.1f}s)")
+
+        if isinstance(audio_path, np.ndarray):
+            return samples
+        return audio.with_samples(samples)
+
+    # -----------------------------
+    # SUBPROCESS (fallback)
+    # -----------------------------
+    def _denoise_subprocess(self, audio_path):
+        original = audio_path
+        in_memory = isinstance(audio_path, (np.ndarray, AudioBuffer))
+        if in_memory:
+            # Demucs CLI only reads files, so hand it a temporary WAV
+            audio_path = os.path.join(self.output_dir, f"input_{uuid.uuid4().hex}.wav")
+            sf.write(audio_path, load_audio(original), SAMPLE_RATE)
+
         try:
-            model_name = "mdx_extra_q"   # keep this in ONE place
+            model_name = self.model_name
 
             subprocess.run(
                 [
@@ -42,7 +144,15 @@ class DenoiseUnit:
 
             if not os.path.exists(generated):
                 print("[DENOISE] Expected output not found, fallback")
-                return audio_path
+                return original
+
+            if in_memory:
+                vocals = load_audio(generated)
+                shutil.rmtree(os.path.dirname(generated), ignore_errors=True)
+                print("[DENOISE] Audio enhanced (in memory)")
+                if isinstance(original, AudioBuffer):
+                    return original.with_samples(vocals)
+                return vocals
 
             out_path = os.path.join(
                 self.output_dir,
@@ -50,10 +160,16 @@ class DenoiseUnit:
             )
 
             os.replace(generated, out_path)
+            # Drop the rest of Demucs' <model>/<name>/ folder (no_vocals.wav)
+            shutil.rmtree(os.path.dirname(generated), ignore_errors=True)
             print(f"[DENOISE] Audio enhanced → {out_path}")
 
             return out_path
 
         except Exception as e:
             print(f"[DENOISE ERROR] {e}")
-            return audio_path
+            return original
+
+        finally:
+            if in_memory and os.path.exists(audio_path):
+                os.remove(audio_path)
@@ -0,0 +1,169 @@
+import re
+from rapidfuzz import process, fuzz, utils
+
+
+WORD_RE = re.compile(r"[A-Za-z]+")
+
+# Longest fuzzy chunk (in words) scored against the station list
+MAX_CHUNK_WORDS = 3
+
+# Minimum token_sort_ratio for a fuzzy chunk to count as a station
+FUZZY_THRESHOLD = 80
+
+# Chunks made only of these words are never scored against stations
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "when", "what", "which", "where",
+    "next", "train", "trains", "to", "from", "for", "at", "of", "in", "on",
+    "and", "or", "me", "my", "i", "please", "today", "tomorrow", "time",
+    "going", "leaving", "starting", "reaching", "towards", "between",
+    "there", "any", "show", "tell", "does", "do", "will", "by",
+}
+
+
+def _sort_tokens(text):
+    return " ".join(sorted(utils.default_process(text).split()))
+
+
+class StationGazetteer:
+    """
+    Prebuilt station matcher.
+
+    Exact station and alias hits come from a word-level trie walked once
+    over the utterance. Remaining 1-3 word chunks are scored against every
+    station in a single rapidfuzz.cdist call instead of one extractOne per
+    chunk.
+    """
+
+    def __init__(self, stations, aliases=None):
+        self.aliases = dict(aliases or {})
+        self.stations = list(stations)
+
+        # token_sort_ratio == ratio on token-sorted strings, so stations are
+        # normalized and token-sorted once here and chunks once per query
+        self._choices = [_sort_tokens(s) for s in self.stations]
+
+        self._trie = {}
+        self._max_words = 1
+        for name in self.stations:
+            self._add(name)
+        for alias in self.aliases:
+            self._add(alias)
+
+        print(f"[GAZETTEER] Indexed {len(self.stations)} stations, {len(self.aliases)} aliases")
+
+    def _add(self, name):
+        tokens = [t.lower() for t in WORD_RE.findall(name)]
+        if not tokens:
+            return
+
+        node = self._trie
+        for tok in tokens:
+            node = node.setdefault(tok, {})
+        node["$"] = name
+        self._max_words = max(self._max_words, len(tokens))
+
+    def _normalize(self, name):
+        return self.aliases.get(name, name)
+
+    # ------------------------------------------------------
+    #                        MATCHING
+    # ------------------------------------------------------
+    def _exact_hits(self, words, text):
+        """Longest trie match starting at every word position."""
+        hits = []
+        for i in range(len(words)):
+            node = self._trie
+            best = None
+            for j in range(i, min(len(words), i + self._max_words)):
+                node = node.get(words[j].group().lower())
+                if node is None:
+                    break
+                if "$" in node:
+                    best = (j, node["$"])
+
+            if best:
+                j, name = best
+                start, end = words[i].start(), words[j].end()
+                hits.append({
+                    "name": self._normalize(name),
+                    "matched": name,
+                    "pos": start,
+                    "end": end,
+                    "chunk": text[start:end].lower(),
+                    "score": 100.0,
+                    "exact": True,
+                })
+        return hits
+
+    def _fuzzy_hits(self, words, text, taken):
+        chunks, spans = [], []
+        for i in range(len(words)):
+            for n in range(1, MAX_CHUNK_WORDS + 1):
+                if i + n > len(words):
+                    break
+                start, end = words[i].start(), words[i + n - 1].end()
+                if any(max(start, ts) < min(end, te) for ts, te in taken):
+                    continue
+                chunk_words = [w.group() for w in words[i:i + n]]
+                if all(w.lower() in STOPWORDS for w in chunk_words):
+                    continue
+                chunks.append(" ".join(chunk_words))
+                spans.append((start, end))
+
+        if not chunks or not self._choices:
+            return []
+
+        scores = process.cdist(
+            [_sort_tokens(c) for c in chunks],
+            self._choices,
+            scorer=fuzz.ratio,
+            processor=None,
+            score_cutoff=FUZZY_THRESHOLD,
+        )
+
+        best_cols = scores.argmax(axis=1)
+        hits = []
+        for row, col in enumerate(best_cols):
+            score = float(scores[row, col])
+            if score <= FUZZY_THRESHOLD:
+                continue
+            name = self.stations[col]
+            start, end = spans[row]
+            hits.append({
+                "name": self._normalize(name),
+                "matched": name,
+                "pos": start,
+                "end": end,
+                "chunk": chunks[row].lower(),
+                "score": score,
+                "exact": False,
+            })
+        return hits
+
+    def match(self, text):
+        """
+        Return non-overlapping station spans in text order.
+
+        Each span is a dict with the canonical "name", the "matched"
+        gazetteer entry, character offsets "pos"/"end", the "chunk" text,
+        its "score" and whether it was an "exact" trie hit.
+        """
+        words = list(WORD_RE.finditer(text))
+        if not words:
+            return []
+
+        exact = self._exact_hits(words, text)
+        taken = [(h["pos"], h["end"]) for h in exact]
+        candidates = exact + self._fuzzy_hits(words, text, taken)
+
+        # Exact hits first, then longest chunks; drop anything overlapping
+        candidates.sort(key=lambda h: (h["exact"], h["end"] - h["pos"]), reverse=True)
+        spans = []
+        taken = []
+        for h in candidates:
+            if not any(max(h["pos"], ts) < min(h["end"], te) for ts, te in taken):
+                spans.append(h)
+                taken.append((h["pos"], h["end"]))
+
+        spans.sort(key=lambda h: h["pos"])
+        return spans
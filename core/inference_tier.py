@@ -0,0 +1,128 @@
+"""
+Model loading for the selectable inference tier.
+
+    fp32  PyTorch eager, float32 (the original behaviour)
+    int8  torch dynamic int8 quantization of every nn.Linear (CPU)
+    onnx  ONNX Runtime where an export exists (MiniLM), int8 elsewhere
+
+Whisper runs through faster-whisper (CTranslate2 int8) on the quantized
+tiers. Export/convert the local artifacts once with:
+
+    python -m core.inference_tier export
+"""
+
+import os
+import sys
+from core.config import MODELS_DIR
+
+TIERS = ("fp32", "int8", "onnx")
+
+WHISPER_SIZE = "tiny"
+
+
+def _check_tier(tier):
+    if tier not in TIERS:
+        raise ValueError(f"Unknown inference tier '{tier}', expected one of {TIERS}")
+
+
+def _require_optimum():
+    """The onnx tier and the MiniLM export run through optimum's ONNX Runtime backend."""
+    try:
+        import optimum.onnxruntime  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "The 'onnx' inference tier needs optimum with ONNX Runtime: "
+            "pip install 'optimum[onnxruntime]'"
+        ) from e
+
+
+def quantize_int8(model):
+    """Dynamic int8 quantization of Linear layers; a no-op off CPU."""
+    import torch
+    device = next(model.parameters(), torch.empty(0)).device
+    if device.type != "cpu":
+        print("[TIER] int8 dynamic quantization needs CPU, keeping float weights")
+        return model
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+# --------------------------------------------------
+# MiniLM (intent embeddings)
+# --------------------------------------------------
+
+def _minilm_onnx_dir(model_name):
+    return os.path.join(MODELS_DIR, "onnx", model_name.replace("/", "_"))
+
+
+def load_sentence_transformer(model_name, tier):
+    from sentence_transformers import SentenceTransformer
+    _check_tier(tier)
+
+    if tier == "onnx":
+        _require_optimum()
+        local = _minilm_onnx_dir(model_name)
+        quantized = os.path.join(local, "onnx", "model_qint8_avx2.onnx")
+        if os.path.exists(quantized):
+            print(f"[TIER] MiniLM ONNX int8 → {quantized}")
+            return SentenceTransformer(
+                local, backend="onnx", model_kwargs={"file_name": "onnx/model_qint8_avx2.onnx"}
+            )
+        print("[TIER] MiniLM ONNX (float) from the hub")
+        return SentenceTransformer(model_name, backend="onnx")
+
+    model = SentenceTransformer(model_name, device="cpu" if tier == "int8" else None)
+    return quantize_int8(model) if tier == "int8" else model
+
+
+# --------------------------------------------------
+# Whisper
+# --------------------------------------------------
+
+def _whisper_ct2_dir():
+    return os.path.join(MODELS_DIR, "ct2", f"whisper-{WHISPER_SIZE}")
+
+
+def load_faster_whisper():
+    from faster_whisper import WhisperModel
+    local = _whisper_ct2_dir()
+    source = local if os.path.isdir(local) else WHISPER_SIZE
+    print(f"[TIER] faster-whisper {source} (int8)")
+    return WhisperModel(source, device="cpu", compute_type="int8")
+
+
+# --------------------------------------------------
+# Export / convert
+# --------------------------------------------------
+
+def export_all():
+    _require_optimum()
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+    from ctranslate2.converters import TransformersConverter
+    from core.nlp import INTENT_MODEL_NAME
+    from core.translate import MODEL_MAP, convert_to_ctranslate2
+
+    # MiniLM → ONNX + int8 ONNX
+    out = _minilm_onnx_dir(INTENT_MODEL_NAME)
+    print(f"[EXPORT] {INTENT_MODEL_NAME} → {out}")
+    model = SentenceTransformer(INTENT_MODEL_NAME, backend="onnx")
+    model.save_pretrained(out)
+    export_dynamic_quantized_onnx_model(model, "avx2", out)
+
+    # Whisper → CTranslate2 int8 for faster-whisper
+    out = _whisper_ct2_dir()
+    print(f"[EXPORT] openai/whisper-{WHISPER_SIZE} → {out}")
+    TransformersConverter(
+        f"openai/whisper-{WHISPER_SIZE}",
+        copy_files=["tokenizer.json", "preprocessor_config.json"],
+    ).convert(out, quantization="int8", force=True)
+
+    # IndicTrans2 → CTranslate2 int8
+    for direction in MODEL_MAP:
+        convert_to_ctranslate2(direction)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] != ["export"]:
+        print("usage: python -m core.inference_tier export")
+        sys.exit(1)
+    export_all()
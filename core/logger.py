@@ -1,10 +1,295 @@
+import argparse
+import atexit
+import gzip
 import json
+import os
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from core.storage import DIRS
+from core.storage import DIRS, timestamp
+from core.metrics import REGISTRY
+from core.config import (
+    LOG_ASYNC,
+    LOG_BUFFER_SIZE,
+    LOG_FLUSH_SECONDS,
+    LOG_FLUSH_ENTRIES,
+    LOG_ROTATE_MB,
+    LOG_COMPRESS,
+    LOG_SQLITE,
+    LOG_SQLITE_PATH,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process, no lock needed
+    fcntl = None
 
 LOG_FILE = f"{DIRS['logs']}/queries.log"
 
-def log_query(raw_text, lang, intent, entities, response):
+# Pipeline stages that get their own column in the SQLite sink
+STAGE_COLUMNS = (
+    "vad", "denoise", "lid", "asr", "translate", "intent", "entities",
+    "service", "format", "translate_back", "tts",
+)
+
+ENTRIES = REGISTRY.counter(
+    "h2h_query_log_entries_total", "Query log entries written", labels=("sink",)
+)
+DROPPED = REGISTRY.counter(
+    "h2h_query_log_dropped_total", "Query log entries dropped because the buffer was full"
+)
+FLUSH_SECONDS = REGISTRY.histogram(
+    "h2h_query_log_flush_seconds", "Time to write one batch of query log entries"
+)
+
+
+@contextmanager
+def _file_lock(path):
+    """Serialize append + rotate across forked server workers."""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# --------------------------------------------------
+# Sinks
+# --------------------------------------------------
+
+class JsonlSink:
+    """queries.log, one JSON object per line; rotated by size and gzipped."""
+
+    name = "jsonl"
+
+    def __init__(self, path=LOG_FILE, rotate_mb=LOG_ROTATE_MB, compress=LOG_COMPRESS):
+        self.path = path
+        self.rotate_bytes = int(rotate_mb * 1024 * 1024)
+        self.compress = compress
+
+    def write(self, entries):
+        data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+        rotated = None
+        with _file_lock(self.path + ".lock"):
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+            if self.rotate_bytes and os.path.getsize(self.path) >= self.rotate_bytes:
+                rotated = self._rotate()
+        if rotated and self.compress:
+            self._compress(rotated)
+
+    def _rotate(self):
+        base, ext = os.path.splitext(self.path)
+        rotated = f"{base}-{timestamp()}{ext}"
+        n = 1
+        while os.path.exists(rotated) or os.path.exists(rotated + ".gz"):
+            rotated = f"{base}-{timestamp()}-{n}{ext}"
+            n += 1
+        os.replace(self.path, rotated)
+        return rotated
+
+    def _compress(self, path):
+        with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(path)
+
+
+class SqliteSink:
+    """
+    One row per query with a column per stage timing, indexed by hour
+    and destination, e.g. top destinations per hour:
+
+        SELECT hour, destination, COUNT(*) FROM queries
+        WHERE hour >= '2026-10-01' GROUP BY 1, 2 ORDER BY 1, 3 DESC
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path=LOG_SQLITE_PATH):
+        self.path = path
+        self._conn = None
+        self._pid = None
+
+    def _connect(self):
+        # A connection must not cross fork(); reopen in each worker
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            stages = ", ".join(f"{s}_ms REAL" for s in STAGE_COLUMNS)
+            conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS queries (
+                    id INTEGER PRIMARY KEY,
+                    ts REAL NOT NULL,
+                    hour TEXT NOT NULL,
+                    trace_id TEXT,
+                    language TEXT,
+                    intent TEXT,
+                    origin TEXT,
+                    destination TEXT,
+                    train_no TEXT,
+                    travel_date TEXT,
+                    query TEXT,
+                    response TEXT,
+                    total_ms REAL,
+                    {stages},
+                    timings TEXT,
+                    entities TEXT
+                );
+                CREATE INDEX IF NOT EXISTS queries_hour ON queries (hour);
+                CREATE INDEX IF NOT EXISTS queries_destination_hour ON queries (destination, hour);
+                CREATE INDEX IF NOT EXISTS queries_intent_hour ON queries (intent, hour);
+            """)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _row(entry):
+        when = datetime.fromisoformat(entry["time"])
+        entities = entry.get("entities") or {}
+        timings = entry.get("timings_ms") or {}
+        return (
+            when.timestamp(),
+            when.strftime("%Y-%m-%d %H"),
+            entry.get("trace_id"),
+            entry.get("language"),
+            None if entry.get("intent") is None else str(entry["intent"]),
+            entities.get("origin"),
+            entities.get("destination"),
+            entities.get("train_no"),
+            entities.get("date"),
+            entry.get("query"),
+            entry.get("response"),
+            round(sum(timings.values()), 3) if timings else None,
+            *(timings.get(s) for s in STAGE_COLUMNS),
+            json.dumps(timings) if timings else None,
+            json.dumps(entities, ensure_ascii=False),
+        )
+
+    def write(self, entries):
+        conn = self._connect()
+        columns = (
+            "ts, hour, trace_id, language, intent, origin, destination, train_no, travel_date, "
+            "query, response, total_ms, " + ", ".join(f"{s}_ms" for s in STAGE_COLUMNS) + ", timings, entities"
+        )
+        marks = ", ".join("?" * (len(STAGE_COLUMNS) + 14))
+        with conn:
+            conn.executemany(f"INSERT INTO queries ({columns}) VALUES ({marks})", [self._row(e) for e in entries])
+
+
+# --------------------------------------------------
+# Background writer
+# --------------------------------------------------
+
+class QueryLogWriter:
+    """
+    Takes log entries off the request path. Entries wait in a bounded
+    buffer and a daemon thread writes them to every sink in batches, every
+    `flush_seconds` or once `flush_entries` are waiting. A full buffer
+    drops new entries (counted in h2h_query_log_dropped_total) rather than
+    slowing requests down. Pending entries are flushed at exit.
+    """
+
+    def __init__(self, sinks, buffer_size=LOG_BUFFER_SIZE, flush_seconds=LOG_FLUSH_SECONDS,
+                 flush_entries=LOG_FLUSH_ENTRIES, background=LOG_ASYNC):
+        self.sinks = sinks
+        self.buffer_size = buffer_size
+        self.flush_seconds = flush_seconds
+        self.flush_entries = flush_entries
+        self.background = background
+        self._start_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # First use, or first use in a forked worker: threads and locks
+            # held by the parent's writer do not survive fork()
+            self._queue = queue.Queue(maxsize=self.buffer_size)
+            self._wake = threading.Event()
+            self._write_lock = threading.Lock()
+            threading.Thread(target=self._run, name="h2h-query-log", daemon=True).start()
+            self._pid = os.getpid()
+
+    @property
+    def buffered(self):
+        return self._queue.qsize() if self._pid == os.getpid() else 0
+
+    def submit(self, entry):
+        if not self.background:
+            self._write([entry])
+            return
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            DROPPED.inc()
+            return
+        if self._queue.qsize() >= self.flush_entries:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far (from any thread)."""
+        if self._pid != os.getpid():
+            return
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch):
+        with self._write_lock:
+            start = time.perf_counter()
+            for sink in self.sinks:
+                try:
+                    sink.write(batch)
+                    ENTRIES.inc(len(batch), sink=sink.name)
+                except Exception as e:
+                    print(f"[LOG ERROR] {sink.name}: {e}")
+            FLUSH_SECONDS.observe(time.perf_counter() - start)
+
+
+def _sinks():
+    sinks = [JsonlSink()]
+    if LOG_SQLITE:
+        sinks.append(SqliteSink())
+    return sinks
+
+
+WRITER = QueryLogWriter(_sinks())
+atexit.register(WRITER.flush)
+
+REGISTRY.gauge(
+    "h2h_query_log_buffered", "Query log entries waiting to be written", fn=lambda: WRITER.buffered,
+    aggregate="sum",
+)
+
+
+def log_query(raw_text, lang, intent, entities, response, trace_id=None, timings=None):
     entry = {
         "time": datetime.now().isoformat(),
         "language": lang,
@@ -13,6 +298,63 @@ def log_query(raw_text, lang, intent, entities, response):
         "entities": entities,
         "response": response,
     }
+    if trace_id is not None:
+        entry["trace_id"] = trace_id
+    if timings is not None:
+        entry["timings_ms"] = timings
+
+    WRITER.submit(entry)
+
+
+# --------------------------------------------------
+# Analytics CLI (SQLite sink)
+# --------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Query log analytics (needs H2H_LOG_SQLITE=1)")
+    parser.add_argument("--db", default=LOG_SQLITE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    top = sub.add_parser("top-destinations", help="most asked-for destinations per hour")
+    top.add_argument("--since", default=None, help="first hour, e.g. 2026-10-01 or '2026-10-01 08'")
+    top.add_argument("--limit", type=int, default=3, help="destinations per hour")
+
+    sub.add_parser("stages", help="mean and max milliseconds per stage")
+
+    sql = sub.add_parser("sql", help="run any SQL against the queries table")
+    sql.add_argument("query")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    start = time.perf_counter()
+
+    if args.command == "top-destinations":
+        rows = conn.execute(
+            """
+            SELECT hour, destination, n FROM (
+                SELECT hour, destination, COUNT(*) AS n,
+                       ROW_NUMBER() OVER (PARTITION BY hour ORDER BY COUNT(*) DESC) AS rank
+                FROM queries
+                WHERE destination IS NOT NULL AND hour >= ?
+                GROUP BY hour, destination
+            ) WHERE rank <= ? ORDER BY hour, n DESC
+            """,
+            (args.since or "", args.limit),
+        ).fetchall()
+    elif args.command == "stages":
+        rows = [
+            (stage, *conn.execute(
+                f"SELECT COUNT({stage}_ms), ROUND(AVG({stage}_ms), 2), MAX({stage}_ms) FROM queries"
+            ).fetchone())
+            for stage in STAGE_COLUMNS
+        ]
+    else:
+        rows = conn.execute(args.query).fetchall()
+
+    for row in rows:
+        print("\t".join("" if v is None else str(v) for v in row))
+    print(f"[{len(rows)} rows in {(time.perf_counter() - start) * 1000:.1f} ms]")
+
 
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+if __name__ == "__main__":
+    main()
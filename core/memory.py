@@ -0,0 +1,58 @@
+import os
+import resource
+
+
+def _read_smaps_rollup(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields
+
+
+def _read_peak_kb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return 0
+
+
+def process_memory(pid="self"):
+    """
+    Resident memory of a process in MB.
+
+    rss counts every resident page, including pages shared with forked
+    siblings; pss splits shared pages evenly between the processes
+    mapping them, so summing pss over workers gives the real footprint.
+    private is what this process alone would free on exit, peak_rss the
+    high-water mark since the process started. Outside Linux
+    only the peak RSS from getrusage is available.
+    """
+    try:
+        kb = _read_smaps_rollup(pid)
+    except OSError:
+        if pid not in ("self", os.getpid()):
+            return {}
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KB on Linux, bytes on macOS
+        peak_mb = peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+        return {"peak_rss_mb": round(peak_mb, 1)}
+
+    try:
+        kb["VmHWM"] = _read_peak_kb(pid)
+    except OSError:
+        pass
+
+    def mb(*names):
+        return round(sum(kb.get(n, 0) for n in names) / 1024, 1)
+
+    return {
+        "rss_mb": mb("Rss"),
+        "pss_mb": mb("Pss"),
+        "shared_mb": mb("Shared_Clean", "Shared_Dirty"),
+        "private_mb": mb("Private_Clean", "Private_Dirty"),
+        "peak_rss_mb": mb("VmHWM"),
+    }
@@ -0,0 +1,341 @@
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+from core.config import METRICS_SYNC_SECONDS
+
+
+# Seconds; covers sub-millisecond NLP stages up to multi-second TTS
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(n, "") for n in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += self._samples()
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in items]
+
+    def _reset(self):
+        with self._lock:
+            self._values = {}
+
+    def _snapshot(self):
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+    def _merge(self, values):
+        for key, value in values:
+            key = tuple(key)
+            self._values[key] = self._values.get(key, 0) + value
+
+
+class Gauge(_Metric):
+    """
+    Set directly, or computed at scrape time from `fn` (returns a number or
+    {labels: value}). `aggregate` says how workers' values are combined
+    under serve.py: "sum", "max", or "all" (one series per worker, with
+    a pid label).
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), fn=None, aggregate="all"):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+        self._fn = fn
+        self.aggregate = aggregate
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _items(self):
+        if self._fn is not None:
+            try:
+                value = self._fn()
+            except Exception:
+                return []
+            if isinstance(value, dict):
+                return sorted(value.items())
+            return [((), value)]
+        with self._lock:
+            return sorted(self._values.items())
+
+    def _samples(self):
+        return [f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in self._items()]
+
+    def _reset(self):
+        with self._lock:
+            self._values = {}
+
+    def _snapshot(self):
+        return [[list(k), v] for k, v in self._items()]
+
+    def _merge(self, values, pid):
+        for key, value in values:
+            key = tuple(key)
+            if self.aggregate == "all":
+                self._values[key + (str(pid),)] = value
+            elif self.aggregate == "max":
+                self._values[key] = max(self._values.get(key, value), value)
+            else:
+                self._values[key] = self._values.get(key, 0) + value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((k, {**s, "counts": list(s["counts"])}) for k, s in self._series.items())
+
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                labels = _labels(self.label_names + ("le",), key + (_number(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_number(series['sum'])}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+    def _reset(self):
+        with self._lock:
+            self._series = {}
+
+    def _snapshot(self):
+        with self._lock:
+            return [[list(k), {**s, "counts": list(s["counts"])}] for k, s in self._series.items()]
+
+    def _merge(self, series):
+        for key, other in series:
+            key = tuple(key)
+            mine = self._series.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            mine["counts"] = [a + b for a, b in zip(mine["counts"], other["counts"])]
+            mine["sum"] += other["sum"]
+            mine["count"] += other["count"]
+
+
+class Registry:
+    """
+    Process-wide metrics rendered in the Prometheus text format (0.0.4).
+
+    Under serve.py every worker has its own registry. After
+    enable_multiprocess(dir) each process publishes a snapshot to
+    <dir>/<pid>.json (workers every METRICS_SYNC_SECONDS, the parent once
+    before forking) and render() merges all of them, whichever worker
+    takes the scrape: counters and histograms are summed, including those
+    of workers that have since exited, so they never go backwards. Gauges
+    of live workers are combined by their `aggregate` mode.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.multiprocess_dir = None
+        self._sync_pid = None
+
+    def _get(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._get(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text, labels=(), fn=None, aggregate="all"):
+        return self._get(Gauge, name, help_text, labels, fn, aggregate)
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help_text, labels, buckets)
+
+    # ---------------------------------------
+    # Multi-process (serve.py)
+    # ---------------------------------------
+    def enable_multiprocess(self, directory):
+        """Call in the serve.py parent before forking; clears the last run's snapshots."""
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            os.remove(path)
+        self.multiprocess_dir = directory
+        # The parent's counts (model warmup) are published once; children
+        # start from zero so those counts are not summed once per worker
+        os.register_at_fork(before=lambda: self._publish(gauges=False), after_in_child=self._reset)
+
+    def _reset(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric._reset()
+
+    def _publish(self, gauges=True):
+        if self.multiprocess_dir is None:
+            return
+        with self._lock:
+            metrics = list(self._metrics.values())
+        snapshot = {}
+        for m in metrics:
+            if m.kind == "gauge" and not gauges:
+                continue
+            entry = {"kind": m.kind, "help": m.help, "labels": list(m.label_names), "values": m._snapshot()}
+            if m.kind == "gauge":
+                entry["aggregate"] = m.aggregate
+            elif m.kind == "histogram":
+                entry["buckets"] = list(m.buckets[:-1])
+            snapshot[m.name] = entry
+
+        path = os.path.join(self.multiprocess_dir, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+    def start_sync(self, interval=METRICS_SYNC_SECONDS):
+        """Publish this worker's metrics every `interval` seconds (once per process)."""
+        if self.multiprocess_dir is None or self._sync_pid == os.getpid():
+            return
+        self._sync_pid = os.getpid()
+
+        def loop():
+            while True:
+                try:
+                    self._publish()
+                except Exception as e:
+                    print(f"[METRICS ERROR] {e}")
+                time.sleep(interval)
+
+        threading.Thread(target=loop, name="h2h-metrics-sync", daemon=True).start()
+
+    def _merged(self):
+        """Metrics of every process, merged from the snapshot files."""
+        self._publish()
+        merged = {}
+        for path in glob.glob(os.path.join(self.multiprocess_dir, "*.json")):
+            pid = int(os.path.basename(path)[:-5])
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue  # being replaced right now
+            alive = _alive(pid)
+
+            for name, entry in snapshot.items():
+                kind = entry["kind"]
+                if kind == "gauge" and not alive:
+                    continue
+                metric = merged.get(name)
+                if metric is None:
+                    if kind == "counter":
+                        metric = Counter(name, entry["help"], entry["labels"])
+                    elif kind == "histogram":
+                        metric = Histogram(name, entry["help"], entry["labels"], entry["buckets"])
+                    else:
+                        labels = entry["labels"] + (["pid"] if entry["aggregate"] == "all" else [])
+                        metric = Gauge(name, entry["help"], labels, aggregate=entry["aggregate"])
+                    merged[name] = metric
+                if kind == "gauge":
+                    metric._merge(entry["values"], pid)
+                else:
+                    metric._merge(entry["values"])
+        return [merged[name] for name in sorted(merged)]
+
+    def render(self):
+        if self.multiprocess_dir is not None:
+            metrics = self._merged()
+        else:
+            with self._lock:
+                metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+REGISTRY = Registry()
@@ -0,0 +1,132 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Process boot reference for boot-to-ready / boot-to-first-answer timings
+BOOT_TIME = time.monotonic()
+
+
+class _Component:
+    def __init__(self, name, after):
+        self.name = name
+        self.after = tuple(after)
+        self.state = "pending"
+        self.value = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+    def status(self):
+        seconds = None
+        if self.started is not None:
+            seconds = round((self.finished or time.monotonic()) - self.started, 2)
+        return {
+            "state": self.state,
+            "after": list(self.after),
+            "seconds": seconds,
+            "ready_at": round(self.finished - BOOT_TIME, 2) if self.state == "ready" else None,
+            "error": self.error,
+        }
+
+
+class ModelLoader:
+    """
+    Loads named pipeline components concurrently in a small thread pool.
+
+    Each component is a zero-argument loader plus the names it must wait
+    for. Components are submitted in registration order and may only
+    depend on components registered before them, so a loader blocked on
+    its dependencies never waits for work queued behind it.
+
+    Callers either block on one component with get(), or check ready()
+    and degrade (e.g. answer without audio until TTS is loaded).
+    """
+
+    def __init__(self, workers=4):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="loader")
+        self._components = {}
+        self._lock = threading.Lock()
+        self.first_answer = None
+
+    def add(self, name, load, after=()):
+        for dep in after:
+            if dep not in self._components:
+                raise ValueError(f"'{name}' depends on unregistered component '{dep}'")
+
+        component = _Component(name, after)
+        self._components[name] = component
+        self._pool.submit(self._run, component, load)
+        return self
+
+    def _run(self, component, load):
+        try:
+            for dep in component.after:
+                self.get(dep)
+
+            component.state = "loading"
+            component.started = time.monotonic()
+            print(f"[LOADER] {component.name} loading...")
+            component.value = load()
+            component.state = "ready"
+        except Exception as e:
+            component.state = "failed"
+            component.error = str(e)
+            print(f"[LOADER ERROR] {component.name}: {e}")
+        finally:
+            component.finished = time.monotonic()
+            component.done.set()
+
+        if component.state == "ready":
+            print(f"[LOADER] {component.name} ready in {component.finished - component.started:.1f}s "
+                  f"({component.finished - BOOT_TIME:.1f}s after boot)")
+
+    # ---------------------------------------
+    # Access
+    # ---------------------------------------
+    def get(self, name, timeout=None):
+        """Block until name is loaded and return it; RuntimeError if it failed."""
+        component = self._components[name]
+        if not component.done.wait(timeout):
+            raise TimeoutError(f"{name} is still loading")
+        if component.state != "ready":
+            raise RuntimeError(f"{name} failed to load: {component.error}")
+        return component.value
+
+    def is_ready(self, name):
+        component = self._components.get(name)
+        return component is not None and component.state == "ready"
+
+    def ready(self, names=None):
+        names = self._components if names is None else names
+        return all(self.is_ready(n) for n in names)
+
+    def wait_all(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for component in self._components.values():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            component.done.wait(remaining)
+        return self.ready()
+
+    # ---------------------------------------
+    # Boot metrics
+    # ---------------------------------------
+    def mark_first_answer(self):
+        with self._lock:
+            if self.first_answer is not None:
+                return
+            self.first_answer = time.monotonic()
+        print(f"[BOOT] First answer {self.first_answer - BOOT_TIME:.1f}s after boot")
+
+    def status(self):
+        components = {name: c.status() for name, c in self._components.items()}
+        finished = [c.finished for c in self._components.values() if c.state == "ready"]
+        all_ready = self.ready()
+        return {
+            "uptime_s": round(time.monotonic() - BOOT_TIME, 2),
+            "boot_to_ready_s": round(max(finished) - BOOT_TIME, 2) if all_ready and finished else None,
+            "boot_to_first_answer_s": (
+                round(self.first_answer - BOOT_TIME, 2) if self.first_answer is not None else None
+            ),
+            "components": components,
+        }
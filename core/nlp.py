@@ -1,7 +1,18 @@
-from sentence_transformers import SentenceTransformer, util
-from rapidfuzz import process, fuzz
+import copy
+import hashlib
+import json
+import os
 import re
+import threading
+from collections import OrderedDict
+from datetime import date
+import numpy as np
 import dateparser
+from core.storage import DIRS
+from core import tracing
+from core.gazetteer import StationGazetteer
+from core.config import INFERENCE_TIER, INTENT_CACHE_SIZE, ENTITY_CACHE_SIZE
+from core.inference_tier import load_sentence_transformer
 from core.train_routes import TRAIN_ROUTES
 from core.static_timetable import STATION_TIMETABLE
 from core.train_service import STATION_ALIASES
@@ -40,11 +51,39 @@ def _normalize_station(name):
     return STATION_ALIASES.get(name, name)
 
 
+INTENT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# dateparser.parse only succeeds when the text mentions one of these, and
+# costs milliseconds per call, so other utterances skip it. Bare numbers
+# are not cues: train numbers and PNRs would all pay for a failed parse.
+DATE_CUES = re.compile(
+    r"\b\d{1,4}[/.-]\d{1,2}(?:[/.-]\d{2,4})?\b|\b\d{1,2}(?:st|nd|rd|th)\b|"
+    r"\b\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.)|\b\d{1,2}:\d{2}\b|"
+    r"\b(today|tonight|tomorrow|yesterday|now|ago|day|days|week|weeks|month|months|"
+    r"year|years|hour|hours|minute|minutes|morning|afternoon|evening|night|noon|midnight|"
+    r"mon|tue|wed|thu|fri|sat|sun|monday|tuesday|wednesday|thursday|friday|saturday|sunday|"
+    r"jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec|january|february|march|april|"
+    r"june|july|august|september|october|november|december)\b",
+    re.IGNORECASE,
+)
+
+
 class NLPDecisionUnit:
-    def __init__(self):
-        print("[INIT] NLP Engine Loaded")
+    def __init__(self, tier=INFERENCE_TIER, model=None):
+        """
+        model: optional preloaded encoder with a SentenceTransformer-style
+        encode(texts, normalize_embeddings=True); it needs a "name"
+        attribute so its intent embeddings are cached separately.
+        """
+        print(f"[INIT] NLP Engine Loaded ({tier})")
 
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+        self.tier = tier
+        if model is None:
+            self.model_name = INTENT_MODEL_NAME
+            self.model = load_sentence_transformer(self.model_name, tier)
+        else:
+            self.model_name = model.name
+            self.model = model
 
         self.INTENTS = {
             "train_timing": [
@@ -87,30 +126,159 @@ class NLPDecisionUnit:
             ]
         }
 
+        # Embed every intent example once into a single normalized matrix
+        self._build_intent_index()
+
+        # Utterance → (intent, score); kiosks hear the same questions all day
+        self._intent_cache = OrderedDict()
+        self._intent_cache_lock = threading.Lock()
+        # (day, English text) → entities; relative dates change at midnight
+        self._entity_cache = OrderedDict()
+        self._entity_cache_lock = threading.Lock()
+
         # Dynamically extract all stations from routes and timetable
         self.STATIONS = _extract_all_stations()
+        self.gazetteer = StationGazetteer(self.STATIONS, STATION_ALIASES)
         print(f"[INIT] Loaded {len(self.STATIONS)} stations for recognition")
 
+    # ------------------------------------------------------
+    #                 INTENT EMBEDDING INDEX
+    # ------------------------------------------------------
+    def _intent_cache_path(self):
+        """Cache file keyed by model name, inference tier and a hash of INTENTS."""
+        digest = hashlib.sha1(
+            json.dumps(self.INTENTS, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+        model_key = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{self.model_name}-{self.tier}")
+        return os.path.join(DIRS["cache"], f"intents_{model_key}_{digest}.npy")
+
+    def _build_intent_index(self):
+        # One row per example; _intent_labels maps each row back to its intent
+        self._intent_labels = []
+        examples = []
+        for intent, phrases in self.INTENTS.items():
+            for phrase in phrases:
+                self._intent_labels.append(intent)
+                examples.append(phrase)
+
+        cache_path = self._intent_cache_path()
+        matrix = None
+
+        if os.path.exists(cache_path):
+            try:
+                matrix = np.load(cache_path)
+                if matrix.shape[0] != len(examples):
+                    matrix = None
+                else:
+                    print(f"[INIT] Intent embeddings loaded from cache → {cache_path}")
+            except Exception as e:
+                print(f"[INTENT CACHE ERROR] {e}")
+                matrix = None
+
+        if matrix is None:
+            matrix = self.model.encode(examples, normalize_embeddings=True)
+            matrix = np.asarray(matrix, dtype=np.float32)
+            try:
+                tmp_path = cache_path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    np.save(f, matrix)
+                os.replace(tmp_path, cache_path)
+                print(f"[INIT] Intent embeddings cached → {cache_path}")
+            except Exception as e:
+                print(f"[INTENT CACHE ERROR] {e}")
+
+        self._intent_matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+
+    def _classify(self, text_embs):
+        """Score (n, dim) normalized embeddings against every intent example."""
+        scores = np.asarray(text_embs, dtype=np.float32) @ self._intent_matrix.T
+        best_rows = scores.argmax(axis=1)
+        return [
+            (self._intent_labels[row], float(scores[i, row]))
+            for i, row in enumerate(best_rows)
+        ]
+
     # ------------------------------------------------------
     #                    INTENT DETECTION
     # ------------------------------------------------------
-    def extract_intent(self, text: str) -> str:
-        text_emb = self.model.encode(text, normalize_embeddings=True)
-        best_intent, best_score = None, -1
+    def _cached_intents(self, texts):
+        if INTENT_CACHE_SIZE <= 0:
+            return {}
+        found = {}
+        with self._intent_cache_lock:
+            for text in texts:
+                if text in self._intent_cache:
+                    self._intent_cache.move_to_end(text)
+                    found[text] = self._intent_cache[text]
+        return found
+
+    def _remember_intents(self, results):
+        if INTENT_CACHE_SIZE <= 0:
+            return
+        with self._intent_cache_lock:
+            self._intent_cache.update(results)
+            while len(self._intent_cache) > INTENT_CACHE_SIZE:
+                self._intent_cache.popitem(last=False)
+
+    def _classify_texts(self, texts):
+        """(intent, score) per text; only uncached texts are encoded, in one call."""
+        results = self._cached_intents(texts)
+        if results:
+            tracing.count(cache_hits=len(results))
+
+        missing = list(dict.fromkeys(t for t in texts if t not in results))
+        if missing:
+            tracing.count(batch_size=len(missing))
+            text_embs = self.model.encode(missing, normalize_embeddings=True)
+            fresh = dict(zip(missing, self._classify(text_embs)))
+            self._remember_intents(fresh)
+            results.update(fresh)
 
-        for intent, examples in self.INTENTS.items():
-            example_emb = self.model.encode(examples, normalize_embeddings=True)
-            score = max(util.cos_sim(text_emb, example_emb)[0])
-            if score > best_score:
-                best_intent, best_score = intent, score
+        return [results[t] for t in texts]
 
-        print(f"[INTENT] {best_intent} (confidence={float(best_score):.2f})")
+    def extract_intent(self, text: str) -> str:
+        best_intent, best_score = self._classify_texts([text])[0]
+
+        print(f"[INTENT] {best_intent} (confidence={best_score:.2f})")
         return best_intent
 
+    def extract_intent_batch(self, texts) -> list:
+        """Classify many utterances with a single encode call."""
+        texts = list(texts)
+        if not texts:
+            return []
+
+        results = self._classify_texts(texts)
+
+        for text, (intent, score) in zip(texts, results):
+            print(f"[INTENT] {intent} (confidence={score:.2f}) ← {text!r}")
+        return [intent for intent, _ in results]
+
     # ------------------------------------------------------
     #                    ENTITY EXTRACTION
     # ------------------------------------------------------
     def extract_entities(self, text: str) -> dict:
+        if ENTITY_CACHE_SIZE <= 0:
+            return self._extract_entities(text)
+
+        key = (date.today().isoformat(), text)
+        with self._entity_cache_lock:
+            cached = self._entity_cache.get(key)
+            if cached is not None:
+                self._entity_cache.move_to_end(key)
+        if cached is not None:
+            tracing.count(cache_hits=1)
+            print(f"[ENTITIES] {cached} (cached)")
+            return copy.deepcopy(cached)
+
+        entities = self._extract_entities(text)
+        with self._entity_cache_lock:
+            self._entity_cache[key] = copy.deepcopy(entities)
+            while len(self._entity_cache) > ENTITY_CACHE_SIZE:
+                self._entity_cache.popitem(last=False)
+        return entities
+
+    def _extract_entities(self, text: str) -> dict:
         entities = {}
         text_lower = text.lower()
 
@@ -120,46 +288,9 @@ class NLPDecisionUnit:
             entities["train_no"] = train_no.group()
 
         # ---- Station Detection Strategy ----
-        # 1. Broad fuzzy search for all possible stations in text
+        # 1. Gazetteer lookup (exact/alias trie + one vectorized fuzzy pass)
         # 2. Heuristic-based origin/destination assignment
-        
-        # Extract candidate chunks (up to 3 words)
-        words = re.findall(r"[A-Za-z]+", text)
-        candidate_chunks = []
-        for i in range(len(words)):
-            candidate_chunks.append(words[i])
-            if i < len(words) - 1:
-                candidate_chunks.append(words[i] + " " + words[i+1])
-            if i < len(words) - 2:
-                candidate_chunks.append(words[i] + " " + words[i+1] + " " + words[i+2])
-
-        found_stations = []
-        for chunk in candidate_chunks:
-            # We use a higher threshold and token_sort_ratio for better precision
-            match = process.extractOne(chunk, self.STATIONS, scorer=fuzz.token_sort_ratio)
-            if match and match[1] > 80:
-                normalized = _normalize_station(match[0])
-                # Store with its original position in the text for ordering
-                pos = text_lower.find(chunk.lower())
-                if pos != -1:
-                    found_stations.append({
-                        "name": normalized,
-                        "pos": pos,
-                        "chunk": chunk.lower()
-                    })
-
-        # Remove duplicates (choose best match if chunks overlap)
-        found_stations.sort(key=lambda x: len(x["chunk"]), reverse=True)
-        unique_stations = []
-        taken_ranges = []
-        for s in found_stations:
-            start = s["pos"]
-            end = start + len(s["chunk"])
-            if not any(max(start, ts) < min(end, te) for ts, te in taken_ranges):
-                unique_stations.append(s)
-                taken_ranges.append((start, end))
-
-        unique_stations.sort(key=lambda x: x["pos"])
+        unique_stations = self.gazetteer.match(text)
         station_names = [s["name"] for s in unique_stations]
         entities["stations"] = list(dict.fromkeys(station_names)) # Maintain order, remove dupes
 
@@ -215,7 +346,7 @@ class NLPDecisionUnit:
                     entities["destination"] = others[0]
 
         # ---- Date detection ----
-        parsed_date = dateparser.parse(text)
+        parsed_date = dateparser.parse(text) if DATE_CUES.search(text) else None
         if parsed_date:
             entities["date"] = parsed_date.strftime("%Y-%m-%d")
 
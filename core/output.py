@@ -1,40 +1,92 @@
-from deep_translator import GoogleTranslator
-from transformers import AutoTokenizer
-from parler_tts import ParlerTTSForConditionalGeneration
 import torch
 import uuid
 import os
+import re
+import threading
+import numpy as np
 import soundfile as sf
-from playsound import playsound
+from core.config import TTS_CHUNK_CHARS, TTS_SERVER_PLAYBACK, TTS_CACHE_MAX_MB, INFERENCE_TIER
+from core.inference_tier import quantize_int8
+from core.tts_cache import TTSCache
+from core.storage import DIRS
+from core import tracing
+from core.translate import translate, transliterate, split_sentences
+from core.translation_memory import TranslationMemory
+
+
+TTS_MODEL_NAME = "ai4bharat/indic-parler-tts"
+
+
+_CLAUSE_END = re.compile(r"(?<=[,;:])\s+")
+
+
+def split_for_tts(text, max_chars=TTS_CHUNK_CHARS):
+    """
+    Split an answer into sentences, and over-long sentences (e.g. route
+    listings) into comma-separated clause groups of at most max_chars.
+    """
+    pieces = []
+    for sentence in split_sentences(text):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+
+        current = ""
+        for clause in _CLAUSE_END.split(sentence):
+            if current and len(current) + 1 + len(clause) > max_chars:
+                pieces.append(current)
+                current = clause
+            else:
+                current = f"{current} {clause}".strip()
+        if current:
+            pieces.append(current)
+
+    return [p for p in pieces if p.strip()]
+
+
+def _model_revision():
+    """Commit hash of the locally cached TTS checkpoint, without loading it."""
+    try:
+        from huggingface_hub import try_to_load_from_cache
+        path = try_to_load_from_cache(TTS_MODEL_NAME, "config.json")
+        if isinstance(path, str):
+            # .../snapshots/<commit hash>/config.json
+            return os.path.basename(os.path.dirname(path))
+    except Exception:
+        pass
+    return "main"
+
+
+def _play_in_background(file_path):
+    def _play():
+        try:
+            from playsound import playsound
+            playsound(file_path)
+        except Exception as e:
+            print(f"[AUDIO ERROR] {e}")
+
+    threading.Thread(target=_play, daemon=True).start()
 
 
 class OutputUnit:
-    def __init__(self, output_dir="data/tts"):
-        print("[INIT] OutputUnit loaded (Indic Parler-TTS + GoogleTranslate)")
+    def __init__(self, output_dir=DIRS["tts"], play_audio=TTS_SERVER_PLAYBACK,
+                 tier=INFERENCE_TIER, load_model=True):
+        """
+        load_model=False leaves Parler-TTS unloaded so translation memory
+        and cached audio can serve answers while load_model() runs
+        elsewhere; until then speak() only returns cache hits.
+        """
+        print("[INIT] OutputUnit loaded (Indic Parler-TTS + IndicTrans2)")
 
         self.output_dir = output_dir
+        self.play_audio = play_audio
+        self.tier = tier
         os.makedirs(self.output_dir, exist_ok=True)
 
         # Select CUDA if available
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         print(f"[TTS] Using device: {self.device}")
 
-        # Load Indic Parler-TTS with optimizations
-        print("[TTS] Loading Indic Parler-TTS model...")
-        
-        # Use float16 for speed/memory on CUDA
-        self.torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-        print(f"[TTS] Using dtype: {self.torch_dtype}")
-
-        self.model = ParlerTTSForConditionalGeneration.from_pretrained(
-            "ai4bharat/indic-parler-tts",
-            torch_dtype=self.torch_dtype
-        ).to(self.device)
-
-        # Tokenizers needed for prompts + descriptions
-        self.prompt_tokenizer = AutoTokenizer.from_pretrained("ai4bharat/indic-parler-tts")
-        self.desc_tokenizer = AutoTokenizer.from_pretrained(self.model.config.text_encoder._name_or_path)
-
         # Language → recommended speaker mapping (refined descriptions)
         self.speaker_data = {
             "en": {
@@ -62,6 +114,48 @@ class OutputUnit:
                 "description": "Anu's voice is very clear and natural, with a professional Malayalam accent. The audio is crisp and well-balanced."
             }
         }
+        self.default_caption = "A natural, expressive voice with clear audio, moderate speed, and high quality."
+
+        # Formatter templates translated once per language
+        self.translation_memory = TranslationMemory(translate, transliterate)
+
+        # Content-addressed cache of rendered answers
+        self.model_version = f"{TTS_MODEL_NAME}@{_model_revision()}/{tier}"
+        self.cache = TTSCache(max_bytes=int(TTS_CACHE_MAX_MB * 1024 * 1024)) if TTS_CACHE_MAX_MB > 0 else None
+
+        self.model = None
+        if load_model:
+            self.load_model()
+
+    @property
+    def ready(self):
+        return self.model is not None
+
+    def load_model(self):
+        """Load Parler-TTS, its tokenizers and the pre-encoded speaker descriptions."""
+        from transformers import AutoTokenizer
+        from parler_tts import ParlerTTSForConditionalGeneration
+
+        # Load Indic Parler-TTS with optimizations
+        print("[TTS] Loading Indic Parler-TTS model...")
+        
+        # Use float16 for speed/memory on CUDA
+        self.torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+        print(f"[TTS] Using dtype: {self.torch_dtype}")
+
+        model = ParlerTTSForConditionalGeneration.from_pretrained(
+            TTS_MODEL_NAME,
+            torch_dtype=self.torch_dtype
+        ).to(self.device)
+
+        # Parler-TTS has no ONNX export here; both quantized tiers use int8
+        if self.tier != "fp32":
+            print(f"[TTS] Applying int8 dynamic quantization ({self.tier} tier)")
+            model = quantize_int8(model)
+
+        # Tokenizers needed for prompts + descriptions
+        self.prompt_tokenizer = AutoTokenizer.from_pretrained(TTS_MODEL_NAME)
+        self.desc_tokenizer = AutoTokenizer.from_pretrained(model.config.text_encoder._name_or_path)
 
         # Pre-encode speaker descriptions to save time during inference
         self.encoded_descriptions = {}
@@ -74,18 +168,27 @@ class OutputUnit:
             }
         
         # Generic fallback pre-encoding
-        default_caption = "A natural, expressive voice with clear audio, moderate speed, and high quality."
-        default_inputs = self.desc_tokenizer(default_caption, return_tensors="pt").to(self.device)
+        default_inputs = self.desc_tokenizer(self.default_caption, return_tensors="pt").to(self.device)
         self.encoded_descriptions["default"] = {
             "input_ids": default_inputs.input_ids,
             "attention_mask": default_inputs.attention_mask
         }
 
+        # Published last: ready flips only once everything above exists
+        self.model = model
+        return model
+
 
     # ----------------------------------------------------------------------
     # TRANSLATE BACK TO USER LANGUAGE (keep same signature)
     # ----------------------------------------------------------------------
-    def translate_back(self, text, lang):
+    def translate_back(self, text, lang, template=None):
+        """
+        template: optional (template, slots) from
+        ResponseFormatter.format_template. When given, the answer is
+        assembled from the translation memory instead of translating the
+        whole sentence; free-form text still uses the full translator.
+        """
         if not text:
             return text
 
@@ -108,6 +211,16 @@ class OutputUnit:
         if target == "en":
             return text
 
+        if template is not None:
+            try:
+                translated = self.translation_memory.render(template[0], template[1], target)
+                if translated is not None:
+                    tracing.count(cache_hits=1)
+                    print(f"[TRANSLATED BACK][memory] {translated}")
+                    return translated
+            except Exception as e:
+                print(f"[TM ERROR] {e}")
+
         try:
             # Import station names to preserve them during translation
             from core.train_routes import TRAIN_ROUTES
@@ -133,7 +246,7 @@ class OutputUnit:
                     placeholder_text = placeholder_text.replace(station, placeholder)
             
             # Translate the text with placeholders
-            translated = GoogleTranslator(source="en", target=target).translate(placeholder_text)
+            translated = translate(placeholder_text, "en", target)
             
             # Replace placeholders back with original station names
             for placeholder, station in station_placeholders.items():
@@ -146,42 +259,133 @@ class OutputUnit:
             return text
 
 
-    def speak(self, text, lang):
+    def _synthesize(self, text, lang):
+        """Run Parler-TTS for one piece of text → float32 waveform."""
+        # Use pre-encoded description
+        desc_data = self.encoded_descriptions.get(lang, self.encoded_descriptions["default"])
+
+        # Encode prompt
+        prompt_inputs = self.prompt_tokenizer(text, return_tensors="pt").to(self.device)
+
+        # Generate audio
+        with torch.inference_mode():
+            generated = self.model.generate(
+                input_ids=desc_data["input_ids"],
+                attention_mask=desc_data["attention_mask"],
+                prompt_input_ids=prompt_inputs.input_ids,
+                prompt_attention_mask=prompt_inputs.attention_mask,
+                do_sample=True, # Improved quality with sampling
+                temperature=1.0,
+            )
+
+        return generated.cpu().numpy().squeeze().astype('float32')
+
+    def _cache_key(self, text, lang):
+        if lang in self.speaker_data:
+            description = self.speaker_data[lang]["description"]
+        else:
+            description = self.default_caption
+        return TTSCache.key(text, lang, description, self.model_version)
+
+    def cached_audio(self, text, lang):
+        """WAV path of an answer already in the TTS cache, without synthesizing."""
+        if not text or self.cache is None:
+            return None
+        return self.cache.get(self._cache_key(text, lang.lower()), count=False)
+
+    def _render(self, text, lang):
+        """Synthesize through the cache → (waveform, cached WAV path or None)."""
+        if self.cache is None:
+            return self._synthesize(text, lang), None
+
+        key = self._cache_key(text, lang)
+        # speak() already counted this answer's lookup
+        path = self.cache.get(key, count=False)
+        if path:
+            audio, _ = sf.read(path, dtype="float32")
+            return audio, path
+
+        audio = self._synthesize(text, lang)
+        return audio, self.cache.put(key, audio, self.model.config.sampling_rate)
+
+    def speak_stream(self, text, lang):
+        """
+        Synthesize sentence by sentence, yielding each piece as soon as it
+        is ready: {"index", "text", "audio", "sample_rate"}. Pieces are
+        cached individually, so recurring sentences are never re-rendered.
+        """
+        if not text:
+            return
+
+        lang = lang.lower()
+        sr = self.model.config.sampling_rate
+        for i, piece in enumerate(split_for_tts(text)):
+            audio, _ = self._render(piece, lang)
+            yield {
+                "index": i,
+                "text": piece,
+                "audio": audio,
+                "sample_rate": sr,
+            }
+
+    def speak(self, text, lang, on_chunk=None):
+        """
+        Synthesize text and return the WAV path. Answers already in the TTS
+        cache are returned without running the model. With on_chunk,
+        synthesis is incremental and on_chunk receives every sentence-level
+        chunk from speak_stream before the next is rendered; returning
+        False from it stops synthesis, and speak() returns None.
+        """
         if not text:
             return None
 
         lang = lang.lower()
         speaker = self.speaker_data.get(lang, self.speaker_data["en"])["name"]
-        file_path = os.path.join(self.output_dir, f"{uuid.uuid4().hex}.wav")
-
-        print(f"[TTS] Synthesizing speech for language '{lang}', speaker '{speaker}' → {file_path}")
 
         try:
-            # Use pre-encoded description
-            desc_data = self.encoded_descriptions.get(lang, self.encoded_descriptions["default"])
-            
-            # Encode prompt
-            prompt_inputs = self.prompt_tokenizer(text, return_tensors="pt").to(self.device)
-
-            # Generate audio
-            with torch.inference_mode():
-                generated = self.model.generate(
-                    input_ids=desc_data["input_ids"],
-                    attention_mask=desc_data["attention_mask"],
-                    prompt_input_ids=prompt_inputs.input_ids,
-                    prompt_attention_mask=prompt_inputs.attention_mask,
-                    do_sample=True, # Improved quality with sampling
-                    temperature=1.0,
-                )
-
-            audio = generated.cpu().numpy().squeeze().astype('float32')
-
-            # Save WAV
-            sf.write(file_path, audio, self.model.config.sampling_rate)
-
-            # Play out loud
-            print("[AUDIO] Playing output...")
-            playsound(file_path)
+            file_path = None
+            if self.cache is not None:
+                key = self._cache_key(text, lang)
+                file_path = self.cache.get(key)
+
+            if file_path:
+                print(f"[TTS] Cache hit for language '{lang}' → {file_path}")
+                tracing.count(cache_hits=1)
+                if on_chunk is not None:
+                    audio, sr = sf.read(file_path, dtype="float32")
+                    on_chunk({"index": 0, "text": text, "audio": audio, "sample_rate": sr})
+            elif not self.ready:
+                print("[TTS] Model still loading, answering without audio")
+                return None
+            else:
+                sr = self.model.config.sampling_rate
+                print(f"[TTS] Synthesizing speech for language '{lang}', speaker '{speaker}'")
+
+                if on_chunk is None:
+                    audio = self._synthesize(text, lang)
+                else:
+                    parts = []
+                    for chunk in self.speak_stream(text, lang):
+                        if on_chunk(chunk) is False:
+                            print("[TTS] Stopped by the caller, nothing saved")
+                            return None
+                        parts.append(chunk["audio"])
+                    audio = np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+                tracing.count(audio_seconds=len(audio) / sr)
+
+                # Save WAV
+                if self.cache is not None:
+                    file_path = self.cache.put(key, audio, sr)
+                else:
+                    file_path = os.path.join(self.output_dir, f"{uuid.uuid4().hex}.wav")
+                    sf.write(file_path, audio, sr)
+                print(f"[TTS] Saved → {file_path}")
+
+            # Play out loud, off the request path
+            if self.play_audio:
+                print("[AUDIO] Playing output...")
+                _play_in_background(file_path)
 
             return file_path
 
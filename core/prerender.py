@@ -0,0 +1,248 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from core.metrics import REGISTRY
+from core.storage import DIRS
+from core.train_service import _now_minutes, _today_idx, _tomorrow_idx
+from core.config import PRERENDER_LANGS, PRERENDER_TTS, PRERENDER_MAX_DESTINATIONS, PRERENDER_TORCH_THREADS
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process, every scheduler renders
+    fcntl = None
+
+
+RENDERED = REGISTRY.counter(
+    "h2h_prerender_answers_total", "Answers rendered ahead of time", labels=("phase",)
+)
+RENDER_SECONDS = REGISTRY.histogram(
+    "h2h_prerender_seconds", "Time to pre-render one answer (service + translation + TTS)", labels=("phase",)
+)
+
+LOCK_FILE = os.path.join(DIRS["cache"], "prerender.lock")
+
+
+@contextmanager
+def _torch_threads(n):
+    """
+    Run torch on n intra-op threads (Parler, IndicTrans2), then restore.
+    The setting is process-wide, which is why jobs yield to requests at
+    every sentence rather than only between answers.
+    """
+    try:
+        import torch
+    except ImportError:
+        yield
+        return
+    previous = torch.get_num_threads()
+    torch.set_num_threads(n)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+
+@contextmanager
+def _try_lock(path):
+    """Yields True for the one forked worker that gets to render, False for the rest."""
+    if fcntl is None:
+        yield True
+        return
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class PrerenderScheduler:
+    """
+    Renders the answers passengers are about to ask for before they ask.
+
+    The timetable is cut into departure windows: an answer to "next
+    train to X" or "trains to X" stays the same from one departure from
+    the station to the next (TrainService.valid_until). For every
+    reachable destination (nearest departures first) and language in
+    PRERENDER_LANGS, and while `idle()` says no request is running or
+    waiting on any endpoint:
+
+    - the next window's answers are rendered at its start time, which
+      warms translation memory and the TTS cache (sentence pieces too)
+    - when a train departs, the window that opens is installed into
+      the pipeline's AnswerCache from those ready artifacts, so peak-time
+      queries skip the service, translation and TTS entirely
+
+    Rendering runs at the lowest CPU priority on PRERENDER_TORCH_THREADS
+    torch threads, and a request arriving mid-answer stops synthesis at
+    the next sentence (the answer is retried once idle again).
+
+    start() it in each server process (serve.py workers after the fork):
+    every worker installs into its own AnswerCache, only one renders a
+    window and the others pick its audio up from the shared TTS cache.
+    """
+
+    def __init__(self, pipeline, idle=lambda: True, langs=PRERENDER_LANGS, tts=PRERENDER_TTS,
+                 max_destinations=PRERENDER_MAX_DESTINATIONS, torch_threads=PRERENDER_TORCH_THREADS,
+                 poll_seconds=0.5):
+        self.pipeline = pipeline
+        self.idle = idle
+        self.langs = langs
+        self.tts = tts
+        self.max_destinations = max_destinations
+        self.torch_threads = torch_threads
+        self.poll_seconds = poll_seconds
+        self.installed_window = None
+        self.rendered_window = None
+        self.progress = 0.0
+        self.preempted = False
+        self._pid = None
+
+        REGISTRY.gauge(
+            "h2h_prerender_next_window_progress", "Share of the next departure window rendered",
+            fn=lambda: self.progress,
+        )
+
+    # -----------------------------
+    # What to render
+    # -----------------------------
+    def destinations(self, now):
+        """Reachable destinations, those of the next departures first; None = no destination."""
+        service = self.pipeline.train_api
+        origin = service.current_station
+        ordered = service.index.destinations_after(origin, _today_idx(now), _now_minutes(now))
+        ordered += service.index.destinations_after(origin, _tomorrow_idx(now))
+        ordered = list(dict.fromkeys(ordered))
+        if self.max_destinations:
+            ordered = ordered[:self.max_destinations]
+        return [None] + ordered
+
+    def jobs(self, now):
+        """(request, lang) pairs built exactly as route_intent builds them."""
+        nlp = self.pipeline.nlp
+        origin = self.pipeline.train_api.current_station
+        for destination in self.destinations(now):
+            entities = {"origin": origin, "destination": destination}
+            for intent in ("train_timing", "train_between"):
+                request = nlp.route_intent(intent, entities)
+                for lang in self.langs:
+                    yield request, lang
+
+    def render(self, request, lang, now, synthesize):
+        """Answer text and TTS path for request as it will be at `now`."""
+        result = self.pipeline.train_api.execute(request, now=now)
+        template, slots = self.pipeline.formatter.format_template(result)
+        response = template.format(**slots)
+        text = self.pipeline.output.translate_back(response, lang, template=(template, slots))
+
+        output = self.pipeline.output
+        if synthesize and output.ready:
+            # on_chunk renders per sentence too, so streamed answers hit the
+            # cache, and gives way to requests between sentences
+            def yield_to_requests(chunk):
+                if not self.idle():
+                    self.preempted = True
+                    return False  # speak() stops before the next sentence
+            return text, output.speak(text, lang, on_chunk=yield_to_requests)
+        return text, output.cached_audio(text, lang)
+
+    # -----------------------------
+    # Loop
+    # -----------------------------
+    def _wait_idle(self, deadline=None):
+        """Block until idle; False if `deadline` (a datetime) passes first."""
+        while not self.idle():
+            if deadline is not None and datetime.now() >= deadline:
+                return False
+            time.sleep(self.poll_seconds)
+        return deadline is None or datetime.now() < deadline
+
+    def install(self, now):
+        """Put the current window's answers into the AnswerCache (no synthesis)."""
+        answers = self.pipeline.answers
+        for request, lang in self.jobs(now):
+            if not self._wait_idle():
+                return
+            start = time.perf_counter()
+            with _torch_threads(self.torch_threads):
+                text, audio = self.render(request, lang, now, synthesize=False)
+            answers.put(request, lang, text, audio, now=now)
+            RENDERED.inc(phase="install")
+            RENDER_SECONDS.observe(time.perf_counter() - start, phase="install")
+
+    def render_window(self, start_at, deadline):
+        """Render the window opening at start_at into the caches; stops at deadline."""
+        jobs = list(self.jobs(start_at))
+        i = 0
+        while i < len(jobs):
+            if not self._wait_idle(deadline):
+                return False
+            request, lang = jobs[i]
+            started = time.perf_counter()
+            self.preempted = False
+            with _torch_threads(self.torch_threads):
+                self.render(request, lang, start_at, synthesize=self.tts)
+            if self.preempted:
+                continue  # finished sentences stay cached; redo the rest once idle
+            RENDERED.inc(phase="next")
+            RENDER_SECONDS.observe(time.perf_counter() - started, phase="next")
+            i += 1
+            self.progress = i / len(jobs)
+        return True
+
+    def _cycle(self):
+        now = datetime.now().replace(second=0, microsecond=0)
+        boundary = self.pipeline.train_api.valid_until({"action": "get_next_train_time"}, now)
+
+        # 1. A train just left (or we just started): serve the open window
+        if self.installed_window != boundary:
+            self.install(now)
+            self.installed_window = boundary
+            self.progress = 0.0
+            print(f"[PRERENDER] Window until {boundary:%H:%M} installed")
+
+        # 2. Get the window after the next departure ready
+        if self.rendered_window != boundary:
+            with _try_lock(LOCK_FILE) as owner:
+                if owner:
+                    start = time.perf_counter()
+                    if self.render_window(boundary, deadline=boundary):
+                        print(f"[PRERENDER] Window from {boundary:%H:%M} rendered "
+                              f"in {time.perf_counter() - start:.0f}s")
+            self.rendered_window = boundary
+
+        # 3. Sleep until that departure
+        wait = (boundary - datetime.now()).total_seconds()
+        time.sleep(min(max(wait, self.poll_seconds), 60))
+
+    def _run(self):
+        try:
+            # Lowest CPU priority for this thread only (Linux threads are tasks)
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+
+        loader = self.pipeline.loader
+        while not loader.ready(("nlp", "output")):
+            time.sleep(1)
+
+        while True:
+            try:
+                self._cycle()
+            except Exception as e:
+                print(f"[PRERENDER ERROR] {e}")
+                time.sleep(30)
+
+    def start(self):
+        """Run in a daemon thread (once per process)."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        threading.Thread(target=self._run, name="h2h-prerender", daemon=True).start()
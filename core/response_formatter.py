@@ -1,3 +1,4 @@
+import re
 from datetime import datetime
 
 
@@ -45,14 +46,53 @@ def time_to_spoken(time_24: str) -> str:
         return time_24
 
 
+# --------------------------------------------------
+# Templates
+# --------------------------------------------------
+
+# Slots copied verbatim into translations (numbers). Station and train
+# names are transliterated rather than translated (translating a name word
+# by word mangles it); every other slot value (spoken times, statuses) is
+# translated on its own.
+LITERAL_SLOTS = {"train_no", "fare"}
+NAME_SLOT = re.compile(r"(origin|destination|train\d+|stop\d+)")
+
+
+def is_literal_slot(name: str) -> bool:
+    return name in LITERAL_SLOTS
+
+
+def is_name_slot(name: str) -> bool:
+    return NAME_SLOT.fullmatch(name) is not None
+
+
+def _literal(text: str) -> str:
+    """Free text used as a template with no slots."""
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _plural(n: int) -> str:
+    return "s" if n > 1 else ""
+
+
 # --------------------------------------------------
 # Response Formatter
 # --------------------------------------------------
 
 class ResponseFormatter:
     def format(self, response: dict) -> str:
+        template, slots = self.format_template(response)
+        return template.format(**slots)
+
+    def format_template(self, response: dict):
+        """
+        Return (template, slots): a str.format template whose {slot}
+        fields hold the variable parts of the answer (stations, train
+        names, spoken times) and the values to fill them with. The set of
+        templates is small, which lets translations be reused per template.
+        """
         if not response or "type" not in response:
-            return "Sorry, I could not find the information you requested."
+            return "Sorry, I could not find the information you requested.", {}
 
         rtype = response["type"]
 
@@ -61,19 +101,18 @@ class ResponseFormatter:
         # ----------------------------
         if rtype == "train_timing":
             if "message" in response:
-                return response["message"]
+                return _literal(response["message"]), {}
 
-            train_name = response.get("train_name", "the train").title()
-            origin = response.get("origin", "your station")
-            destination = response.get("destination", "your destination")
-            date = response.get("date", "today")
             is_tomorrow = response.get("is_tomorrow", False)
             next_tomorrow = response.get("next_train_tomorrow")
             destination_matched = response.get("destination_matched", True)
 
-            dep_time = time_to_spoken(
-                response.get("departure_time", "")
-            )
+            slots = {
+                "train0": response.get("train_name", "the train").title(),
+                "origin": response.get("origin", "your station"),
+                "destination": response.get("destination", "your destination"),
+                "time0": time_to_spoken(response.get("departure_time", "")),
+            }
 
             # Note: If destination didn't match, we're showing any available train
 
@@ -81,39 +120,39 @@ class ResponseFormatter:
                 # Only tomorrow's train available
                 if destination_matched:
                     return (
-                        f"There are no more trains today. "
-                        f"The next available train from {origin} to {destination} "
-                        f"is the {train_name}, departing tomorrow at {dep_time}."
-                    )
+                        "There are no more trains today. "
+                        "The next available train from {origin} to {destination} "
+                        "is the {train0}, departing tomorrow at {time0}."
+                    ), slots
                 else:
                     return (
-                        f"There are no more trains today to {destination}. "
-                        f"The next available train from {origin} "
-                        f"is the {train_name}, departing tomorrow at {dep_time}."
-                    )
+                        "There are no more trains today to {destination}. "
+                        "The next available train from {origin} "
+                        "is the {train0}, departing tomorrow at {time0}."
+                    ), slots
             else:
                 # Today's train available
                 if destination_matched:
                     lines = [
-                        f"The next train from {origin} to {destination} "
-                        f"is the {train_name}, departing today at {dep_time}."
+                        "The next train from {origin} to {destination} "
+                        "is the {train0}, departing today at {time0}."
                     ]
                 else:
                     lines = [
-                        f"No direct trains to {destination} available. "
-                        f"The next train from {origin} "
-                        f"is the {train_name}, departing today at {dep_time}."
+                        "No direct trains to {destination} available. "
+                        "The next train from {origin} "
+                        "is the {train0}, departing today at {time0}."
                     ]
                 
                 # Also mention tomorrow's next train if available
                 if next_tomorrow:
-                    tomorrow_name = next_tomorrow["train_name"].title()
-                    tomorrow_time = time_to_spoken(next_tomorrow["departure_time"])
+                    slots["train1"] = next_tomorrow["train_name"].title()
+                    slots["time1"] = time_to_spoken(next_tomorrow["departure_time"])
                     lines.append(
-                        f"The next train tomorrow is the {tomorrow_name} at {tomorrow_time}."
+                        "The next train tomorrow is the {train1} at {time1}."
                     )
                 
-                return " ".join(lines)
+                return " ".join(lines), slots
 
         # ----------------------------
         # TRAINS BETWEEN
@@ -121,39 +160,44 @@ class ResponseFormatter:
         if rtype == "train_between":
             trains = response.get("trains", [])
             if not trains:
-                return "There are no trains available for this route today or tomorrow."
+                return "There are no trains available for this route today or tomorrow.", {}
 
-            origin = response.get("origin", "")
-            destination = response.get("destination", "")
-            has_tomorrow = response.get("has_tomorrow", False)
+            slots = {
+                "origin": response.get("origin", ""),
+                "destination": response.get("destination", ""),
+            }
 
             # Separate today and tomorrow trains
             trains_today = [t for t in trains if t.get("date") == "today"]
             trains_tomorrow = [t for t in trains if t.get("date") == "tomorrow"]
 
             if "error" in response:
-                return response["error"]
+                return _literal(response["error"]), {}
 
             lines = []
 
+            def add_train(t):
+                i = sum(1 for k in slots if k.startswith("train"))
+                slots[f"train{i}"] = t["train_name"].title()
+                slots[f"time{i}"] = time_to_spoken(t.get("departure_time", ""))
+                lines.append(f"{{train{i}}} at {{time{i}}}")
+
             if trains_today:
-                lines.append(f"I found {len(trains_today)} train{'s' if len(trains_today) > 1 else ''} today from {origin} to {destination}:")
+                n = len(trains_today)
+                lines.append(f"I found {n} train{_plural(n)} today from {{origin}} to {{destination}}:")
                 for t in trains_today[:3]:  # limit to 3 today
-                    name = t["train_name"].title()
-                    dep = time_to_spoken(t.get("departure_time", ""))
-                    lines.append(f"{name} at {dep}")
+                    add_train(t)
             
             if trains_tomorrow:
+                n = len(trains_tomorrow)
                 if trains_today:
-                    lines.append(f"And {len(trains_tomorrow)} train{'s' if len(trains_tomorrow) > 1 else ''} tomorrow:")
+                    lines.append(f"And {n} train{_plural(n)} tomorrow:")
                 else:
-                    lines.append(f"I found {len(trains_tomorrow)} train{'s' if len(trains_tomorrow) > 1 else ''} tomorrow from {origin} to {destination}:")
+                    lines.append(f"I found {n} train{_plural(n)} tomorrow from {{origin}} to {{destination}}:")
                 for t in trains_tomorrow[:2]:  # limit to 2 tomorrow
-                    name = t["train_name"].title()
-                    dep = time_to_spoken(t.get("departure_time", ""))
-                    lines.append(f"{name} at {dep}")
+                    add_train(t)
 
-            return ". ".join(lines) + "."
+            return ". ".join(lines) + ".", slots
 
         # ----------------------------
         # ROUTE
@@ -161,36 +205,45 @@ class ResponseFormatter:
         if rtype == "route":
             stops = response.get("stops", [])
             if not stops:
-                return "Route information is not available for this train."
+                return "Route information is not available for this train.", {}
 
+            slots = {f"stop{i}": stop for i, stop in enumerate(stops)}
             return (
                 "This train passes through the following stations: "
-                + ", ".join(stops)
+                + ", ".join(f"{{{name}}}" for name in slots)
                 + "."
-            )
+            ), slots
 
         # ----------------------------
         # STATUS
         # ----------------------------
         if rtype == "status":
             if "error" in response:
-                return response["error"]
-            return f"Train {response.get('train_no')} is running as per schedule."
+                return _literal(response["error"]), {}
+            return "Train {train_no} is running as per schedule.", {
+                "train_no": str(response.get("train_no"))
+            }
 
         # ----------------------------
         # PNR
         # ----------------------------
         if rtype == "pnr":
-            return f"Your ticket status is {response.get('status', 'unknown')}."
+            return "Your ticket status is {status}.", {
+                "status": str(response.get("status", "unknown"))
+            }
 
         # ----------------------------
         # FARE
         # ----------------------------
         if rtype == "fare":
             return (
-                f"The fare from {response.get('origin')} to "
-                f"{response.get('destination')} is approximately "
-                f"{response.get('fare')}."
-            )
-
-        return "I have the information, but I cannot phrase it properly yet."
+                "The fare from {origin} to "
+                "{destination} is approximately "
+                "{fare}."
+            ), {
+                "origin": str(response.get("origin")),
+                "destination": str(response.get("destination")),
+                "fare": str(response.get("fare")),
+            }
+
+        return "I have the information, but I cannot phrase it properly yet.", {}
@@ -0,0 +1,138 @@
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SchedulerFull(Exception):
+    """Raised by RequestScheduler.submit when the wait queue is full."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Server busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Job:
+    """
+    One scheduled request. Worker threads report progress with emit();
+    the event loop consumes it with `async for msg in job.events()`.
+    """
+
+    _SENTINEL = object()
+
+    def __init__(self, fn, loop):
+        self.fn = fn
+        self.cancelled = False
+        self._loop = loop
+        self._queue = asyncio.Queue()
+
+    def emit(self, msg):
+        # Safe from any thread; wakes the consumer without polling
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, msg)
+
+    def _close(self):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, self._SENTINEL)
+
+    def cancel(self):
+        """Drop the job if it has not started yet (e.g. client went away)."""
+        self.cancelled = True
+
+    async def events(self):
+        while True:
+            msg = await self._queue.get()
+            if msg is self._SENTINEL:
+                break
+            yield msg
+
+
+class RequestScheduler:
+    """
+    Fixed-size worker pool with a bounded FIFO wait queue.
+
+    Jobs beyond `workers + max_queue` are rejected immediately with a
+    Retry-After estimate based on a moving average of job durations.
+    Waiting jobs receive {"type": "queue", "position": n} updates.
+    """
+
+    def __init__(self, workers=1, max_queue=8, initial_service_time=5.0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="h2h-worker")
+        self._lock = threading.Lock()
+        self._waiting = []
+        self._running = 0
+        self._avg_service_time = initial_service_time
+
+    # ---------------------------------------
+    # Introspection
+    # ---------------------------------------
+    @property
+    def queue_depth(self):
+        with self._lock:
+            return len(self._waiting)
+
+    @property
+    def in_flight(self):
+        with self._lock:
+            return self._running
+
+    def retry_after(self):
+        with self._lock:
+            backlog = len(self._waiting) + 1
+        return max(1, math.ceil(backlog / self.workers * self._avg_service_time))
+
+    # ---------------------------------------
+    # Submission
+    # ---------------------------------------
+    def submit(self, fn):
+        """
+        Schedule fn(emit) on the worker pool. Must be called from the event
+        loop. Raises SchedulerFull when the wait queue is at capacity.
+        """
+        job = Job(fn, asyncio.get_running_loop())
+
+        with self._lock:
+            busy = self._running + len(self._waiting) >= self.workers
+            if busy and len(self._waiting) >= self.max_queue:
+                full = True
+            else:
+                full = False
+                self._waiting.append(job)
+                position = len(self._waiting)
+
+        if full:
+            raise SchedulerFull(self.retry_after())
+
+        if busy:
+            job.emit({"type": "queue", "position": position})
+
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        with self._lock:
+            self._waiting.remove(job)
+            still_waiting = list(self._waiting)
+            if not job.cancelled:
+                self._running += 1
+
+        # Everyone behind this job moved up one place
+        for i, other in enumerate(still_waiting):
+            other.emit({"type": "queue", "position": i + 1})
+
+        if job.cancelled:
+            job._close()
+            return
+
+        start = time.perf_counter()
+        try:
+            job.fn(job.emit)
+        except Exception as e:
+            job.emit({"type": "error", "text": str(e)})
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._running -= 1
+                self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * elapsed
+            job._close()
@@ -2,128 +2,310 @@
 
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import torch
-import librosa
 import whisper
 from transformers import WhisperProcessor, WhisperForConditionalGeneration, pipeline, AutoModel
-from deep_translator import GoogleTranslator
 from core.denoise import DenoiseUnit
-
+from core.audio_io import AudioBuffer
+from core.translate import translate, source_language
+from core.asr_batcher import BatchingASRExecutor
+from core.config import ASR_BATCHING, ASR_BATCH_WINDOW_MS, ASR_MAX_BATCH, ASR_BUCKET_SECONDS
+from core.config import INFERENCE_TIER, WHISPER_BACKEND
+from core.inference_tier import quantize_int8, load_faster_whisper
+from core.config import (
+    LISTEN_WORKERS,
+    SPECULATIVE_LANGS,
+    SPECULATIVE_TOP_K,
+    SPECULATIVE_RACE_WHISPER,
+)
 
 
 # -----------------------------
 # Singleton Model Holders
 # -----------------------------
-_WHISPER_MODEL = None
-_INDIC_MODEL = None
+# Keyed by Whisper backend / inference tier so tiers can be compared in-process
+_WHISPER_MODELS = {}
+_INDIC_MODELS = {}
+_ASR_BATCHER = None
+_ASR_BATCHER_LOCK = threading.Lock()
+
+# Whisper installs kv-cache hooks on the model while transcribing, so LID and
+# transcription must never run on it at the same time
+_WHISPER_LOCK = threading.Lock()
+
+# Workers for speculative decoding: per concurrent request, LID + prior-language
+# decodes + top-k candidate decodes + the optional Whisper race
+_SPECULATIVE_POOL = ThreadPoolExecutor(
+    max_workers=LISTEN_WORKERS * (1 + len(SPECULATIVE_LANGS) + SPECULATIVE_TOP_K + SPECULATIVE_RACE_WHISPER),
+    thread_name_prefix="asr-spec",
+)
+
+SUPPORTED_LANGS = ("en", "hi", "ml")
+
+
+def _map_language(detected):
+    # ---- CONSTRAIN TO SUPPORTED LANGUAGES ONLY ----
+    # Your product supports only: English, Hindi, Malayalam
+    if detected == "ml":
+        return "ml"
+    elif detected == "hi":
+        return "hi"
+    elif detected == "en":
+        return "en"
+    elif detected in {"ta", "kn", "te"}:
+        # Dravidian languages often confused with Malayalam
+        return "ml"
+    elif detected in {"ur", "bn", "pa", "gu", "mr", "or"}:
+        return "hi"
+    # Safe fallback
+    return "en"
+
+
+def _looks_valid(text):
+    return bool(text) and len(text.split()) >= 2
 
 
 class SpeechUnit:
-    def __init__(self, checkpoint_path=None):
+    def __init__(self, checkpoint_path=None, tier=INFERENCE_TIER,
+                 whisper_backend=WHISPER_BACKEND, denoise=True):
         # checkpoint_path no longer used, kept only to avoid breaking pipeline
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        print("[INIT] SpeechUnit ready - models will load on first use.")
-        self.denoiser = DenoiseUnit(enabled=True)
+        self.tier = tier
+        self.whisper_backend = whisper_backend
+        print(f"[INIT] SpeechUnit ready ({tier}, whisper={whisper_backend}) - models will load on first use.")
+        self.denoiser = DenoiseUnit(enabled=denoise)
 
     # -----------------------------
     # MODEL LOADERS (Lazy Singleton)
     # -----------------------------
     def _load_whisper(self):
-        global _WHISPER_MODEL
-        if _WHISPER_MODEL is None:
+        if self.whisper_backend not in _WHISPER_MODELS:
             print("[LOAD] Whisper-tiny (Language Detection Only)...")
-            _WHISPER_MODEL = whisper.load_model("tiny")
-        return _WHISPER_MODEL
+            if self.whisper_backend == "faster-whisper":
+                _WHISPER_MODELS[self.whisper_backend] = load_faster_whisper()
+            else:
+                _WHISPER_MODELS[self.whisper_backend] = whisper.load_model("tiny")
+        return _WHISPER_MODELS[self.whisper_backend]
 
     def _load_indic(self):
         """Lazily load IndicConformer 600M multilingual ASR model."""
-        global _INDIC_MODEL
-        if _INDIC_MODEL is None:
-            print("[LOAD] IndicConformer-600M Multilingual (AI4Bharat)...")
-            _INDIC_MODEL = AutoModel.from_pretrained(
+        if self.tier not in _INDIC_MODELS:
+            print(f"[LOAD] IndicConformer-600M Multilingual (AI4Bharat, {self.tier})...")
+            model = AutoModel.from_pretrained(
                 "ai4bharat/indic-conformer-600m-multilingual",
                 trust_remote_code=True
             ).to(self.device)
-        return _INDIC_MODEL
+            if self.tier != "fp32":
+                # No separate ONNX export for IndicConformer; both quantized
+                # tiers use dynamic int8 on whatever Linear layers it has
+                model = quantize_int8(model)
+            _INDIC_MODELS[self.tier] = model
+        return _INDIC_MODELS[self.tier]
+
+    def _get_asr_batcher(self):
+        """Shared micro-batching executor for IndicConformer CTC decoding."""
+        global _ASR_BATCHER
+        with _ASR_BATCHER_LOCK:
+            if _ASR_BATCHER is None:
+                _ASR_BATCHER = BatchingASRExecutor(
+                    self._load_indic,
+                    self.device,
+                    window_ms=ASR_BATCH_WINDOW_MS,
+                    max_batch=ASR_MAX_BATCH,
+                    bucket_seconds=ASR_BUCKET_SECONDS,
+                )
+        return _ASR_BATCHER
+
+    def asr_metrics(self):
+        """Batch-size and wait-time metrics (empty when batching is off)."""
+        return _ASR_BATCHER.metrics() if _ASR_BATCHER is not None else {}
 
     # -----------------------------
     # RUNTIME FUNCTIONS
     # -----------------------------
 
+    # Every stage accepts a path, a NumPy array or an AudioBuffer. Pass the
+    # same AudioBuffer through to decode and featurize only once.
+
     def preprocess_audio(self, audio_path):
         return self.denoiser.denoise(audio_path)
 
 
-    def detect_language(self, audio_path):
+    def _language_candidates(self, audio_path):
+        """Supported languages ranked by Whisper probability (+ raw top code)."""
         model = self._load_whisper()
-        audio = whisper.load_audio(audio_path)
-        audio = whisper.pad_or_trim(audio)
-        mel = whisper.log_mel_spectrogram(audio).to(model.device)
-    
-        _, probs = model.detect_language(mel)
-        detected = max(probs, key=probs.get)
-    
-        # ---- CONSTRAIN TO SUPPORTED LANGUAGES ONLY ----
-        # Your product supports only: English, Hindi, Malayalam
-        if detected == "ml":
-            lang = "ml"
-        elif detected == "hi":
-            lang = "hi"
-        elif detected == "en":
-            lang = "en"
-        elif detected in {"ta", "kn", "te"}:
-            # Dravidian languages often confused with Malayalam
-            lang = "ml"
-        elif detected in {"ur", "bn", "pa", "gu", "mr", "or"}:
-            lang = "hi"
+        audio = AudioBuffer.from_source(audio_path)
+
+        if self.whisper_backend == "faster-whisper":
+            _, _, all_probs = model.detect_language(audio.samples)
+            ranked = [code for code, _ in sorted(all_probs, key=lambda p: p[1], reverse=True)]
         else:
-            # Safe fallback
-            lang = "en"
+            mel = audio.log_mel(model.dims.n_mels).to(model.device)
+            with _WHISPER_LOCK:
+                _, probs = model.detect_language(mel)
+            ranked = sorted(probs, key=probs.get, reverse=True)
+
+        candidates = list(dict.fromkeys(_map_language(code) for code in ranked))
+        return candidates, ranked[0]
+
+    def detect_language(self, audio_path):
+        candidates, detected = self._language_candidates(audio_path)
+        lang = candidates[0]
     
         print(f"[LANG DETECTED] {detected} → using {lang}")
         return lang
-    
+
+    def _indic_transcribe(self, audio, lang):
+        """IndicConformer CTC transcript, or "" if decoding failed."""
+        try:
+            if ASR_BATCHING:
+                # Shares one CTC forward with concurrent requests
+                return self._get_asr_batcher().transcribe(audio.samples, lang)
+
+            model = self._load_indic()
+            wav_tensor = torch.from_numpy(audio.samples).unsqueeze(0).to(self.device)
+            result = model(wav_tensor, lang, "ctc")
+            return result[0].strip() if isinstance(result, list) else str(result).strip()
+        except Exception:
+            return ""
+
+    def _whisper_transcribe(self, audio):
+        whisper_model = self._load_whisper()
+
+        if self.whisper_backend == "faster-whisper":
+            # CTranslate2 models are thread-safe, no lock needed
+            segments, _ = whisper_model.transcribe(audio.samples)
+            return "".join(seg.text for seg in segments).strip()
+
+        with _WHISPER_LOCK:
+            result = whisper_model.transcribe(audio.samples)
+        return result["text"].strip()
+
+    def partial_transcribe(self, audio_path, lang):
+        """
+        IndicConformer transcript of a still-growing utterance, without
+        the Whisper fallback (see core.streaming). "" if decoding failed.
+        """
+        return self._indic_transcribe(AudioBuffer.from_source(audio_path), lang)
 
     def speech_to_text(self, audio_path, lang):
         try:
             # 1️⃣ Try IndicConformer first (works for Malayalam + sometimes English)
             print("[ASR] Trying IndicConformer")
-            model = self._load_indic()
-    
-            wav, sr = librosa.load(audio_path, sr=16000, mono=True)
-            wav_tensor = torch.tensor(wav, dtype=torch.float32).unsqueeze(0).to(self.device)
-    
-            try:
-                result = model(wav_tensor, lang, "ctc")
-                text = result[0].strip() if isinstance(result, list) else str(result).strip()
-            except Exception:
-                text = ""
+            audio = AudioBuffer.from_source(audio_path)
+            text = self._indic_transcribe(audio, lang)
     
             # Accept Indic output if it looks valid
-            if text and len(text.split()) >= 2:
+            if _looks_valid(text):
                 print(f"[TEXT][Indic] → {text}")
                 return text
     
             # 2️⃣ Fallback to Whisper (reliable for English)
             print("[ASR] Falling back to Whisper")
-            whisper_model = self._load_whisper()
-            result = whisper_model.transcribe(audio_path)
-            text = result["text"].strip()
+            text = self._whisper_transcribe(audio)
             print(f"[TEXT][Whisper] → {text}")
             return text
     
         except Exception as e:
             logging.error(f"[ERROR] ASR Failed: {e}")
             return "[ERROR] Speech failed."
-    
+
+    def speculative_transcribe(self, audio_path, prior_langs=SPECULATIVE_LANGS,
+                               top_k=SPECULATIVE_TOP_K, race_whisper=SPECULATIVE_RACE_WHISPER):
+        """
+        Language ID and ASR in parallel. IndicConformer starts on
+        prior_langs while Whisper LID runs. After LID, the top_k candidate
+        languages are decoded and (optionally) the Whisper fallback is
+        raced. The first acceptable transcript in LID rank order wins and
+        losing work that has not started is cancelled (a forward pass
+        already running is left to finish and its result dropped).
+
+        Returns (lang, text, timings). timings["sequential"] is what the
+        same work would have cost back to back; timings["critical_path"] is
+        the wall time actually spent.
+        """
+        audio = AudioBuffer.from_source(audio_path)
+        start = time.perf_counter()
+        work = {}
+
+        def timed(name, fn, *args):
+            def run():
+                t0 = time.perf_counter()
+                try:
+                    return fn(*args)
+                finally:
+                    work[name] = time.perf_counter() - t0
+            return _SPECULATIVE_POOL.submit(run)
+
+        decodes = {
+            lang: timed(f"asr_{lang}", self._indic_transcribe, audio, lang)
+            for lang in prior_langs if lang in SUPPORTED_LANGS
+        }
+        lid = timed("lid", self._language_candidates, audio)
+
+        try:
+            candidates, detected = lid.result()
+            lid_done = time.perf_counter() - start
+            lang = top1 = candidates[0]
+            print(f"[LANG DETECTED] {detected} → using {lang} (speculative)")
+
+            for cand in candidates[:max(1, top_k)]:
+                if cand not in decodes:
+                    decodes[cand] = timed(f"asr_{cand}", self._indic_transcribe, audio, cand)
+
+            fallback = timed("whisper", self._whisper_transcribe, audio) if race_whisper else None
+
+            # Rank order decides the winner, not completion order
+            text, winner = "", None
+            for cand in candidates[:max(1, top_k)]:
+                text = decodes[cand].result()
+                if _looks_valid(text):
+                    winner = f"indic_{cand}"
+                    if cand != lang:
+                        print(f"[ASR] {lang} decode rejected, using {cand} candidate")
+                        lang = cand
+                    break
+
+            if winner is None:
+                if fallback is None:
+                    fallback = timed("whisper", self._whisper_transcribe, audio)
+                text = fallback.result()
+                winner = "whisper"
+            elif fallback is not None:
+                fallback.cancel()
+
+        except Exception as e:
+            logging.error(f"[ERROR] ASR Failed: {e}")
+            return "en", "[ERROR] Speech failed.", {}
+
+        finally:
+            for future in decodes.values():
+                future.cancel()
+
+        critical_path = time.perf_counter() - start
+        timings = {
+            "lid": work.get("lid", 0.0),
+            "lid_done_at": lid_done,
+            "critical_path": critical_path,
+            # The old path: LID, then top-1 decode, then Whisper if rejected
+            "sequential": work.get("lid", 0.0) + work.get(f"asr_{top1}", 0.0)
+                          + (work.get("whisper", 0.0) if winner != f"indic_{top1}" else 0.0),
+            "winner": winner,
+        }
+        print(f"[TEXT][{winner}] → {text}")
+        print(f"[ASR] Speculative critical path {critical_path * 1000:.0f} ms "
+              f"vs sequential {timings['sequential'] * 1000:.0f} ms")
+        return lang, text, timings
     
 
     def translate_to_english(self, text, lang=None):
         try:
-            translated = GoogleTranslator(
-                source=lang or "auto",
-                target="en"
-            ).translate(text)
+            # IndicTrans2 by default; H2H_TRANSLATION_BACKEND=google for the old path.
+            # The LID label can be wrong (ta for Malayalam): trust the script over it
+            translated = translate(text, source_language(text, lang), "en")
 
             print(f"[TRANSLATED] {translated}")
             return translated
@@ -131,4 +313,3 @@ class SpeechUnit:
         except Exception as e:
             print(f"[TRANSLATION ERROR] {e}")
             return text  # Fallback: return original text if translation fails
-
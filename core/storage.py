@@ -1,18 +1,224 @@
+import fnmatch
 import os
+import random
+import shutil
+import threading
+import time
 from datetime import datetime
+from core.metrics import REGISTRY
+from core.config import (
+    RECORDING_SAMPLE_PERCENT,
+    RETENTION,
+    STORAGE_GRACE_SECONDS,
+    STORAGE_SWEEP_SECONDS,
+    STORAGE_TMPFS,
+    STORAGE_TMPFS_DIR,
+)
 
 BASE = "data"
 
+# Per-request artifacts nobody needs after the answer is delivered
+EPHEMERAL = ("denoised", "tts")
+
 DIRS = {
     "recordings": f"{BASE}/recordings",
     "denoised": f"{BASE}/denoised",
     "tts": f"{BASE}/tts",
     "logs": f"{BASE}/logs",
+    "cache": f"{BASE}/cache",
+    "tts_cache": f"{BASE}/cache/tts",
+    "metrics": f"{BASE}/metrics",
 }
 
+if STORAGE_TMPFS:
+    for _name in EPHEMERAL:
+        DIRS[_name] = os.path.join(STORAGE_TMPFS_DIR, _name)
+
 for d in DIRS.values():
     os.makedirs(d, exist_ok=True)
 
+# Only these files are swept in a directory (default: all of them)
+PATTERNS = {
+    "logs": "queries-*.log*",
+}
+
+DELETED = REGISTRY.counter(
+    "h2h_storage_deleted_files_total", "Files removed by the retention sweeper", labels=("dir", "reason")
+)
+DELETED_BYTES = REGISTRY.counter(
+    "h2h_storage_deleted_bytes_total", "Bytes removed by the retention sweeper", labels=("dir",)
+)
+
 
 def timestamp():
     return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def keep_recording(percent=RECORDING_SAMPLE_PERCENT):
+    """Sampling decision for one uploaded recording (keep `percent`% for QA)."""
+    return percent >= 100 or random.random() * 100 < percent
+
+
+class StorageManager:
+    """
+    Retention for the per-request artifact directories. Each policy in
+    config.RETENTION caps a directory by file age, total size and file
+    count; sweep() deletes expired files, then the oldest ones until the
+    directory fits, then empty subdirectories (e.g. leftover Demucs
+    <model>/<name>/ folders). Files younger than the grace period are
+    only removed for age, so an answer being served is never swept.
+    """
+
+    def __init__(self, dirs=DIRS, policies=RETENTION, patterns=PATTERNS,
+                 grace_seconds=STORAGE_GRACE_SECONDS):
+        self.dirs = dirs
+        self.policies = policies
+        self.patterns = patterns
+        self.grace_seconds = grace_seconds
+        self._lock = threading.Lock()
+        self._pid = None
+        self.last_sweep = None
+        self._last_usage = None
+
+    def _files(self, name):
+        root, pattern = self.dirs[name], self.patterns.get(name)
+        # Directories nested in this one (data/cache/tts) are counted on their own
+        others = {os.path.abspath(d) for n, d in self.dirs.items() if n != name}
+        files = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) not in others]
+            for fname in filenames:
+                if pattern and not fnmatch.fnmatch(fname, pattern):
+                    continue
+                path = os.path.join(dirpath, fname)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue  # removed by another worker
+                files.append((st.st_mtime, st.st_size, path))
+        files.sort()
+        return files
+
+    def _remove(self, name, path, size, reason):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        DELETED.inc(dir=name, reason=reason)
+        DELETED_BYTES.inc(size, dir=name)
+
+    def _prune_empty_dirs(self, root):
+        for dirpath, _, _ in sorted(os.walk(root), key=lambda w: -len(w[0])):
+            if dirpath != root:
+                try:
+                    os.rmdir(dirpath)
+                except OSError:
+                    pass  # not empty
+
+    def sweep_dir(self, name):
+        policy = self.policies[name]
+        now = time.time()
+        files = self._files(name)
+        removed = {"age": 0, "bytes": 0, "files": 0}
+
+        max_age = policy["max_age_hours"] * 3600
+        if max_age:
+            expired = [f for f in files if now - f[0] > max_age]
+            for _, size, path in expired:
+                self._remove(name, path, size, "age")
+            removed["age"] = len(expired)
+            files = files[len(expired):]
+
+        total = sum(size for _, size, _ in files)
+        max_bytes = policy["max_mb"] * 1024 * 1024
+        max_files = policy["max_files"]
+        # Oldest first, never inside the grace period
+        while files and now - files[0][0] > self.grace_seconds:
+            over_bytes = max_bytes and total > max_bytes
+            over_files = max_files and len(files) > max_files
+            if not (over_bytes or over_files):
+                break
+            _, size, path = files.pop(0)
+            reason = "bytes" if over_bytes else "files"
+            self._remove(name, path, size, reason)
+            removed[reason] += 1
+            total -= size
+
+        self._prune_empty_dirs(self.dirs[name])
+        return removed
+
+    def sweep(self):
+        """One pass over every directory with a policy; returns what was removed."""
+        with self._lock:
+            report = {}
+            for name in self.policies:
+                try:
+                    report[name] = self.sweep_dir(name)
+                except Exception as e:
+                    print(f"[STORAGE ERROR] {name}: {e}")
+            self.last_sweep = time.time()
+            self._last_usage = self._dir_usage()
+        deleted = sum(n for r in report.values() for n in r.values())
+        if deleted:
+            print(f"[STORAGE] Swept {deleted} files: {report}")
+        return report
+
+    def _dir_usage(self):
+        now = time.time()
+        dirs = {}
+        for name, root in self.dirs.items():
+            files = self._files(name)
+            dirs[name] = {
+                "path": root,
+                "files": len(files),
+                "bytes": sum(size for _, size, _ in files),
+                "oldest_age_hours": round((now - files[0][0]) / 3600, 2) if files else None,
+                "policy": self.policies.get(name),
+            }
+        return dirs
+
+    def last_usage(self):
+        """Per-directory usage as of the last sweep (walked now if there was none)."""
+        if self._last_usage is None:
+            self._last_usage = self._dir_usage()
+        return self._last_usage
+
+    def usage(self):
+        """Current files, bytes and oldest file age per directory, plus free disk."""
+        dirs = self._dir_usage()
+        disk = shutil.disk_usage(BASE)
+        return {
+            "dirs": dirs,
+            "disk": {"total": disk.total, "used": disk.used, "free": disk.free},
+            "tmpfs": STORAGE_TMPFS,
+            "last_sweep": self.last_sweep,
+        }
+
+    def start(self, interval=STORAGE_SWEEP_SECONDS):
+        """Sweep now and then every `interval` seconds from a daemon thread (once per process)."""
+        if not interval or self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+
+        def loop():
+            while True:
+                self.sweep()
+                time.sleep(interval)
+
+        threading.Thread(target=loop, name="h2h-storage-sweeper", daemon=True).start()
+
+
+MANAGER = StorageManager()
+
+# As of the last sweep, so scrapes never walk the directories. Every worker
+# sees the same directories.
+REGISTRY.gauge(
+    "h2h_storage_bytes", "Bytes in each artifact directory at the last sweep", labels=("dir",),
+    fn=lambda: {(name,): d["bytes"] for name, d in MANAGER.last_usage().items()},
+    aggregate="max",
+)
+REGISTRY.gauge(
+    "h2h_storage_files", "Files in each artifact directory at the last sweep", labels=("dir",),
+    fn=lambda: {(name,): d["files"] for name, d in MANAGER.last_usage().items()},
+    aggregate="max",
+)
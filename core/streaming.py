@@ -0,0 +1,262 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from core.audio_io import SAMPLE_RATE, AudioBuffer
+from core.vad import frame_levels
+from core.config import (
+    VAD_FRAME_MS,
+    VAD_MIN_DB,
+    VAD_MARGIN_DB,
+    VAD_MIN_SPEECH_MS,
+    VAD_PAD_MS,
+    STREAM_ENDPOINT_MS,
+    STREAM_PARTIAL_MS,
+    STREAM_LID_SECONDS,
+    STREAM_MAX_SECONDS,
+    STREAM_NO_SPEECH_SECONDS,
+    STREAM_ASR_WORKERS,
+    STREAM_DENOISE,
+)
+
+
+# Partial transcripts of every open stream share these threads
+_PARTIAL_POOL = ThreadPoolExecutor(max_workers=STREAM_ASR_WORKERS, thread_name_prefix="asr-stream")
+
+# Sessions still receiving audio (their partials run outside the request scheduler)
+_OPEN = 0
+_OPEN_LOCK = threading.Lock()
+
+
+def open_sessions():
+    return _OPEN
+
+
+def _looks_valid(text):
+    return bool(text) and len(text.split()) >= 2
+
+
+def pcm16_to_float(data):
+    """Little-endian 16-bit PCM bytes → float32 in [-1, 1)."""
+    return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+
+
+class StreamingSession:
+    """
+    One utterance arriving over /listen/stream in small 16 kHz frames.
+
+    push() runs the same energy VAD as core.vad, incrementally: frames are
+    re-classified against the noise floor seen so far, so speech that
+    started before the floor was known is still found. The endpoint fires
+    after STREAM_ENDPOINT_MS of trailing silence, at STREAM_MAX_SECONDS,
+    when no speech arrives within STREAM_NO_SPEECH_SECONDS, or on stop().
+
+    While the user talks, submit_partial() transcribes the speech so far
+    with IndicConformer (Whisper LID runs once enough speech is in). The
+    whole utterance is re-decoded each time, so every partial has full
+    left context; utterances are short enough for that to stay cheap.
+    Once the user pauses, one more partial covers the complete speech and
+    finish() reuses it instead of decoding again.
+    """
+
+    # Pause after which the partial covering all speech so far is started
+    settle_ms = 200
+
+    def __init__(self, speech, sample_rate=SAMPLE_RATE, frame_ms=VAD_FRAME_MS,
+                 endpoint_ms=STREAM_ENDPOINT_MS, partial_ms=STREAM_PARTIAL_MS,
+                 lid_seconds=STREAM_LID_SECONDS, max_seconds=STREAM_MAX_SECONDS,
+                 no_speech_seconds=STREAM_NO_SPEECH_SECONDS):
+        self.speech = speech
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame = int(sample_rate * frame_ms / 1000)
+        self.endpoint_ms = endpoint_ms
+        self.partial_ms = partial_ms
+        self.lid_seconds = lid_seconds
+        self.max_seconds = max_seconds
+        self.no_speech_seconds = no_speech_seconds
+
+        self._samples = np.zeros(0, dtype=np.float32)
+        self._levels = np.zeros(0, dtype=np.float32)
+        self._arrivals = []          # perf_counter when each frame came in
+        self._lock = threading.Lock()
+
+        self.started_at = time.perf_counter()
+        self.first_voiced = None     # frame indexes
+        self.last_voiced = None
+        self.voiced_frames = 0
+        self.speech_end_at = None    # arrival time of the last voiced frame
+        self.endpoint = None         # "silence" | "max_duration" | "no_speech" | "stop"
+        self.endpoint_at = None
+
+        self.lang = None
+        self.partial_text = ""
+        self.partials = 0
+        self._partial_span = None    # (first_voiced, last_voiced) the partial covers
+        self._partial_started_frames = 0
+        self._partial_running = False
+        self.reused_partial = False
+
+        global _OPEN
+        with _OPEN_LOCK:
+            _OPEN += 1
+
+    # -----------------------------
+    # Audio in + endpointing
+    # -----------------------------
+    @property
+    def duration(self):
+        return len(self._samples) / float(self.sample_rate)
+
+    def push(self, samples):
+        """Append a frame of float32 samples; returns the endpoint reason once it fires."""
+        if self.endpoint is not None:
+            return self.endpoint
+
+        now = time.perf_counter()
+        with self._lock:
+            done = len(self._levels) * self.frame
+            self._samples = np.concatenate([self._samples, np.asarray(samples, dtype=np.float32).reshape(-1)])
+            new_levels, _ = frame_levels(self._samples[done:], self.sample_rate, self.frame_ms)
+            if len(new_levels):
+                self._levels = np.concatenate([self._levels, new_levels])
+                self._arrivals.extend([now] * len(new_levels))
+                self._classify()
+
+        if self.voiced_frames * self.frame_ms < VAD_MIN_SPEECH_MS:
+            if self.duration >= self.no_speech_seconds:
+                self._end("no_speech")
+        elif self.trailing_silence_ms >= self.endpoint_ms:
+            self._end("silence")
+        if self.endpoint is None and self.duration >= self.max_seconds:
+            self._end("max_duration")
+        return self.endpoint
+
+    def _classify(self):
+        levels = self._levels
+        if levels.max() < VAD_MIN_DB:
+            return
+        floor = float(np.percentile(levels, 10))
+        voiced = np.flatnonzero(levels > max(VAD_MIN_DB, floor + VAD_MARGIN_DB))
+        if not len(voiced):
+            return
+        self.first_voiced, self.last_voiced = int(voiced[0]), int(voiced[-1])
+        self.voiced_frames = len(voiced)
+        self.speech_end_at = self._arrivals[self.last_voiced]
+
+    @property
+    def trailing_silence_ms(self):
+        if self.last_voiced is None:
+            return len(self._levels) * self.frame_ms
+        return (len(self._levels) - 1 - self.last_voiced) * self.frame_ms
+
+    def stop(self):
+        """The client stopped sending audio."""
+        if self.endpoint is None:
+            self._end("stop")
+
+    def _end(self, reason):
+        global _OPEN
+        self.endpoint = reason
+        self.endpoint_at = time.perf_counter()
+        with _OPEN_LOCK:
+            _OPEN -= 1
+
+    def _speech_audio(self):
+        """AudioBuffer of the speech region plus VAD_PAD_MS on either side."""
+        with self._lock:
+            pad = int(self.sample_rate * VAD_PAD_MS / 1000)
+            start = max(0, self.first_voiced * self.frame - pad)
+            end = min(len(self._samples), (self.last_voiced + 1) * self.frame + pad)
+            span = (self.first_voiced, self.last_voiced)
+            return AudioBuffer(self._samples[start:end], self.sample_rate), span
+
+    @property
+    def has_speech(self):
+        return self.voiced_frames * self.frame_ms >= VAD_MIN_SPEECH_MS
+
+    @property
+    def low_snr(self):
+        """
+        No speech cleared the noise floor by VAD_MARGIN_DB, but the stream
+        is not silent either: possibly speech over loud noise, which
+        core.vad.trim_silence would still send through denoise.
+        """
+        with self._lock:
+            loud = len(self._levels) and self._levels.max() >= VAD_MIN_DB
+        return not self.has_speech and bool(loud)
+
+    def recording(self):
+        """AudioBuffer of everything received so far."""
+        with self._lock:
+            return AudioBuffer(self._samples, self.sample_rate)
+
+    # -----------------------------
+    # Partial transcripts
+    # -----------------------------
+    def partial_due(self):
+        if self._partial_running or self.endpoint is not None or not self.has_speech:
+            return False
+        if self._partial_span == (self.first_voiced, self.last_voiced):
+            return False  # nothing new since the last partial
+        new_ms = (len(self._levels) - self._partial_started_frames) * self.frame_ms
+        return new_ms >= self.partial_ms or self.trailing_silence_ms >= self.settle_ms
+
+    def submit_partial(self):
+        """Decode the speech so far on the shared pool; the future returns the text."""
+        self._partial_running = True
+        self._partial_started_frames = len(self._levels)
+        return _PARTIAL_POOL.submit(self._run_partial)
+
+    def _run_partial(self):
+        try:
+            audio, span = self._speech_audio()
+            if self.lang is None:
+                # Too little speech to trust LID, unless the user has paused
+                if audio.duration < self.lid_seconds and self.trailing_silence_ms < self.settle_ms:
+                    return None
+                self.lang = self.speech.detect_language(audio)
+            text = self.speech.partial_transcribe(audio, self.lang)
+            self.partial_text, self._partial_span = text, span
+            self.partials += 1
+            return text
+        finally:
+            self._partial_running = False
+
+    # -----------------------------
+    # Final transcript
+    # -----------------------------
+    def finish(self):
+        """
+        (audio, lang, text) for the finished utterance, or (None, None, "")
+        without speech. Reuses the last partial when it already covers all
+        voiced frames; call after any running partial has completed.
+        """
+        if not self.has_speech:
+            return None, None, ""
+
+        audio, span = self._speech_audio()
+        if STREAM_DENOISE:
+            audio = AudioBuffer.from_source(self.speech.preprocess_audio(audio))
+        elif span == self._partial_span and _looks_valid(self.partial_text):
+            self.reused_partial = True
+            return audio, self.lang, self.partial_text
+
+        if self.lang is None:
+            self.lang = self.speech.detect_language(audio)
+        return audio, self.lang, self.speech.speech_to_text(audio, self.lang)
+
+    def stats(self):
+        return {
+            "endpoint": self.endpoint,
+            "duration": round(self.duration, 3),
+            "speech_seconds": round(self.voiced_frames * self.frame / self.sample_rate, 3),
+            "speech_ratio": round(self.voiced_frames / len(self._levels), 3) if len(self._levels) else 0.0,
+            "partials": self.partials,
+            "reused_partial": self.reused_partial,
+            # How long after the last voiced frame the endpoint fired
+            "endpoint_delay_ms": round((self.endpoint_at - self.speech_end_at) * 1000, 1)
+                                 if self.endpoint_at and self.speech_end_at else None,
+        }
@@ -0,0 +1,91 @@
+from bisect import bisect_right
+
+
+def _time_to_minutes(t):
+    h, m = map(int, t.split(":"))
+    return h * 60 + m
+
+
+class TimetableIndex:
+    """
+    Precomputed lookup structures over STATION_TIMETABLE and TRAIN_ROUTES.
+
+    - route_positions[train_no][station] → stop index (first occurrence)
+    - departures keyed by (station, weekday, destination) → sorted by
+      departure minute; destination None holds every train, otherwise only
+      trains whose route reaches destination after station
+    - known_stations: every station on any route
+
+    "Next departure after t" is then a single bisect per key.
+    """
+
+    def __init__(self, timetable, routes):
+        self.route_positions = {}
+        for train_no, route in routes.items():
+            positions = {}
+            for i, station in enumerate(route):
+                positions.setdefault(station, i)
+            self.route_positions[train_no] = positions
+
+        self.known_stations = frozenset(s for route in routes.values() for s in route)
+
+        buckets = {}
+        for station, trains in timetable.items():
+            for seq, t in enumerate(trains):
+                entry = (_time_to_minutes(t["departure_time"]), seq, t)
+
+                keys = [None]
+                positions = self.route_positions.get(t["train_no"], {})
+                if station in positions:
+                    here = positions[station]
+                    keys += [dest for dest, pos in positions.items() if pos > here]
+
+                for day in t["running_days"]:
+                    for dest in keys:
+                        buckets.setdefault((station, day, dest), []).append(entry)
+
+        self._entries = {}
+        self._minutes = {}
+        for key, entries in buckets.items():
+            # Ties keep timetable order, like the original linear scans
+            entries.sort(key=lambda e: (e[0], e[1]))
+            self._entries[key] = entries
+            self._minutes[key] = [e[0] for e in entries]
+
+    def valid_direction(self, train_no, origin, destination):
+        positions = self.route_positions.get(train_no)
+        if not positions or origin not in positions or destination not in positions:
+            return False
+        return positions[origin] < positions[destination]
+
+    def departures_after(self, station, weekday, after_min=-1, destination=None):
+        """(dep_min, seq, train) entries leaving strictly after after_min."""
+        key = (station, weekday, destination)
+        minutes = self._minutes.get(key)
+        if not minutes:
+            return []
+        return self._entries[key][bisect_right(minutes, after_min):]
+
+    def next_departure(self, station, weekday, after_min=-1, destination=None):
+        """First train leaving strictly after after_min, or None."""
+        key = (station, weekday, destination)
+        minutes = self._minutes.get(key)
+        if not minutes:
+            return None
+        i = bisect_right(minutes, after_min)
+        if i == len(minutes):
+            return None
+        return self._entries[key][i][2]
+
+    def destinations_after(self, station, weekday, after_min=-1):
+        """Stations reachable from station, ordered by the next departure to each."""
+        destinations = {}
+        for _, _, t in self.departures_after(station, weekday, after_min):
+            positions = self.route_positions.get(t["train_no"], {})
+            here = positions.get(station)
+            if here is None:
+                continue
+            for dest, pos in sorted(positions.items(), key=lambda p: p[1]):
+                if pos > here:
+                    destinations.setdefault(dest, None)
+        return list(destinations)
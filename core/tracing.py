@@ -0,0 +1,111 @@
+import contextvars
+import time
+import uuid
+from contextlib import contextmanager
+
+from core.metrics import REGISTRY, SIZE_BUCKETS
+
+
+_CURRENT_SPAN = contextvars.ContextVar("h2h_current_span", default=None)
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "h2h_stage_seconds", "Wall time per pipeline stage", labels=("stage",)
+)
+STAGE_CPU_SECONDS = REGISTRY.histogram(
+    "h2h_stage_cpu_seconds", "CPU time of the calling thread per pipeline stage", labels=("stage",)
+)
+BATCH_SIZE = REGISTRY.histogram(
+    "h2h_stage_batch_size", "Model batch size seen by a stage", labels=("stage",), buckets=SIZE_BUCKETS
+)
+STAGE_COUNTERS = {
+    "audio_seconds": REGISTRY.counter(
+        "h2h_stage_audio_seconds_total", "Seconds of audio processed per stage", labels=("stage",)
+    ),
+    "tokens_generated": REGISTRY.counter(
+        "h2h_stage_tokens_generated_total", "Tokens generated per stage", labels=("stage",)
+    ),
+    "cache_hits": REGISTRY.counter(
+        "h2h_stage_cache_hits_total", "Cache hits per stage", labels=("stage",)
+    ),
+}
+
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+
+class Span:
+    def __init__(self, trace_id, name):
+        self.trace_id = trace_id
+        self.name = name
+        self.wall_ms = None
+        self.cpu_ms = None
+        self.counters = {}
+
+    def add(self, **counters):
+        for key, value in counters.items():
+            if key == "batch_size":
+                # Batch size is a level, not an amount: keep the largest seen
+                self.counters[key] = max(self.counters.get(key, 0), value)
+            else:
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def to_dict(self):
+        return {"name": self.name, "wall_ms": self.wall_ms, "cpu_ms": self.cpu_ms, **self.counters}
+
+
+class Trace:
+    """
+    Spans of one request. Each `with trace.span("asr"):` records wall
+    time, CPU time of the calling thread and any counters added with
+    count() while it is open, and feeds the /metrics histograms.
+
+    CPU time only covers the calling thread, so work handed to pools
+    (speculative ASR, the ASR batcher) shows up as wall time only.
+    """
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or new_trace_id()
+        self.spans = []
+
+    @contextmanager
+    def span(self, name, **counters):
+        span = Span(self.trace_id, name)
+        span.add(**counters)
+        token = _CURRENT_SPAN.set(span)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield span
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.thread_time() - cpu
+            _CURRENT_SPAN.reset(token)
+
+            span.wall_ms = round(wall * 1000, 3)
+            span.cpu_ms = round(cpu * 1000, 3)
+            self.spans.append(span)
+
+            STAGE_SECONDS.observe(wall, stage=name)
+            STAGE_CPU_SECONDS.observe(cpu, stage=name)
+            for key, value in span.counters.items():
+                if key == "batch_size":
+                    BATCH_SIZE.observe(value, stage=name)
+                elif key in STAGE_COUNTERS:
+                    STAGE_COUNTERS[key].inc(value, stage=name)
+
+    def timings(self):
+        """{stage: wall ms}; repeated stages are summed."""
+        timings = {}
+        for span in self.spans:
+            timings[span.name] = round(timings.get(span.name, 0) + span.wall_ms, 3)
+        return timings
+
+    def to_dict(self):
+        return {"trace_id": self.trace_id, "spans": [s.to_dict() for s in self.spans]}
+
+
+def count(**counters):
+    """Add counters to the span open in this thread; a no-op outside one."""
+    span = _CURRENT_SPAN.get()
+    if span is not None:
+        span.add(**counters)
@@ -1,7 +1,8 @@
 import random
-from datetime import datetime
+from datetime import datetime, timedelta
 from core.static_timetable import STATION_TIMETABLE
 from core.train_routes import TRAIN_ROUTES
+from core.timetable_index import TimetableIndex, _time_to_minutes
 
 
 STATION_ALIASES = {
@@ -14,6 +15,9 @@ STATION_ALIASES = {
     "Chennai": "Chennai Central"
 }
 
+# Answers to these change whenever a train leaves the station
+TIME_DEPENDENT_ACTIONS = ("get_next_train_time", "get_trains_between")
+
 def normalize_station(name):
     return STATION_ALIASES.get(name, name)
 
@@ -21,19 +25,15 @@ def normalize_station(name):
 # Time helpers (UNCHANGED)
 # --------------------------------------------------
 
-def _time_to_minutes(t):
-    h, m = map(int, t.split(":"))
-    return h * 60 + m
-
-def _now_minutes():
-    now = datetime.now()
+def _now_minutes(now=None):
+    now = now or datetime.now()
     return now.hour * 60 + now.minute
 
-def _today_idx():
-    return datetime.now().weekday()
+def _today_idx(now=None):
+    return (now or datetime.now()).weekday()
 
-def _tomorrow_idx():
-    return (datetime.now().weekday() + 1) % 7
+def _tomorrow_idx(now=None):
+    return ((now or datetime.now()).weekday() + 1) % 7
 
 
 # --------------------------------------------------
@@ -44,26 +44,30 @@ class TrainService:
     def __init__(self):
         print("[TrainService] Ready (STATIC timetable + ROUTE mode).")
         self.current_station = "Thrippunithura"
+        self.index = TimetableIndex(STATION_TIMETABLE, TRAIN_ROUTES)
 
 
     # ---------------------------------------
     # Main command router (UNCHANGED)
     # ---------------------------------------
-    def execute(self, request: dict):
+    def execute(self, request: dict, now=None):
+        """`now` (a datetime) overrides the clock, e.g. for pre-rendering."""
         action = request.get("action")
 
         if action == "get_next_train_time":
             return self.get_next_train_time(
                 request.get("origin"),
                 request.get("destination"),
-                request.get("date")
+                request.get("date"),
+                now=now
             )
 
         elif action == "get_trains_between":
             return self.get_trains_between(
                 request.get("origin"),
                 request.get("destination"),
-                request.get("date")
+                request.get("date"),
+                now=now
             )
 
         elif action == "get_status":
@@ -84,85 +88,52 @@ class TrainService:
         return {"error": f"Unknown action: {action}"}
 
 
+    def valid_until(self, request: dict, now=None):
+        """
+        When execute(request) may next give a different answer: the next
+        departure from this station (the minute it leaves, the train drops
+        out of "next train" and listings) or midnight, whichever is first.
+        None for answers that do not depend on the clock.
+        """
+        if request.get("action") not in TIME_DEPENDENT_ACTIONS:
+            return None
+
+        now = now or datetime.now()
+        midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        train = self.index.next_departure(self.current_station, _today_idx(now), _now_minutes(now))
+        if train is None:
+            return midnight
+        minute = _time_to_minutes(train["departure_time"])
+        return now.replace(hour=minute // 60, minute=minute % 60, second=0, microsecond=0)
+
+
     # ---------------------------------------
     # ROUTE-AWARE STATIC LOGIC
     # ---------------------------------------
 
     def _valid_direction(self, train_no, origin, destination):
-        route = TRAIN_ROUTES.get(train_no)
-        if not route:
-            return False
-
-        if origin not in route or destination not in route:
-            return False
-
-        return route.index(origin) < route.index(destination)
+        return self.index.valid_direction(train_no, origin, destination)
 
 
-    def get_next_train_time(self, origin, destination, date):
+    def get_next_train_time(self, origin, destination, date, now=None):
         # Always use Thrippunithura as origin
         origin = "Thrippunithura"
         
         if destination:
             destination = normalize_station(destination)
-        now_min = _now_minutes()
-        today = _today_idx()
-        tomorrow = _tomorrow_idx()
-
-        upcoming_today = []
-        upcoming_tomorrow = []
-        upcoming_today_any = []  # All trains if destination doesn't match
-        upcoming_tomorrow_any = []
-
-        # Check today's trains
-        for t in STATION_TIMETABLE.get(origin, []):
-            if today not in t["running_days"]:
-                continue
-
-            dep_min = _time_to_minutes(t["departure_time"])
-            if dep_min <= now_min:
-                continue
-
-            # Always add to "any" list for fallback
-            upcoming_today_any.append((dep_min, t, "today"))
-
-            if destination:
-                if self._valid_direction(
-                    t["train_no"], origin, destination
-                ):
-                    upcoming_today.append((dep_min, t, "today"))
-            else:
-                # No destination specified, show all trains
-                upcoming_today.append((dep_min, t, "today"))
-
-        # Check tomorrow's trains
-        for t in STATION_TIMETABLE.get(origin, []):
-            if tomorrow not in t["running_days"]:
-                continue
-
-            dep_min = _time_to_minutes(t["departure_time"])
-
-            # Always add to "any" list for fallback
-            upcoming_tomorrow_any.append((dep_min, t, "tomorrow"))
-
-            if destination:
-                if self._valid_direction(
-                    t["train_no"], origin, destination
-                ):
-                    upcoming_tomorrow.append((dep_min, t, "tomorrow"))
-            else:
-                # No destination specified, show all trains
-                upcoming_tomorrow.append((dep_min, t, "tomorrow"))
+        now_min = _now_minutes(now)
+        today = _today_idx(now)
+        tomorrow = _tomorrow_idx(now)
+
+        # Bisect into departures pre-filtered by destination (None = any)
+        next_train_today = self.index.next_departure(origin, today, now_min, destination or None)
+        next_train_tomorrow = self.index.next_departure(origin, tomorrow, -1, destination or None)
 
         # If destination specified but no matches, fall back to showing any available train
         destination_matched = True
-        if destination and not upcoming_today and not upcoming_tomorrow:
+        if destination and not next_train_today and not next_train_tomorrow:
             # Check if destination is even in our database at all
-            known_stations = set()
-            for route in TRAIN_ROUTES.values():
-                known_stations.update(route)
-            
-            if destination not in known_stations:
+            if destination not in self.index.known_stations:
                 return {
                     "type": "train_timing",
                     "origin": origin,
@@ -170,21 +141,11 @@ class TrainService:
                     "message": f"I'm sorry, I don't have information for trains reaching {destination}. However, here are the next trains from {origin}."
                 }
 
-            if upcoming_today_any or upcoming_tomorrow_any:
-                upcoming_today = upcoming_today_any
-                upcoming_tomorrow = upcoming_tomorrow_any
+            next_train_today = self.index.next_departure(origin, today, now_min)
+            next_train_tomorrow = self.index.next_departure(origin, tomorrow)
+            if next_train_today or next_train_tomorrow:
                 destination_matched = False  # Mark that destination didn't match
 
-        # Get the next train today
-        next_train_today = None
-        if upcoming_today:
-            _, next_train_today, _ = min(upcoming_today, key=lambda x: x[0])
-
-        # Get the next train tomorrow
-        next_train_tomorrow = None
-        if upcoming_tomorrow:
-            _, next_train_tomorrow, _ = min(upcoming_tomorrow, key=lambda x: x[0])
-
         # If no trains at all
         if not next_train_today and not next_train_tomorrow:
             return {
@@ -231,69 +192,44 @@ class TrainService:
         return result
 
 
-    def get_trains_between(self, origin, destination, date):
+    def get_trains_between(self, origin, destination, date, now=None):
         # Always use Thrippunithura as origin
         origin = "Thrippunithura"
 
         if destination:
             destination = normalize_station(destination)
-        today = _today_idx()
-        tomorrow = _tomorrow_idx()
-        now_min = _now_minutes()
-        trains_today = []
-        trains_tomorrow = []
+        today = _today_idx(now)
+        tomorrow = _tomorrow_idx(now)
+        now_min = _now_minutes(now)
+        def _listing(entries, day_label):
+            # Listings keep timetable order, as before
+            return [
+                {
+                    "train_no": t["train_no"],
+                    "train_name": t["train_name"],
+                    "departure_time": t["departure_time"],
+                    "arrival_time": t["arrival_time"],
+                    "date": day_label
+                }
+                for _, _, t in sorted(entries, key=lambda e: e[1])
+            ]
 
         # Get today's trains (only future ones)
-        for t in STATION_TIMETABLE.get(origin, []):
-            if today not in t["running_days"]:
-                continue
-
-            dep_min = _time_to_minutes(t["departure_time"])
-            if dep_min <= now_min:
-                continue
-
-            if destination:
-                if not self._valid_direction(
-                    t["train_no"], origin, destination
-                ):
-                    continue
-
-            trains_today.append({
-                "train_no": t["train_no"],
-                "train_name": t["train_name"],
-                "departure_time": t["departure_time"],
-                "arrival_time": t["arrival_time"],
-                "date": "today"
-            })
+        trains_today = _listing(
+            self.index.departures_after(origin, today, now_min, destination or None), "today"
+        )
 
         # Get tomorrow's trains
-        for t in STATION_TIMETABLE.get(origin, []):
-            if tomorrow not in t["running_days"]:
-                continue
-
-            if destination:
-                if not self._valid_direction(
-                    t["train_no"], origin, destination
-                ):
-                    continue
-
-            trains_tomorrow.append({
-                "train_no": t["train_no"],
-                "train_name": t["train_name"],
-                "departure_time": t["departure_time"],
-                "arrival_time": t["arrival_time"],
-                "date": "tomorrow"
-            })
+        trains_tomorrow = _listing(
+            self.index.departures_after(origin, tomorrow, -1, destination or None), "tomorrow"
+        )
 
         # Combine: today's trains first, then tomorrow's
         all_trains = trains_today + trains_tomorrow
 
         if not all_trains and destination:
             # Check if destination is known
-            known_stations = set()
-            for route in TRAIN_ROUTES.values():
-                known_stations.update(route)
-            if destination not in known_stations:
+            if destination not in self.index.known_stations:
                 return {
                     "type": "train_between",
                     "origin": origin,
@@ -1,8 +1,25 @@
+import contextlib
+import difflib
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
 import torch
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from core import tracing
+from core.config import (
+    TRANSLATION_BACKEND,
+    TRANSLATION_GOOGLE_FALLBACK,
+    TRANSLATION_CT2_DIR,
+    TRANSLATION_THREADS,
+    TRANSLATION_MAX_BATCH,
+    TRANSLATION_CACHE_SIZE,
+)
 
-# Singleton
+# Singleton (one translator per direction, shared by all threads)
 _TRANSLATORS = {}
+_TRANSLATORS_LOCK = threading.Lock()
 
 LANG_MAP = {
     "ml": "malayalam",
@@ -10,39 +27,347 @@ LANG_MAP = {
     "en": "english"
 }
 
+# IndicTrans2 expects FLORES-200 language tags
+FLORES_CODES = {
+    "ml": "mal_Mlym",
+    "hi": "hin_Deva",
+    "en": "eng_Latn",
+}
+
+# One distilled model per direction covers every Indic language
 MODEL_MAP = {
-    ("ml", "en"): "ai4bharat/indictrans2-ml-en",
-    ("hi", "en"): "ai4bharat/indictrans2-hi-en",
-    ("en", "ml"): "ai4bharat/indictrans2-en-ml",
-    ("en", "hi"): "ai4bharat/indictrans2-en-hi",
+    "en-indic": "ai4bharat/indictrans2-en-indic-dist-200M",
+    "indic-en": "ai4bharat/indictrans2-indic-en-dist-200M",
 }
 
+# (src, tgt, sentence) → translation, least recently used first
+_SENTENCE_CACHE = OrderedDict()
+_SENTENCE_CACHE_LOCK = threading.Lock()
+
+_SENTENCE_END = re.compile(r"(?<=[.!?।])\s+")
+
+
+def split_sentences(text):
+    return [s for s in _SENTENCE_END.split(text.strip()) if s.strip()]
+
+
+def _direction(src, tgt):
+    if src == tgt or src not in FLORES_CODES or tgt not in FLORES_CODES:
+        return None
+    if src == "en":
+        return "en-indic"
+    if tgt == "en":
+        return "indic-en"
+    return None
+
+
+def _guess_lang(text):
+    """Script-based source guess for callers that pass no language."""
+    if re.search(r"[\u0D00-\u0D7F]", text):
+        return "ml"
+    if re.search(r"[\u0900-\u097F]", text):
+        return "hi"
+    return "en"
+
+
+def source_language(text, src):
+    """
+    The language to translate text from. A caller's label (e.g. Whisper
+    LID) is kept only when it is supported and agrees with the script;
+    a wrong or unsupported label would otherwise leave text untranslated.
+    """
+    guessed = _guess_lang(text)
+    if src not in FLORES_CODES or src != guessed:
+        return guessed
+    return src
+
+
+def _ct2_path(direction):
+    return os.path.join(TRANSLATION_CT2_DIR, os.path.basename(MODEL_MAP[direction]))
+
+
+# --------------------------------------------------
+# Engines
+# --------------------------------------------------
+
+class _IndicTrans2:
+    """Shared pre/post-processing; subclasses only implement _generate."""
+
+    def __init__(self, direction):
+        self.direction = direction
+        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_MAP[direction], trust_remote_code=True)
+
+        try:
+            from IndicTransToolkit import IndicProcessor
+            self.processor = IndicProcessor(inference=True)
+        except ImportError:
+            self.processor = None
+
+    def translate_batch(self, sentences, src, tgt):
+        src_code, tgt_code = FLORES_CODES[src], FLORES_CODES[tgt]
+
+        if self.processor is not None:
+            tagged = self.processor.preprocess_batch(sentences, src_lang=src_code, tgt_lang=tgt_code)
+        else:
+            tagged = [f"{src_code} {tgt_code} {s}" for s in sentences]
+
+        outputs = []
+        for i in range(0, len(tagged), TRANSLATION_MAX_BATCH):
+            outputs.extend(self._generate(tagged[i:i + TRANSLATION_MAX_BATCH]))
+
+        if self.processor is not None:
+            outputs = self.processor.postprocess_batch(outputs, lang=tgt_code)
+        return [o.strip() for o in outputs]
+
+    def _target_vocab(self):
+        """IndicTrans2 keeps separate source and target vocabularies."""
+        target = getattr(self.tokenizer, "as_target_tokenizer", None)
+        return target() if target else contextlib.nullcontext()
+
+    def _decode(self, ids_batch):
+        pad = self.tokenizer.pad_token_id
+        tracing.count(
+            tokens_generated=sum(1 for ids in ids_batch for t in ids if t != pad),
+            batch_size=len(ids_batch),
+        )
+        with self._target_vocab():
+            return self.tokenizer.batch_decode(
+                ids_batch, skip_special_tokens=True, clean_up_tokenization_spaces=True
+            )
+
+
+class _TorchIndicTrans2(_IndicTrans2):
+    def __init__(self, direction):
+        super().__init__(direction)
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.model = AutoModelForSeq2SeqLM.from_pretrained(
+            MODEL_MAP[direction], trust_remote_code=True
+        ).to(self.device)
+        self.model.eval()
+        # generate() is not safe to share across threads
+        self._lock = threading.Lock()
+
+    def _generate(self, batch):
+        inputs = self.tokenizer(
+            batch, padding=True, truncation=True, return_tensors="pt"
+        ).to(self.device)
+        with self._lock, torch.inference_mode():
+            outputs = self.model.generate(**inputs, max_length=256, num_beams=1)
+        return self._decode(outputs.cpu().tolist())
+
+
+class _CT2IndicTrans2(_IndicTrans2):
+    """int8 CPU inference; CTranslate2 translators are thread-safe."""
+
+    def __init__(self, direction):
+        import ctranslate2
+        super().__init__(direction)
+        self.translator = ctranslate2.Translator(
+            _ct2_path(direction),
+            device="cpu",
+            compute_type="int8",
+            inter_threads=1,
+            intra_threads=TRANSLATION_THREADS,
+        )
+
+    def _generate(self, batch):
+        tokens = [
+            self.tokenizer.convert_ids_to_tokens(self.tokenizer.encode(s))
+            for s in batch
+        ]
+        results = self.translator.translate_batch(
+            tokens, beam_size=1, max_decoding_length=256
+        )
+        # Hypotheses are target-side tokens: map them with the target vocab
+        with self._target_vocab():
+            ids_batch = [self.tokenizer.convert_tokens_to_ids(r.hypotheses[0]) for r in results]
+        return self._decode(ids_batch)
+
 
 def get_translator(src, tgt):
-    key = (src, tgt)
-    if key not in MODEL_MAP:
+    direction = _direction(src, tgt)
+    if direction is None:
         return None
 
-    if key not in _TRANSLATORS:
-        model_name = MODEL_MAP[key]
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        model.to(device)
+    with _TRANSLATORS_LOCK:
+        if direction not in _TRANSLATORS:
+            if os.path.isdir(_ct2_path(direction)):
+                print(f"[LOAD] IndicTrans2 {direction} (CTranslate2 int8)...")
+                _TRANSLATORS[direction] = _CT2IndicTrans2(direction)
+            else:
+                print(f"[LOAD] IndicTrans2 {direction} (PyTorch)...")
+                _TRANSLATORS[direction] = _TorchIndicTrans2(direction)
 
-        _TRANSLATORS[key] = (tokenizer, model, device)
+    return _TRANSLATORS[direction]
 
-    return _TRANSLATORS[key]
+
+def preload_translators():
+    """Load both IndicTrans2 directions ahead of the first request; nothing for the google backend."""
+    if TRANSLATION_BACKEND == "google":
+        return []
+    return [get_translator("ml", "en"), get_translator("en", "ml")]
+
+
+def _google_translate(text, src, tgt):
+    from deep_translator import GoogleTranslator
+    return GoogleTranslator(source=src or "auto", target=tgt).translate(text)
+
+
+# --------------------------------------------------
+# Public API
+# --------------------------------------------------
+
+def _cached_sentences(src, tgt, sentences):
+    if TRANSLATION_CACHE_SIZE <= 0:
+        return {}
+    found = {}
+    with _SENTENCE_CACHE_LOCK:
+        for s in sentences:
+            key = (src, tgt, s)
+            if key in _SENTENCE_CACHE:
+                _SENTENCE_CACHE.move_to_end(key)
+                found[s] = _SENTENCE_CACHE[key]
+    if found:
+        tracing.count(cache_hits=len(found))
+    return found
+
+
+def _remember_sentences(src, tgt, translated):
+    if TRANSLATION_CACHE_SIZE <= 0:
+        return
+    with _SENTENCE_CACHE_LOCK:
+        for s, t in translated.items():
+            _SENTENCE_CACHE[(src, tgt, s)] = t
+        while len(_SENTENCE_CACHE) > TRANSLATION_CACHE_SIZE:
+            _SENTENCE_CACHE.popitem(last=False)
+
+
+def translate_batch(texts, src, tgt):
+    """
+    Translate many texts at once. Every text is split into sentences and
+    all sentences not already in the in-memory sentence cache go through
+    the model in shared batches. src=None guesses the language from the
+    script, as does a label that does not match the text's script.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+
+    if TRANSLATION_BACKEND == "google":
+        return [_google_translate(t, src, tgt) for t in texts]
+
+    try:
+        # Group by source language so each group is one model direction
+        srcs = [source_language(t, src) for t in texts]
+        results = list(texts)
+
+        for lang in set(srcs):
+            idx = [i for i, s in enumerate(srcs) if s == lang]
+            if _direction(lang, tgt) is None:
+                continue  # same language or unsupported pair → unchanged
+
+            pieces = [split_sentences(texts[i]) for i in idx]
+            unique = list(dict.fromkeys(s for p in pieces for s in p))
+            translated = _cached_sentences(lang, tgt, unique)
+
+            missing = [s for s in unique if s not in translated]
+            if missing:
+                # Only load the model when something is not cached
+                bundle = get_translator(lang, tgt)
+                fresh = dict(zip(missing, bundle.translate_batch(missing, lang, tgt)))
+                _remember_sentences(lang, tgt, fresh)
+                translated.update(fresh)
+
+            for i, p in zip(idx, pieces):
+                results[i] = " ".join(translated[s] for s in p)
+
+        return results
+
+    except Exception as e:
+        if not TRANSLATION_GOOGLE_FALLBACK:
+            raise
+        print(f"[TRANSLATION ERROR] IndicTrans2 failed ({e}), using Google")
+        return [_google_translate(t, src, tgt) for t in texts]
 
 
 def translate(text, src, tgt):
-    bundle = get_translator(src, tgt)
-    if bundle is None:
-        return text  # fallback
+    if not text:
+        return text
+    return translate_batch([text], src, tgt)[0]
+
+
+# Roman → Indic transliteration (AI4Bharat IndicXlit), loaded on first use
+_XLIT = None
+_XLIT_LOCK = threading.Lock()
+
+
+def _xlit_engine():
+    global _XLIT
+    with _XLIT_LOCK:
+        if _XLIT is None:
+            try:
+                from ai4bharat.transliteration import XlitEngine
+                print("[LOAD] IndicXlit (roman → Indic)...")
+                _XLIT = XlitEngine([l for l in FLORES_CODES if l != "en"], beam_width=4, src_script_type="roman")
+            except ImportError:
+                _XLIT = False
+    return _XLIT or None
+
+
+def transliterate(name, lang):
+    """
+    A station or train name written in lang's script. IndicXlit spells it
+    out letter by letter when installed; otherwise the translator sees
+    the name on its own, which transliterates most proper nouns.
+    """
+    if not name or lang == "en" or lang not in FLORES_CODES:
+        return name
+    engine = _xlit_engine()
+    if engine is not None:
+        return engine.translit_sentence(name, lang_code=lang)
+    return translate(name, "en", lang) or name
+
+
+# --------------------------------------------------
+# Offline conversion: python -m core.translate convert
+# --------------------------------------------------
+
+def convert_to_ctranslate2(direction, quantization="int8"):
+    from ctranslate2.converters import TransformersConverter
+
+    output_dir = _ct2_path(direction)
+    print(f"[CONVERT] {MODEL_MAP[direction]} → {output_dir} ({quantization})")
+    TransformersConverter(MODEL_MAP[direction], trust_remote_code=True).convert(
+        output_dir, quantization=quantization, force=True
+    )
+    return output_dir
+
+
+# One sentence per direction for the round-trip check after conversion
+CHECK_SENTENCES = {
+    "en-indic": ("en", "ml", "The train to Chennai departs from platform 3 at 6:40 PM."),
+    "indic-en": ("ml", "en", "ചെന്നൈയിലേക്കുള്ള ട്രെയിൻ 3-ാം പ്ലാറ്റ്ഫോമിൽ നിന്ന് പുറപ്പെടും."),
+}
+
+
+def check_ctranslate2(direction):
+    """Translate one sentence with the CT2 and PyTorch engines; True when they agree."""
+    src, tgt, sentence = CHECK_SENTENCES[direction]
+    ct2 = _CT2IndicTrans2(direction).translate_batch([sentence], src, tgt)[0]
+    ref = _TorchIndicTrans2(direction).translate_batch([sentence], src, tgt)[0]
+    print(f"[CHECK] {direction}\n  torch: {ref}\n  ct2:   {ct2}")
+    # int8 may change a word or two; a vocabulary mix-up changes everything
+    return difflib.SequenceMatcher(None, ct2, ref).ratio() >= 0.8
 
-    tokenizer, model, device = bundle
 
-    inputs = tokenizer(text, return_tensors="pt", truncation=True).to(device)
-    outputs = model.generate(**inputs, max_length=256)
+if __name__ == "__main__":
+    if sys.argv[1:2] not in (["convert"], ["check"]):
+        print("usage: python -m core.translate convert|check [en-indic|indic-en ...]")
+        sys.exit(1)
 
-    return tokenizer.decode(outputs[0], skip_special_tokens=True)
+    ok = True
+    for direction in sys.argv[2:] or list(MODEL_MAP):
+        if sys.argv[1] == "convert":
+            convert_to_ctranslate2(direction)
+        ok = check_ctranslate2(direction) and ok
+    sys.exit(0 if ok else 1)
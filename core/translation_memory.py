@@ -0,0 +1,175 @@
+import json
+import os
+import re
+import threading
+from string import Formatter
+from core.storage import DIRS
+from core.response_formatter import is_literal_slot, is_name_slot
+
+
+_PLACEHOLDER = re.compile(r"__STN(\d+)__")
+
+# Bumped when cached slot values change meaning; older slot tables are dropped
+# (version 1 also held word-by-word translations of station and train names)
+TABLE_VERSION = 2
+
+
+class TranslationMemory:
+    """
+    Per-language memory of ResponseFormatter templates and slot values.
+
+    A template is translated once with its {slot} fields protected as
+    __STN{i}__ placeholders. Station and train names are transliterated
+    into the language's script once and kept in a name table; the
+    remaining slot values (spoken times, statuses) are translated on their
+    own once per language. Numbers are copied as they are. Rendering an
+    answer is then a str.format of cached strings. All three tables are
+    persisted to data/cache/translation_memory_<lang>.json.
+    """
+
+    def __init__(self, translate_fn, transliterate_fn=None, cache_dir=DIRS["cache"]):
+        self._translate = translate_fn
+        # Without a transliterator names keep their Latin spelling
+        self._transliterate = transliterate_fn or (lambda name, lang: name)
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._tables = {}
+        self._stats = {
+            "template_hits": 0,
+            "template_misses": 0,
+            "slot_hits": 0,
+            "slot_misses": 0,
+            "name_hits": 0,
+            "name_misses": 0,
+            "fallbacks": 0,
+        }
+
+    # ---------------------------------------
+    # Persistence
+    # ---------------------------------------
+    def _path(self, lang):
+        return os.path.join(self.cache_dir, f"translation_memory_{lang}.json")
+
+    def _table(self, lang):
+        with self._lock:
+            if lang not in self._tables:
+                table = {"version": TABLE_VERSION, "templates": {}, "slots": {}, "names": {}}
+                try:
+                    with open(self._path(lang), encoding="utf-8") as f:
+                        saved = json.load(f)
+                    if saved.get("version") != TABLE_VERSION:
+                        saved = {"templates": saved.get("templates", {})}
+                    table.update(saved)
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    print(f"[TM ERROR] {e}")
+                self._tables[lang] = table
+            return self._tables[lang]
+
+    def _save(self, lang):
+        with self._lock:
+            payload = json.dumps(self._tables[lang], ensure_ascii=False)
+        tmp_path = f"{self._path(lang)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, self._path(lang))
+
+    # ---------------------------------------
+    # Lookups
+    # ---------------------------------------
+    def _translate_template(self, template, lang):
+        """Translated template with the same {slot} fields, or None."""
+        fields = [name for _, name, _, _ in Formatter().parse(template) if name]
+        if len(set(fields)) != len(fields):
+            return None
+
+        protected = template.replace("{{", "{").replace("}}", "}")
+        for i, name in enumerate(fields):
+            protected = protected.replace(f"{{{name}}}", f"__STN{i}__", 1)
+
+        translated = self._translate(protected, "en", lang)
+
+        # Every placeholder must survive translation exactly once
+        found = [int(i) for i in _PLACEHOLDER.findall(translated)]
+        if sorted(found) != list(range(len(fields))):
+            return None
+
+        translated = translated.replace("{", "{{").replace("}", "}}")
+        return _PLACEHOLDER.sub(lambda m: f"{{{fields[int(m.group(1))]}}}", translated)
+
+    def _template(self, template, lang):
+        table = self._table(lang)
+        if template in table["templates"]:
+            with self._lock:
+                self._stats["template_hits"] += 1
+            return table["templates"][template]
+
+        translated = self._translate_template(template, lang)
+        with self._lock:
+            self._stats["template_misses"] += 1
+            # None is remembered too, so untranslatable templates go
+            # straight to the full translator next time
+            table["templates"][template] = translated
+        self._save(lang)
+        return translated
+
+    def _slot(self, value, lang):
+        table = self._table(lang)
+        if value in table["slots"]:
+            with self._lock:
+                self._stats["slot_hits"] += 1
+            return table["slots"][value]
+
+        translated = self._translate(value, "en", lang) or value
+        with self._lock:
+            self._stats["slot_misses"] += 1
+            table["slots"][value] = translated
+        self._save(lang)
+        return translated
+
+    def _name(self, name, lang):
+        table = self._table(lang)
+        if name in table["names"]:
+            with self._lock:
+                self._stats["name_hits"] += 1
+            return table["names"][name]
+
+        transliterated = self._transliterate(name, lang) or name
+        with self._lock:
+            self._stats["name_misses"] += 1
+            table["names"][name] = transliterated
+        self._save(lang)
+        return transliterated
+
+    # ---------------------------------------
+    # Public API
+    # ---------------------------------------
+    def render(self, template, slots, lang):
+        """Translated answer, or None when the caller must translate fully."""
+        translated = self._template(template, lang)
+        if translated is None:
+            with self._lock:
+                self._stats["fallbacks"] += 1
+            return None
+
+        values = {}
+        for name, value in slots.items():
+            if is_literal_slot(name):
+                values[name] = value
+            elif is_name_slot(name):
+                values[name] = self._name(value, lang)
+            else:
+                values[name] = self._slot(value, lang)
+        return translated.format(**values)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["template_hits"] + stats["template_misses"]
+        slot_lookups = stats["slot_hits"] + stats["slot_misses"]
+        name_lookups = stats["name_hits"] + stats["name_misses"]
+        stats["template_hit_rate"] = stats["template_hits"] / lookups if lookups else 0.0
+        stats["slot_hit_rate"] = stats["slot_hits"] / slot_lookups if slot_lookups else 0.0
+        stats["name_hit_rate"] = stats["name_hits"] / name_lookups if name_lookups else 0.0
+        return stats
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+import soundfile as sf
+from core.storage import DIRS
+
+
+def normalize_tts_text(text):
+    """Collapse whitespace and Unicode forms so equivalent answers share a key."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class TTSCache:
+    """
+    Content-addressed WAV cache keyed by (normalized text, language,
+    speaker description, model version).
+
+    Files live in `cache_dir` as <sha256>.wav. An in-memory OrderedDict
+    mirrors them in least-recently-used order and evicts the oldest files
+    once the directory grows past `max_bytes`. Recency survives restarts
+    through file mtimes.
+    """
+
+    def __init__(self, cache_dir=DIRS["tts_cache"], max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._index = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".wav"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            st = os.stat(path)
+            entries.append((st.st_mtime, name[:-4], st.st_size))
+
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._bytes += size
+
+        print(f"[TTS CACHE] {len(self._index)} entries, {self._bytes / 1e6:.1f} MB")
+
+    @staticmethod
+    def key(text, lang, description, model_version):
+        payload = json.dumps(
+            [normalize_tts_text(text), lang, description, model_version],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def get(self, key, count=True):
+        """
+        Cached WAV path for key, or None. Only lookups with count=True
+        enter the hit ratio: one per answer, not per sentence piece.
+        """
+        path = self._path(key)
+        with self._lock:
+            if key not in self._index:
+                # Another worker may have rendered it since we indexed the directory
+                try:
+                    self._index[key] = os.path.getsize(path)
+                    self._bytes += self._index[key]
+                except FileNotFoundError:
+                    self.misses += count
+                    return None
+            self._index.move_to_end(key)
+            self.hits += count
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Removed behind our back; forget it
+            with self._lock:
+                self._bytes -= self._index.pop(key, 0)
+                self.hits -= count
+                self.misses += count
+            return None
+        return path
+
+    def put(self, key, audio, sample_rate):
+        """Store audio under key and return its path."""
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        sf.write(tmp_path, audio, sample_rate, format="WAV")
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+
+        with self._lock:
+            self._bytes += size - self._index.pop(key, 0)
+            self._index[key] = size
+            evicted = self._evict()
+
+        for old in evicted:
+            try:
+                os.remove(self._path(old))
+            except FileNotFoundError:
+                pass
+        return path
+
+    def _evict(self):
+        evicted = []
+        while self._bytes > self.max_bytes and len(self._index) > 1:
+            old, size = self._index.popitem(last=False)
+            self._bytes -= size
+            evicted.append(old)
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
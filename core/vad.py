@@ -0,0 +1,131 @@
+import numpy as np
+
+from core.audio_io import AudioBuffer
+from core.metrics import REGISTRY
+from core.config import VAD_FRAME_MS, VAD_MARGIN_DB, VAD_MIN_DB, VAD_MIN_SPEECH_MS, VAD_PAD_MS
+
+
+SPEECH_RATIO = REGISTRY.histogram(
+    "h2h_vad_speech_ratio", "Share of each recording kept as speech",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+)
+TRIMMED_SECONDS = REGISTRY.counter(
+    "h2h_vad_trimmed_audio_seconds_total", "Seconds of silence cut before denoise and ASR"
+)
+REJECTED_AUDIO = REGISTRY.counter(
+    "h2h_vad_rejected_total", "Recordings answered without transcribing", labels=("reason",)
+)
+LOW_SNR = REGISTRY.counter(
+    "h2h_vad_low_snr_total", "Recordings with no speech above the noise floor, sent to denoise anyway"
+)
+
+# Certain before denoise. "no_speech" is not: speech a few dB over platform
+# noise misses the margin, and that is exactly what Demucs is for.
+REJECT_BEFORE_DENOISE = ("empty", "too_quiet")
+
+
+def frame_levels(samples, sample_rate, frame_ms=VAD_FRAME_MS):
+    """RMS level in dBFS of consecutive non-overlapping frames."""
+    frame = max(1, int(sample_rate * frame_ms / 1000))
+    count = len(samples) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32), frame
+    frames = samples[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10)), frame
+
+
+def detect_speech(audio, frame_ms=VAD_FRAME_MS, min_db=VAD_MIN_DB, margin_db=VAD_MARGIN_DB,
+                  min_speech_ms=VAD_MIN_SPEECH_MS, pad_ms=VAD_PAD_MS):
+    """
+    Energy VAD. A frame is speech when it is louder than both `min_db`
+    (absolute, dBFS) and the recording's noise floor (its 10th percentile
+    frame) plus `margin_db`. Only leading and trailing silence is cut;
+    pauses between words stay. Returns the padded speech region in samples,
+    or reason "empty" / "too_quiet" / "no_speech" when there is none.
+    """
+    audio = AudioBuffer.from_source(audio)
+    sr = audio.sample_rate
+    levels, frame = frame_levels(audio.samples, sr, frame_ms)
+    info = {
+        "duration": round(audio.duration, 3),
+        "speech_seconds": 0.0,
+        "speech_ratio": 0.0,
+        "start": 0,
+        "end": 0,
+        "reason": None,
+    }
+
+    if not len(levels):
+        info["reason"] = "empty"
+        return info
+    if levels.max() < min_db:
+        info["reason"] = "too_quiet"
+        return info
+
+    floor = float(np.percentile(levels, 10))
+    speech = levels > max(min_db, floor + margin_db)
+    voiced = np.flatnonzero(speech)
+    if len(voiced) * frame_ms < min_speech_ms:
+        info["reason"] = "no_speech"
+        return info
+
+    pad = int(sr * pad_ms / 1000)
+    start = max(0, voiced[0] * frame - pad)
+    end = min(len(audio.samples), (voiced[-1] + 1) * frame + pad)
+    info.update(
+        speech_seconds=round(len(voiced) * frame / sr, 3),
+        speech_ratio=round(len(voiced) / len(levels), 3),
+        start=int(start),
+        end=int(end),
+    )
+    return info
+
+
+def trim_silence(audio):
+    """
+    (trimmed AudioBuffer, info) with leading and trailing silence removed.
+    info["reason"] is set (one of REJECT_BEFORE_DENOISE) when there is
+    nothing worth denoising, in which case the buffer is returned untouched.
+
+    When no frame clears the noise floor by `margin_db` the recording may
+    still be speech over loud noise: only the quietest frames are trimmed
+    off its ends and info["low_snr"] asks the caller to confirm_speech()
+    after denoising.
+    """
+    audio = AudioBuffer.from_source(audio)
+    info = detect_speech(audio)
+
+    if info["reason"] is not None and info["reason"] not in REJECT_BEFORE_DENOISE:
+        LOW_SNR.inc()
+        # Conservative: anything louder than the noise floor itself is kept
+        loose = detect_speech(audio, margin_db=0.0)
+        if loose["reason"] is None:
+            info.update(start=loose["start"], end=loose["end"])
+        else:
+            info.update(start=0, end=len(audio.samples))
+        info.update(reason=None, low_snr=True)
+
+    info["kept_seconds"] = round((info["end"] - info["start"]) / audio.sample_rate, 3)
+
+    if info["reason"] is not None:
+        REJECTED_AUDIO.inc(reason=info["reason"])
+        return audio, info
+
+    if not info.get("low_snr"):
+        SPEECH_RATIO.observe(info["speech_ratio"])
+    TRIMMED_SECONDS.inc(max(0.0, audio.duration - info["kept_seconds"]))
+    if info["start"] == 0 and info["end"] == len(audio.samples):
+        return audio, info
+    return audio.with_samples(audio.samples[info["start"]:info["end"]]), info
+
+
+def confirm_speech(denoised):
+    """
+    Second look at a low-SNR recording once Demucs has removed the noise:
+    the reason to reject it ("no_speech", ...) or None to transcribe it.
+    """
+    reason = detect_speech(denoised)["reason"]
+    if reason is not None:
+        REJECTED_AUDIO.inc(reason=reason)
+    return reason
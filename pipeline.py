@@ -1,102 +1,451 @@
-from core.speech import SpeechUnit
-from core.nlp import NLPDecisionUnit
+import os
+import soundfile as sf
 from core.train_service import TrainService
-from core.output import OutputUnit
 from core.response_formatter import ResponseFormatter
 from core.logger import log_query
+from core.audio_io import AudioBuffer
+from core.model_loader import ModelLoader
+from core import tracing
+from core.tracing import Trace
+from core.answer_cache import AnswerCache
+from core.memory import process_memory
+from core.vad import trim_silence, confirm_speech
+from core.config import TTS_SERVER_PLAYBACK, SPECULATIVE_ASR, LOADER_WORKERS, VAD_ENABLED
+
+# Heavy modules (torch, transformers, whisper, parler_tts) are imported by
+# the loader threads, so importing this module stays cheap.
+
+# Components an audio request cannot run without
+AUDIO_COMPONENTS = ("speech", "whisper", "indic", "nlp", "output")
+# Components a text or cached-answer request needs (TTS is optional)
+TEXT_COMPONENTS = ("nlp", "output")
+
+# Answers for recordings the VAD rejects (before denoise, or after it for low SNR)
+NO_SPEECH_REPLIES = {
+    "empty": "I didn't receive any audio. Please try recording again.",
+    "too_quiet": "I couldn't hear you. Please speak a little louder and closer to the microphone.",
+    "no_speech": "I didn't catch that. Please ask your question after pressing the button.",
+}
+
+
+def _quiet(msg):
+    pass
 
 
 class AssistantPipeline:
-    def __init__(self, debug: bool = True):
+    def __init__(self, debug: bool = True, play_audio: bool = TTS_SERVER_PLAYBACK, block: bool = True):
+        """
+        Models load concurrently in a ModelLoader pool. With block=False
+        the constructor returns immediately; check loader.ready(...) or
+        loader.status() to see what can be served yet.
+        """
         self.debug = debug
+        self.play_audio = play_audio
 
         print("\n[BOOT] Initializing Railway Assistant...")
 
-        self.speech = SpeechUnit()
-        self.nlp = NLPDecisionUnit()
         self.train_api = TrainService()
         self.formatter = ResponseFormatter()
-        self.output = OutputUnit()
+        self.answers = AnswerCache(self.train_api.valid_until)
 
-        # 🔥 FORCE EVERYTHING TO LOAD AT STARTUP
-        self._warmup()
+        self.loader = ModelLoader(workers=LOADER_WORKERS)
+        self._register_components()
 
-        print("\n=== Railway Assistant READY (HOT) ===")
+        if block:
+            # 🔥 FORCE EVERYTHING TO LOAD AT STARTUP
+            if self.loader.wait_all():
+                print("\n=== Railway Assistant READY (HOT) ===")
+            else:
+                print("[WARMUP WARNING] Some models failed to load, see /healthz")
 
-    def _warmup(self):
-        """Load all models + warm GPU to avoid first-query latency"""
-        try:
-            print("[WARMUP] Loading ASR models...")
-            self.speech._load_whisper()
-            self.speech._load_indic()
+    def _register_components(self):
+        def load_torch():
+            # Warm the shared heavy imports once instead of racing on them
+            import torch, transformers  # noqa: F401
+            return True
 
-            print("[WARMUP] Warming NLP embedding model...")
-            _ = self.nlp.model.encode("warmup")
+        def load_speech():
+            from core.speech import SpeechUnit
+            return SpeechUnit()
 
-            print("[WARMUP] Warming TTS model...")
-            _ = self.output.speak("System ready.", "en")
+        def load_whisper():
+            return self.speech._load_whisper()
 
-            print("[WARMUP] All models loaded successfully")
+        def load_indic():
+            return self.speech._load_indic()
 
-        except Exception as e:
-            print(f"[WARMUP WARNING] {e}")
+        def load_demucs():
+            denoiser = self.speech.denoiser
+            if denoiser.enabled and denoiser.mode == "inprocess":
+                return denoiser._load_model()
+            return None
+
+        def load_nlp():
+            from core.nlp import NLPDecisionUnit
+            nlp = NLPDecisionUnit()
+            _ = nlp.model.encode("warmup")
+            return nlp
+
+        def load_translation():
+            from core.translate import preload_translators
+            return preload_translators()
+
+        def load_output():
+            from core.output import OutputUnit
+            return OutputUnit(play_audio=self.play_audio, load_model=False)
+
+        def load_tts():
+            output = self.output
+            output.load_model()
+            _ = output.speak("System ready.", "en")
+            return True
+
+        (self.loader
+            .add("torch", load_torch)
+            .add("output", load_output, after=["torch"])
+            .add("nlp", load_nlp, after=["torch"])
+            .add("speech", load_speech, after=["torch"])
+            .add("translation", load_translation, after=["torch"])
+            .add("whisper", load_whisper, after=["speech"])
+            .add("indic", load_indic, after=["speech"])
+            .add("demucs", load_demucs, after=["speech"])
+            .add("tts", load_tts, after=["output"]))
+
+    # Components block until loaded, so callers that checked
+    # loader.ready() first never wait here
+    @property
+    def speech(self):
+        return self.loader.get("speech")
+
+    @property
+    def nlp(self):
+        return self.loader.get("nlp")
+
+    @property
+    def output(self):
+        return self.loader.get("output")
+
+    def health(self):
+        status = self.loader.status()
+        status["accepting"] = {
+            "audio": self.loader.ready(AUDIO_COMPONENTS),
+            "text": self.loader.ready(TEXT_COMPONENTS),
+            "tts": self.loader.is_ready("tts"),
+        }
+        # Per worker under serve.py; pss_mb splits pages shared via fork
+        status["pid"] = os.getpid()
+        status["memory"] = process_memory()
+        status["answer_cache"] = self.answers.stats()
+        return status
 
     def _log(self, label, val):
         if self.debug:
             print(f"[DEBUG] {label}: {val}")
 
-    def run(self, audio_path, status_callback=None):
+    def run(self, audio_path, status_callback=None, audio_callback=None, trace_id=None):
+        """
+        audio_path may be a file path, a 16 kHz mono float32 NumPy buffer
+        or an AudioBuffer. It is decoded once and the same AudioBuffer is
+        shared by every speech stage.
+
+        With audio_callback, TTS streams: it receives each sentence-level
+        chunk (see OutputUnit.speak_stream) as soon as it is synthesized.
+
+        Every stage runs in a tracing span (see core.tracing); the result
+        carries the "trace_id" (also written to the query log) and
+        "timings", wall milliseconds per stage.
+
+        Leading and trailing silence is trimmed first (core.vad) and
+        "vad" reports the speech ratio. Empty and silent recordings get a
+        friendly answer at once, with "rejected" set to the reason; noisy
+        ones without clear speech are only rejected if denoising does not
+        reveal any.
+        """
+        notify = self._notifier(status_callback)
+        trace = Trace(trace_id)
+        audio = AudioBuffer.from_source(audio_path)
+
+        vad = None
+        if VAD_ENABLED:
+            with trace.span("vad", audio_seconds=audio.duration):
+                audio, vad = trim_silence(audio)
+            self._log("VAD", vad)
+            if vad["reason"] is not None:
+                return self._rejected(trace, vad["reason"], vad)
+
+        notify("Cleaning background noise")
+        with trace.span("denoise", audio_seconds=audio.duration):
+            audio = self.speech.preprocess_audio(audio)
+
+        if vad is not None and vad.get("low_snr"):
+            with trace.span("vad"):
+                vad["reason"] = confirm_speech(audio)
+            if vad["reason"] is not None:
+                return self._rejected(trace, vad["reason"], vad)
+
+        lang, text = self._transcribe(trace, notify, audio)
+        result = self._understand(trace, notify, text, lang, audio_callback=audio_callback)
+        result["vad"] = vad
+        return result
+
+    def _transcribe(self, trace, notify, audio):
+        """(lang, text) for denoised audio."""
+        # Step 0: Speech to Text and Language Detection
+        if SPECULATIVE_ASR:
+            notify("Detecting language and transcribing")
+            with trace.span("asr", audio_seconds=audio.duration):
+                lang, text, asr_timings = self.speech.speculative_transcribe(audio)
+            self._log("Speculative ASR timings", asr_timings)
+        else:
+            notify("Detecting language")
+            with trace.span("lid", audio_seconds=audio.duration):
+                lang = self.speech.detect_language(audio)
+            
+            notify(f"Transcribing {lang} speech")
+            with trace.span("asr", audio_seconds=audio.duration):
+                text = self.speech.speech_to_text(audio, lang)
+        return lang, text
+
+    def _rejected(self, trace, reason, vad):
+        return {
+            "text": NO_SPEECH_REPLIES[reason],
+            "audio": None,
+            "lang": None,
+            "rejected": reason,
+            "vad": vad,
+            "trace_id": trace.trace_id,
+            "timings": trace.timings(),
+        }
+
+    def run_stream(self, session, status_callback=None, audio_callback=None,
+                   answer_callback=None, trace_id=None):
+        """
+        Answer an utterance received over /listen/stream once its endpoint
+        has fired (see core.streaming.StreamingSession). Denoise, LID and
+        ASR usually ran while the user was speaking, so this starts from
+        the last partial transcript. answer_callback gets the answer text
+        as soon as it exists, before TTS.
+
+        A stream that ended without clear speech but is not silent goes
+        the way run() sends a low-SNR recording: denoise, then look again.
+        """
+        notify = self._notifier(status_callback)
+        trace = Trace(trace_id)
+
+        with trace.span("asr", audio_seconds=session.duration):
+            audio, lang, text = session.finish()
+        stream = session.stats()
+        self._log("Stream", stream)
+
+        if audio is None and session.low_snr:
+            result = self._low_snr_stream(trace, notify, session, audio_callback, answer_callback)
+            result["stream"] = stream
+            return result
+
+        if audio is None:
+            return {
+                "text": NO_SPEECH_REPLIES["no_speech"],
+                "audio": None,
+                "lang": None,
+                "rejected": "no_speech",
+                "stream": stream,
+                "trace_id": trace.trace_id,
+                "timings": trace.timings(),
+            }
+
+        result = self._understand(trace, notify, text, lang, audio_callback=audio_callback,
+                                  answer_callback=answer_callback)
+        result["stream"] = stream
+        return result
+
+    def _low_snr_stream(self, trace, notify, session, audio_callback, answer_callback):
+        with trace.span("vad", audio_seconds=session.duration):
+            audio, vad = trim_silence(session.recording())
+        self._log("VAD", vad)
+        if vad["reason"] is not None:
+            return self._rejected(trace, vad["reason"], vad)
+
+        notify("Cleaning background noise")
+        with trace.span("denoise", audio_seconds=audio.duration):
+            audio = self.speech.preprocess_audio(audio)
+
+        if vad.get("low_snr"):
+            with trace.span("vad"):
+                vad["reason"] = confirm_speech(audio)
+            if vad["reason"] is not None:
+                return self._rejected(trace, vad["reason"], vad)
+
+        lang, text = self._transcribe(trace, notify, audio)
+        result = self._understand(trace, notify, text, lang, audio_callback=audio_callback,
+                                  answer_callback=answer_callback)
+        result["vad"] = vad
+        return result
+
+    def _notifier(self, status_callback):
         def notify(msg):
             if status_callback:
                 status_callback(msg)
             print(f"--- {msg} ---")
+        return notify
 
-        notify("Cleaning background noise")
-        audio_path = self.speech.preprocess_audio(audio_path)
-
-        # Step 0: Speech to Text and Language Detection
-        notify("Detecting language")
-        lang = self.speech.detect_language(audio_path)
-        
-        notify(f"Transcribing {lang} speech")
-        text = self.speech.speech_to_text(audio_path, lang)
-        
+    def _understand(self, trace, notify, text, lang, audio_callback=None, answer_callback=None):
+        """Transcript → answer for the audio paths."""
         notify("Translating to English")
-        english_text = self.speech.translate_to_english(text)
+        with trace.span("translate"):
+            english_text = self.speech.translate_to_english(text, lang)
 
         notify("Extracting intent and entities")
-        intent = self.nlp.extract_intent(english_text)
-        entities = self.nlp.extract_entities(english_text)
+        with trace.span("intent"):
+            intent = self.nlp.extract_intent(english_text)
+
+        return self._answer(trace, notify, text, lang, english_text, intent,
+                            audio_callback=audio_callback, answer_callback=answer_callback)
+
+    def _answer(self, trace, notify, text, lang, english_text, intent, speak=True,
+                audio_callback=None, answer_callback=None):
+        """Shared tail of run() and run_text(): entities → service → format → translate back → TTS."""
+        with trace.span("entities"):
+            entities = self.nlp.extract_entities(english_text)
 
         # Step 1: NLP decides what the user wants
         notify("Routing request")
         request = self.nlp.route_intent(intent, entities)
 
-        # Step 2: Train service processes the request
-        notify("Looking for train details")
-        service_result = self.train_api.execute(request)
+        # Same request in the same language, same departure window → same answer
+        with trace.span("answer_cache"):
+            cached = self.answers.get(request, lang)
+
+        if cached is not None:
+            tracing.count(cache_hits=1)
+            final_text = cached["text"]
+            if answer_callback is not None:
+                answer_callback(final_text)
+            audio_path = None
+            if speak:
+                audio_path = self._replay_audio(trace, notify, final_text, lang, cached, audio_callback)
+        else:
+            # Step 2: Train service processes the request
+            notify("Looking for train details")
+            with trace.span("service"):
+                service_result = self.train_api.execute(request)
 
-        # Step 3: Format final text response
-        notify("Formatting response")
-        response = self.formatter.format(service_result)
+            # Step 3: Format final text response
+            notify("Formatting response")
+            with trace.span("format"):
+                template, slots = self.formatter.format_template(service_result)
+                response = template.format(**slots)
 
-        notify(f"Translating back to {lang}")
-        final_text = self.output.translate_back(response, lang)
+            notify(f"Translating back to {lang}")
+            with trace.span("translate_back"):
+                final_text = self.output.translate_back(response, lang, template=(template, slots))
+            if answer_callback is not None:
+                answer_callback(final_text)
 
-        # Logging
+            # Generate TTS (audio file path returned); until Parler-TTS is
+            # loaded only cached answers come with audio
+            audio_path = None
+            if speak:
+                notify("Synthesizing audio response")
+                with trace.span("tts"):
+                    audio_path = self.output.speak(final_text, lang, on_chunk=audio_callback)
+            self.answers.put(request, lang, final_text, audio_path)
+        self.loader.mark_first_answer()
+
+        # Logging (after TTS so the timings are complete)
         log_query(
             raw_text=text,
             lang=lang,
             intent=intent,
             entities=entities,
-            response=final_text
+            response=final_text,
+            trace_id=trace.trace_id,
+            timings=trace.timings(),
         )
 
-        # Generate TTS (audio file path returned)
-        notify("Synthesizing audio response")
-        audio_path = self.output.speak(final_text, lang)
+        if self.debug:
+            self._log("Trace", trace.to_dict())
 
         return {
             "text": final_text,
-            "audio": audio_path
+            "audio": audio_path,
+            "lang": lang,
+            "trace_id": trace.trace_id,
+            "timings": trace.timings(),
         }
+
+    def _replay_audio(self, trace, notify, text, lang, cached, audio_callback):
+        """Audio for an answer-cache hit: its WAV as one chunk, or TTS if it had none."""
+        if cached["audio"] is None:
+            notify("Synthesizing audio response")
+            with trace.span("tts"):
+                cached["audio"] = self.output.speak(text, lang, on_chunk=audio_callback)
+        elif audio_callback is not None:
+            audio, sr = sf.read(cached["audio"], dtype="float32")
+            audio_callback({"index": 0, "text": text, "audio": audio, "sample_rate": sr})
+        return cached["audio"]
+
+    # ------------------------------------------------------
+    #                     TEXT QUERIES
+    # ------------------------------------------------------
+    def _guess_language(self, text):
+        from core.translate import _guess_lang
+        return _guess_lang(text)
+
+    def _translate_to_english(self, texts, lang):
+        """Text path translation; needs no speech models."""
+        if lang == "en":
+            return list(texts)
+        from core.translate import translate_batch
+        try:
+            return translate_batch(texts, lang, "en")
+        except Exception as e:
+            print(f"[TRANSLATION ERROR] {e}")
+            return list(texts)
+
+    def _text_lang(self, text, lang):
+        lang = (lang or "").lower() or self._guess_language(text)
+        return {"english": "en", "hindi": "hi", "malayalam": "ml"}.get(lang, lang)
+
+    def run_text(self, text, lang=None, speak=False, audio_callback=None, trace_id=None):
+        """
+        Answer a typed query: translation → intent → entities → service →
+        formatter → translate back, skipping denoise, language ID and ASR.
+        lang=None guesses en/hi/ml from the script. TTS runs only with
+        speak=True. Returns the same dict as run().
+        """
+        trace = Trace(trace_id)
+        lang = self._text_lang(text, lang)
+
+        with trace.span("translate"):
+            english_text = self._translate_to_english([text], lang)[0]
+        with trace.span("intent"):
+            intent = self.nlp.extract_intent(english_text)
+
+        return self._answer(trace, _quiet, text, lang, english_text, intent,
+                            speak=speak, audio_callback=audio_callback)
+
+    def run_text_batch(self, queries, speak=False):
+        """
+        Answer many typed queries. queries: [{"text", "lang"?}]. Each
+        language is translated in one batch and all intents are encoded
+        in a single call; the per-query tail then runs as in run_text.
+        Returns (results, batch_timings).
+        """
+        batch = Trace()
+        texts = [q["text"] for q in queries]
+        langs = [self._text_lang(q["text"], q.get("lang")) for q in queries]
+
+        english = list(texts)
+        with batch.span("translate"):
+            for lang in set(langs):
+                idx = [i for i, l in enumerate(langs) if l == lang]
+                for i, translated in zip(idx, self._translate_to_english([texts[i] for i in idx], lang)):
+                    english[i] = translated
+
+        with batch.span("intent", batch_size=len(english)):
+            intents = self.nlp.extract_intent_batch(english)
+
+        results = []
+        for text, lang, english_text, intent in zip(texts, langs, english, intents):
+            results.append(self._answer(Trace(), _quiet, text, lang, english_text, intent, speak=speak))
+        return results, batch.timings()
@@ -0,0 +1,125 @@
+"""
+Offline pre-synthesis of every answer the formatter can currently produce.
+
+Replays the timetable at every departure boundary of every weekday for
+every known destination, formats each answer, translates it into each
+language and renders it into the TTS cache. Run it after timetable
+changes so common queries skip Parler-TTS entirely:
+
+    python presynthesize.py --langs en hi ml
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from core.train_service import TrainService, _time_to_minutes
+from core.response_formatter import ResponseFormatter
+from core.static_timetable import STATION_TIMETABLE
+from core.train_routes import TRAIN_ROUTES
+
+
+ORIGIN = "Thrippunithura"
+
+# Any Monday works as the reference week
+REFERENCE_MONDAY = datetime(2024, 1, 1)
+
+
+def _evaluation_times():
+    """Midnight plus every departure minute, for each weekday."""
+    minutes = {0}
+    for t in STATION_TIMETABLE.get(ORIGIN, []):
+        minutes.add(_time_to_minutes(t["departure_time"]))
+
+    for day in range(7):
+        for m in sorted(minutes):
+            yield REFERENCE_MONDAY + timedelta(days=day, minutes=m)
+
+
+def iter_answers():
+    """Every distinct English answer (with its template) the formatter produces today."""
+    service = TrainService()
+    formatter = ResponseFormatter()
+    seen = set()
+
+    def emit(result):
+        template, slots = formatter.format_template(result)
+        text = template.format(**slots)
+        if text and text not in seen:
+            seen.add(text)
+            return text, (template, slots)
+        return None
+
+    destinations = sorted({s for route in TRAIN_ROUTES.values() for s in route} - {ORIGIN})
+    actions = ("get_next_train_time", "get_trains_between")
+
+    for now in _evaluation_times():
+        for destination in destinations + [None]:
+            for action in actions:
+                request = {"action": action, "origin": ORIGIN, "destination": destination}
+                text = emit(service.execute(request, now=now))
+                if text:
+                    yield text
+
+    for train_no in TRAIN_ROUTES:
+        for request in (
+            {"action": "get_route", "train_no": train_no},
+            {"action": "get_status", "train_no": train_no},
+        ):
+            text = emit(service.execute(request))
+            if text:
+                yield text
+
+    for request in (
+        {"action": "get_status", "train_no": None},
+        {"action": "check_pnr", "pnr": None},
+    ):
+        text = emit(service.execute(request))
+        if text:
+            yield text
+
+    for destination in destinations:
+        text = emit(service.execute({"action": "get_fare", "destination": destination}))
+        if text:
+            yield text
+
+    text = emit(None)
+    if text:
+        yield text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-render formatter answers into the TTS cache")
+    parser.add_argument("--langs", nargs="+", default=["en", "hi", "ml"])
+    parser.add_argument("--limit", type=int, default=None, help="stop after N answers per language")
+    parser.add_argument("--dry-run", action="store_true", help="only list the answers")
+    args = parser.parse_args()
+
+    answers = list(iter_answers())
+    if args.limit:
+        answers = answers[:args.limit]
+    print(f"[PRESYNTH] {len(answers)} distinct answers")
+
+    if args.dry_run:
+        for text, _ in answers:
+            print(text)
+        return
+
+    from core.output import OutputUnit
+    output = OutputUnit(play_audio=False)
+
+    for lang in args.langs:
+        start = time.perf_counter()
+        for i, (text, template) in enumerate(answers, 1):
+            final_text = output.translate_back(text, lang, template=template)
+            # Render per sentence too, so streamed answers hit the cache
+            output.speak(final_text, lang, on_chunk=lambda chunk: None)
+            print(f"[PRESYNTH] {lang} {i}/{len(answers)}")
+        print(f"[PRESYNTH] {lang} done in {time.perf_counter() - start:.1f}s")
+
+    print(f"[PRESYNTH] Cache: {output.cache.stats() if output.cache else 'disabled'}")
+    print(f"[PRESYNTH] Translation memory: {output.translation_memory.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Pre-fork multi-worker server with copy-on-write shared models.
+
+The parent process loads every PyTorch model once, then forks N workers
+that each run uvicorn on the same listening socket. Model weights are
+never written after loading, so the forked workers keep sharing the
+parent's pages and each worker only adds its own Python heap and
+activations:
+
+    python serve.py --workers 4 --port 8000
+    python serve.py --workers 4 --measure    # print per-worker memory, exit
+
+Rules this relies on:
+
+- CPU only. CUDA contexts do not survive fork.
+- The parent runs torch single-threaded, so no OpenMP thread pool exists
+  when it forks. Each worker sets its own torch thread count.
+- CTranslate2 (faster-whisper, IndicTrans2 CT2) and ONNX Runtime sessions
+  own native thread pools that are lost across fork. They are dropped
+  before forking and loaded again inside each worker, so they are not
+  shared.
+- Nothing may run inference in the parent while it forks. Every lock
+  (Whisper, IndicTrans2) is therefore free in the children.
+
+Each worker publishes its metrics to data/metrics/<pid>.json and
+/metrics merges them, so any worker can answer a scrape.
+
+Compare per-worker "pss_mb" (shared pages split between workers) with
+"rss_mb" in /healthz, or use --measure.
+"""
+
+import argparse
+import gc
+import json
+import os
+import signal
+import socket
+import sys
+import time
+
+import torch
+
+
+def _drop_thread_backed_models():
+    """Release models whose runtime threads would not survive fork."""
+    from core import speech, translate
+
+    speech._WHISPER_MODELS.pop("faster-whisper", None)
+    with translate._TRANSLATORS_LOCK:
+        for direction, translator in list(translate._TRANSLATORS.items()):
+            if isinstance(translator, translate._CT2IndicTrans2):
+                del translate._TRANSLATORS[direction]
+
+
+def _load_thread_backed_models(assistant):
+    """Per-worker counterpart of _drop_thread_backed_models."""
+    from core.translate import preload_translators
+    from core.inference_tier import load_sentence_transformer
+
+    if assistant.speech.whisper_backend == "faster-whisper":
+        assistant.speech._load_whisper()
+    preload_translators()
+
+    nlp = assistant.nlp
+    if nlp.tier == "onnx":
+        nlp.model = load_sentence_transformer(nlp.model_name, nlp.tier)
+
+
+def _bind(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock, threads):
+    import uvicorn
+    import server
+
+    torch.set_num_threads(threads)
+    _load_thread_backed_models(server.assistant)
+
+    config = uvicorn.Config(server.app, log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _fork_worker(sock, threads):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(sock, threads)
+        except Exception as e:
+            print(f"[SERVE ERROR] worker {os.getpid()}: {e}")
+            code = 1
+        finally:
+            # os._exit skips atexit: write the buffered query log first
+            try:
+                from core.logger import WRITER
+                WRITER.flush()
+            finally:
+                os._exit(code)
+    return pid
+
+
+def _measure(workers, settle):
+    from core.memory import process_memory
+
+    time.sleep(settle)
+    report = {
+        "parent": {"pid": os.getpid(), **process_memory()},
+        "workers": [{"pid": pid, **process_memory(pid)} for pid in workers],
+    }
+    pss = [w.get("pss_mb", 0) for w in report["workers"]]
+    report["total_pss_mb"] = round(sum(pss) + report["parent"].get("pss_mb", 0), 1)
+    report["mean_worker_pss_mb"] = round(sum(pss) / len(pss), 1) if pss else None
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork server sharing models between workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("H2H_SERVER_WORKERS", "2")))
+    parser.add_argument("--threads", type=int, default=None,
+                        help="torch threads per worker (default: cores / workers)")
+    parser.add_argument("--measure", action="store_true",
+                        help="start the workers, print per-worker memory as JSON and exit")
+    parser.add_argument("--settle", type=float, default=20.0,
+                        help="seconds to wait for workers before --measure")
+    args = parser.parse_args()
+
+    if torch.cuda.is_available():
+        print("[SERVE] CUDA models cannot be shared across fork; use uvicorn server:app instead")
+        sys.exit(1)
+
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+
+    # No OpenMP pool may exist in the parent when it forks
+    torch.set_num_threads(1)
+
+    import server
+    print("[SERVE] Loading models in the parent process...")
+    if not server.assistant.loader.wait_all():
+        print("[SERVE WARNING] Some models failed to load, see /healthz")
+
+    _drop_thread_backed_models()
+
+    # Move everything allocated so far out of the cyclic GC's reach so
+    # collections in the workers do not touch (and copy) those pages
+    gc.collect()
+    gc.freeze()
+
+    # /metrics merges every worker's registry, whichever worker is scraped
+    from core.metrics import REGISTRY
+    from core.storage import DIRS
+    REGISTRY.enable_multiprocess(DIRS["metrics"])
+
+    sock = _bind(args.host, args.port)
+    workers = {_fork_worker(sock, threads) for _ in range(args.workers)}
+    print(f"[SERVE] {len(workers)} workers on {args.host}:{args.port}, {threads} torch threads each")
+
+    def stop(signum, frame):
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in workers:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    if args.measure:
+        _measure(sorted(workers), args.settle)
+        stop(None, None)
+
+    # Replace workers that die; the parent keeps the shared pages alive
+    while True:
+        pid, status = os.wait()
+        if pid in workers:
+            workers.discard(pid)
+            print(f"[SERVE] worker {pid} exited ({status}), restarting")
+            workers.add(_fork_worker(sock, threads))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,20 @@
-from fastapi import FastAPI, UploadFile
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import FastAPI, UploadFile, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-import uuid, os, asyncio, json, queue, threading
-from pipeline import AssistantPipeline
+import uuid, os, asyncio, json, base64, time
+from pipeline import AssistantPipeline, AUDIO_COMPONENTS, TEXT_COMPONENTS
+from core.config import STUB_MODELS, QUERY_BATCH_MAX
+
+# H2H_STUB_MODELS=1 swaps the models for instant stubs (benchmarking only)
+if STUB_MODELS:
+    from bench.stubs import StubPipeline as Pipeline
+else:
+    Pipeline = AssistantPipeline
 
 app = FastAPI()
-assistant = AssistantPipeline(debug=False)
+# Models load in the background; /readyz reports when each is usable
+assistant = Pipeline(debug=False, block=False)
 
 UPLOAD_DIR = "temp_audio"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -17,65 +26,436 @@ app.mount("/static", StaticFiles(directory="."), name="static")
 def home():
     return FileResponse("index.html")
 
-from core.storage import DIRS, timestamp
+from core.storage import DIRS, MANAGER as storage, keep_recording, timestamp
+from core.audio_io import decode_audio_bytes, wav_bytes
+from core.config import SAVE_RECORDINGS, LISTEN_WORKERS, LISTEN_QUEUE_SIZE, TTS_STREAMING, PRERENDER_ENABLED
+from core.scheduler import RequestScheduler, SchedulerFull
+from core.prerender import PrerenderScheduler
+
+scheduler = RequestScheduler(workers=LISTEN_WORKERS, max_queue=LISTEN_QUEUE_SIZE)
+
+from core.metrics import REGISTRY
+from core.tracing import new_trace_id
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "h2h_request_seconds", "End-to-end pipeline time per request", labels=("endpoint", "outcome")
+)
+REJECTED = REGISTRY.counter(
+    "h2h_requests_rejected_total", "Requests turned away before running", labels=("endpoint", "reason")
+)
+# Summed over serve.py worker processes
+REGISTRY.gauge(
+    "h2h_in_flight_requests", "Requests running on a worker", fn=lambda: scheduler.in_flight, aggregate="sum"
+)
+REGISTRY.gauge(
+    "h2h_queue_depth", "Requests waiting for a worker", fn=lambda: scheduler.queue_depth, aggregate="sum"
+)
+REGISTRY.gauge("h2h_workers", "Pipeline worker threads", fn=lambda: scheduler.workers, aggregate="sum")
+REGISTRY.gauge(
+    "h2h_model_ready", "1 once a model component is loaded", labels=("component",),
+    fn=lambda: {
+        (name,): int(c["state"] == "ready")
+        for name, c in assistant.loader.status()["components"].items()
+    },
+)
+
+@app.on_event("startup")
+def start_background_threads():
+    """Per-process threads; under serve.py this runs in every worker, after the fork."""
+    REGISTRY.start_sync()
+    # Retention sweeps for recordings, denoised audio, TTS output and old logs
+    storage.start()
+    # Next-departure answers rendered while no request is running
+    if PRERENDER_ENABLED:
+        PrerenderScheduler(assistant, idle=_idle).start()
+
+
+def _idle():
+    """
+    No request on any endpoint: nothing scheduled (/listen, /query,
+    /query/batch, streams past their endpoint) and no stream still
+    receiving audio and decoding partial transcripts.
+    """
+    return scheduler.in_flight == 0 and scheduler.queue_depth == 0 and open_sessions() == 0
+
+
+# Keep references so fire-and-forget saves are not garbage collected
+_background_tasks = set()
 
-@app.post("/listen")
-async def listen(audio: UploadFile):
-    fname = f"{timestamp()}_{uuid.uuid4().hex}.webm"
-    temp_path = os.path.join(DIRS["recordings"], fname)
 
-    # 🔥 1. Save uploaded WebM first
-    with open(temp_path, "wb") as f:
-        f.write(await audio.read())
+def _save_recording(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
 
-    # 🔥 2. Convert to 16kHz mono WAV for Whisper
-    import subprocess
-    wav_path = temp_path.replace(".webm", ".wav")
 
-    subprocess.run([
-        "ffmpeg", "-y",
-        "-i", temp_path,
-        "-ar", "16000",
-        "-ac", "1",
-        wav_path
-    ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+@app.get("/healthz")
+def healthz():
+    """Liveness plus per-model load state; 200 as long as the process is up."""
+    return assistant.health()
+
+
+@app.get("/readyz")
+def readyz():
+    """200 once every model /listen needs is loaded, 503 until then."""
+    status = assistant.health()
+    return JSONResponse(status, status_code=200 if status["accepting"]["audio"] else 503)
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus text exposition: stage histograms, queue depth, in-flight
+    requests. Under serve.py, every worker's metrics merged.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/storage")
+def storage_stats():
+    """Disk usage and retention policy per artifact directory."""
+    return storage.usage()
+
+
+@app.post("/listen")
+async def listen(audio: UploadFile):
+    # 🔥 0. Still booting: answer fast instead of holding the upload
+    if not assistant.loader.ready(AUDIO_COMPONENTS):
+        REJECTED.inc(endpoint="/listen", reason="starting")
+        return JSONResponse(
+            {"type": "error", "text": "The assistant is still starting up. Please try again shortly."},
+            status_code=503,
+            headers={"Retry-After": "5"},
+        )
+
+    data = await audio.read()
 
-    # Use converted WAV for pipeline
-    temp_path = wav_path
+    # 🔥 1. Optionally keep the raw upload, without blocking the request
+    if SAVE_RECORDINGS and keep_recording():
+        ext = os.path.splitext(audio.filename or "")[1] or ".webm"
+        fname = f"{timestamp()}_{uuid.uuid4().hex}{ext}"
+        task = asyncio.create_task(
+            asyncio.to_thread(_save_recording, os.path.join(DIRS["recordings"], fname), data)
+        )
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
 
-    status_queue = queue.Queue()
+    trace_id = new_trace_id()
 
-    def run_pipeline():
+    def run_pipeline(emit):
+        started = time.perf_counter()
+        outcome = "error"
         try:
-            result = assistant.run(
-                temp_path,
-                status_callback=lambda msg: status_queue.put({
-                    "type": "status",
-                    "text": msg
-                })
-            )
-            status_queue.put({"type": "result", "data": result})
-        except Exception as e:
-            status_queue.put({"type": "error", "text": str(e)})
+            _run_pipeline(emit)
+            outcome = "ok"
         finally:
-            status_queue.put(None)
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint="/listen", outcome=outcome)
 
-    async def status_generator():
-        thread = threading.Thread(target=run_pipeline)
-        thread.start()
+    def _run_pipeline(emit):
+        # 🔥 2. Decode WebM/Ogg/Opus → 16kHz mono float32 in-process
+        samples = decode_audio_bytes(data)
 
-        while True:
-            try:
-                msg = await asyncio.to_thread(status_queue.get, timeout=0.1)
-                if msg is None:
-                    break
+        def send_audio(chunk):
+            emit({
+                "type": "audio",
+                "index": chunk["index"],
+                "text": chunk["text"],
+                "data": base64.b64encode(
+                    wav_bytes(chunk["audio"], chunk["sample_rate"])
+                ).decode("ascii"),
+            })
+
+        result = assistant.run(
+            samples,
+            status_callback=lambda msg: emit({
+                "type": "status",
+                "text": msg
+            }),
+            audio_callback=send_audio if TTS_STREAMING else None,
+            trace_id=trace_id,
+        )
+        emit({"type": "result", "data": result})
+
+    # 🔥 3. Admission control: fail fast instead of piling up threads
+    try:
+        job = scheduler.submit(run_pipeline)
+    except SchedulerFull as e:
+        REJECTED.inc(endpoint="/listen", reason="busy")
+        return JSONResponse(
+            {"type": "error", "text": "The assistant is busy. Please try again shortly."},
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    async def status_generator():
+        try:
+            async for msg in job.events():
                 yield json.dumps(msg) + "\n"
-            except queue.Empty:
-                await asyncio.sleep(0.1)
-                continue
+        finally:
+            job.cancel()
 
     return StreamingResponse(
         status_generator(),
-        media_type="application/x-ndjson"
+        media_type="application/x-ndjson",
+        headers={"X-Trace-Id": trace_id},
     )
 
+
+from core.streaming import StreamingSession, open_sessions, pcm16_to_float
+from core.config import STREAM_IDLE_SECONDS
+
+END_OF_SPEECH_TO_ANSWER = REGISTRY.histogram(
+    "h2h_stream_end_of_speech_to_answer_seconds",
+    "/listen/stream: last voiced frame received → answer text sent",
+)
+END_OF_SPEECH_TO_AUDIO = REGISTRY.histogram(
+    "h2h_stream_end_of_speech_to_first_audio_seconds",
+    "/listen/stream: last voiced frame received → first TTS chunk sent",
+)
+STREAM_ENDPOINTS = REGISTRY.counter(
+    "h2h_stream_endpoints_total", "/listen/stream utterances by endpoint reason", labels=("reason",)
+)
+
+
+def _bad_frame(msg):
+    """Why a /listen/stream client message cannot be used, or None."""
+    if msg.get("bytes") is not None:
+        if len(msg["bytes"]) % 2:
+            return "Audio frames must be 16-bit PCM (an even number of bytes)."
+        return None
+    try:
+        data = json.loads(msg.get("text") or "")
+    except ValueError:
+        return "Text messages must be JSON."
+    if not isinstance(data, dict) or data.get("type") != "stop":
+        return 'The only text message is {"type": "stop"}.'
+    return None
+
+
+@app.websocket("/listen/stream")
+async def listen_stream(ws: WebSocket):
+    """
+    Streaming /listen. The client sends 16 kHz mono little-endian 16-bit
+    PCM as binary frames while the user speaks (and may send
+    {"type": "stop"}). The server answers with "partial" transcripts,
+    one "endpoint" message once the user stops talking, then the same
+    status / queue / audio / result messages as /listen, and closes.
+    The extra "answer" message carries the answer text before TTS.
+
+    Malformed frames get an "error" message and close the socket (1003).
+    A client silent for STREAM_IDLE_SECONDS is treated as having stopped.
+    """
+    await ws.accept()
+    if not assistant.loader.ready(AUDIO_COMPONENTS):
+        REJECTED.inc(endpoint="/listen/stream", reason="starting")
+        await ws.send_json({"type": "error", "text": "The assistant is still starting up. Please try again shortly."})
+        await ws.close(code=1013)
+        return
+
+    trace_id = new_trace_id()
+    session = StreamingSession(assistant.speech)
+    await ws.send_json({"type": "listening", "trace_id": trace_id, "sample_rate": session.sample_rate})
+
+    partial = None
+
+    async def send_partial():
+        nonlocal partial
+        text = await partial
+        partial = None
+        if text:
+            await ws.send_json({"type": "partial", "text": text, "lang": session.lang})
+
+    job = None
+    try:
+        # 🔥 1. Audio in: incremental VAD + partial transcripts
+        while session.endpoint is None:
+            try:
+                msg = await asyncio.wait_for(ws.receive(), STREAM_IDLE_SECONDS)
+            except asyncio.TimeoutError:
+                session.stop()
+                break
+            if msg["type"] == "websocket.disconnect":
+                return
+
+            error = _bad_frame(msg)
+            if error is not None:
+                REJECTED.inc(endpoint="/listen/stream", reason="bad_frame")
+                await ws.send_json({"type": "error", "text": error})
+                await ws.close(code=1003)
+                return
+            if msg.get("bytes"):
+                session.push(pcm16_to_float(msg["bytes"]))
+            elif msg.get("text"):
+                session.stop()
+
+            if partial is not None and partial.done():
+                await send_partial()
+            if session.partial_due():
+                partial = asyncio.wrap_future(session.submit_partial())
+
+        STREAM_ENDPOINTS.inc(reason=session.endpoint)
+        await ws.send_json({"type": "endpoint", "reason": session.endpoint})
+        if partial is not None:
+            await send_partial()
+
+        # 🔥 2. Endpoint fired: NLP starts now, on the shared workers
+        first = {}
+
+        def since_speech_end(key, histogram):
+            if key not in first and session.speech_end_at is not None:
+                first[key] = time.perf_counter() - session.speech_end_at
+                histogram.observe(first[key])
+
+        def run_pipeline(emit):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                _run_pipeline(emit)
+                outcome = "ok"
+            finally:
+                REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint="/listen/stream", outcome=outcome)
+
+        def _run_pipeline(emit):
+            def send_answer(text):
+                since_speech_end("answer", END_OF_SPEECH_TO_ANSWER)
+                emit({"type": "answer", "text": text})
+
+            def send_audio(chunk):
+                since_speech_end("audio", END_OF_SPEECH_TO_AUDIO)
+                emit({
+                    "type": "audio",
+                    "index": chunk["index"],
+                    "text": chunk["text"],
+                    "data": base64.b64encode(
+                        wav_bytes(chunk["audio"], chunk["sample_rate"])
+                    ).decode("ascii"),
+                })
+
+            result = assistant.run_stream(
+                session,
+                status_callback=lambda msg: emit({"type": "status", "text": msg}),
+                audio_callback=send_audio if TTS_STREAMING else None,
+                answer_callback=send_answer,
+                trace_id=trace_id,
+            )
+            # Headline latency: user stopped talking → answer on its way
+            result["stream"]["end_of_speech_to_answer_ms"] = (
+                round(first["answer"] * 1000, 1) if "answer" in first else None
+            )
+            emit({"type": "result", "data": result})
+
+        try:
+            job = scheduler.submit(run_pipeline)
+        except SchedulerFull as e:
+            REJECTED.inc(endpoint="/listen/stream", reason="busy")
+            await ws.send_json({
+                "type": "error",
+                "text": "The assistant is busy. Please try again shortly.",
+                "retry_after": e.retry_after,
+            })
+            await ws.close(code=1013)
+            return
+
+        async for msg in job.events():
+            await ws.send_json(msg)
+        await ws.close()
+
+    except (WebSocketDisconnect, RuntimeError):
+        pass  # client went away mid-stream
+    finally:
+        if job is not None:
+            job.cancel()
+        session.stop()
+
+
+class Query(BaseModel):
+    text: str
+    lang: str | None = None
+    tts: bool = False
+
+
+class QueryBatch(BaseModel):
+    queries: list[Query]
+    tts: bool = False
+
+
+def _starting(endpoint):
+    REJECTED.inc(endpoint=endpoint, reason="starting")
+    return JSONResponse(
+        {"type": "error", "text": "The assistant is still starting up. Please try again shortly."},
+        status_code=503,
+        headers={"Retry-After": "5"},
+    )
+
+
+async def _scheduled(endpoint, fn, headers=None):
+    """
+    Run fn() on the shared worker pool, behind the same admission control
+    as /listen (typed queries use the same models), and answer with its
+    result as JSON: 503 when the queue is full, 500 if fn raised.
+    """
+    try:
+        job = scheduler.submit(lambda emit: emit({"type": "result", "data": fn()}))
+    except SchedulerFull as e:
+        REJECTED.inc(endpoint=endpoint, reason="busy")
+        return JSONResponse(
+            {"type": "error", "text": "The assistant is busy. Please try again shortly."},
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    try:
+        async for msg in job.events():
+            if msg["type"] == "result":
+                return JSONResponse(msg["data"], headers=headers)
+            if msg["type"] == "error":
+                return JSONResponse(msg, status_code=500, headers=headers)
+    finally:
+        job.cancel()
+
+
+@app.post("/query")
+async def query(body: Query):
+    """Typed query: skips denoise, language ID and ASR; TTS only when asked."""
+    if not assistant.loader.ready(TEXT_COMPONENTS):
+        return _starting("/query")
+
+    trace_id = new_trace_id()
+
+    def run():
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = assistant.run_text(body.text, lang=body.lang, speak=body.tts, trace_id=trace_id)
+            outcome = "ok"
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint="/query", outcome=outcome)
+        return result
+
+    return await _scheduled("/query", run, headers={"X-Trace-Id": trace_id})
+
+
+@app.post("/query/batch")
+async def query_batch(body: QueryBatch):
+    """Many typed queries; translation and intent encoding run batched, as one scheduled job."""
+    if len(body.queries) > QUERY_BATCH_MAX:
+        REJECTED.inc(endpoint="/query/batch", reason="too_large")
+        return JSONResponse(
+            {"type": "error", "text": f"At most {QUERY_BATCH_MAX} queries per batch."},
+            status_code=413,
+        )
+    if not assistant.loader.ready(TEXT_COMPONENTS):
+        return _starting("/query/batch")
+
+    def run():
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            results, timings = assistant.run_text_batch(
+                [{"text": q.text, "lang": q.lang} for q in body.queries], speak=body.tts
+            )
+            outcome = "ok"
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint="/query/batch", outcome=outcome)
+        return {"results": results, "timings": timings}
+
+    return await _scheduled("/query/batch", run)